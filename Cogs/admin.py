@@ -1,11 +1,9 @@
-import nekos
 import asyncio
 import concurrent
 import importlib
 import io
 import json
 import os
-import re
 import subprocess
 import textwrap
 import traceback
@@ -19,12 +17,12 @@ from datetime import datetime
 from psycopg import cursor
 import requests
 import speedtest
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ext.buttons import Paginator
 from index import EMBED_COLOUR, cursor_n, delay, logger, mydb_n
 from Manager.logger import formatColor
 from Manager.commandManager import cmd
-from utils import default, http, permissions
+from utils import default, http, permissions, scamlinks, scanner, snipes
 
 from .Utils import *
 
@@ -70,25 +68,40 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
         self.blacklisted = False
         self.blacklist = self.blacklisted_users()
         bot.add_check(self.blacklist_check)
-        self.nword_re = re.compile(
-            r"\b(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)\b", re.I
-        )
         self.afks = {}
+        # Scam links waiting for the next digest, and how many didn't fit.
+        self.scam_reports = []
+        self.scam_reports_dropped = 0
+        self.bot.pipeline.register(
+            "linkblacklist",
+            self.linkblacklist,
+            dm=False,
+            contains=["."],
+            bots=True,
+        )
+        self.scam_digest.start()
+
+    def cog_unload(self):
+        self.bot.pipeline.unregister("linkblacklist")
+        self.scam_digest.cancel()
 
     # this is mainly to make sure that the code is loading the json file if
     # new data gets added
 
     async def get_hentai_img(self):
         if random.randint(1, 2) == 1:
-            url = nekos.img(random.choice(self.modules))
+            url = await http.nekos_img(random.choice(self.modules))
         else:
             other_stuff = ["bondage", "hentai", "thighs"]
-            async with aiohttp.ClientSession() as s:
-                async with s.get(
-                    f"https://api.dbot.dev/images/nsfw/{random.choice(other_stuff)}"
-                ) as r:
-                    j = await r.json()
-                    url = j["url"]
+            try:
+                j = await http.get(
+                    http.url("dbot", f"/images/nsfw/{random.choice(other_stuff)}"),
+                    res_method="json",
+                    no_cache=True,
+                )
+                url = j["url"]
+            except aiohttp.ClientError:
+                url = await http.nekos_img(random.choice(self.modules))
         return url
 
     def blacklisted_users(self) -> list:
@@ -152,13 +165,13 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
-        if "n word" in guild.name.lower():
+        if "badwords" in scanner.scan(guild.name):
             await self.try_to_send_msg_in_a_channel(
                 guild, "im gonna leave cuz of the server name"
             )
             return await guild.leave()
         for channel in guild.channels:
-            if "n word" in channel.name.lower():
+            if "badwords" in scanner.scan(channel.name):
                 await self.try_to_send_msg_in_a_channel(
                     guild, f"im gonna leave cuz of the channel name {channel.mention}"
                 )
@@ -364,11 +377,7 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
             user = ctx.author
 
         def check(m):
-            return (
-                m.channel == ctx.channel
-                and m.author == ctx.author
-                and m.content in self.yes_responses
-            )
+            return m.content in self.yes_responses
 
         if account == "both":
             to_erase = "bank and wallet"
@@ -381,7 +390,9 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
             f"Are you sure you want to erase {str(user)}'s {to_erase}?\n**This action cannot be undone.**"
         )
         try:
-            response = await self.bot.wait_for("message", check=check, timeout=15)
+            response = await self.bot.prompts.wait(
+                ctx.channel.id, ctx.author.id, timeout=15, check=check
+            )
         except asyncio.TimeoutError:
             await ctx.reply("Canceled.")
             return
@@ -696,6 +707,25 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
             )
         await ctx.send(f"Reloaded module **{name_maker}**")
 
+    @commands.command()
+    @commands.check(permissions.is_owner)
+    async def reloadpatterns(self, ctx):
+        """Reloads the content scanner patterns."""
+        try:
+            await ctx.message.delete(delay=delay)
+        except:
+            pass
+        try:
+            loaded = scanner.reload()
+        except Exception as e:
+            error = default.traceback_maker(e)
+            return await ctx.send(
+                f"**{scanner.PATTERNS_FILE}** returned error and was not reloaded...\n{error}"
+            )
+        await ctx.send(
+            f"Reloaded **{scanner.PATTERNS_FILE}**: {', '.join(loaded.categories)}"
+        )
+
     @commands.command()
     @commands.check(permissions.is_owner)
     async def reboot(self, ctx):
@@ -799,6 +829,72 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
         except discord.Forbidden:
             await ctx.send("This user might be having DMs blocked.", delete_after=delay)
 
+    @commands.group(case_insensitive=True)
+    @commands.check(permissions.is_owner)
+    async def perf(self, ctx):
+        """Runtime stats for keeping an eye on the bot"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(str(ctx.command))
+
+    @perf.command(name="breakers", aliases=["upstreams"])
+    @commands.check(permissions.is_owner)
+    async def perf_breakers(self, ctx):
+        """Circuit breaker state of every external API"""
+        rows = [
+            f"{s['name']:<10} {s['state']:<9} fail:{s['failures']:<3} "
+            f"busy:{s['in_flight']:<3} wait:{s['waiting']:<3} "
+            f"calls:{s['calls']} failed:{s['failed']} rejected:{s['rejected']}"
+            for s in http.breaker_stats()
+        ]
+        await ctx.send(default.box("\n".join(rows)))
+
+    @perf.command(name="pipeline", aliases=["messages"])
+    @commands.check(permissions.is_owner)
+    async def perf_pipeline(self, ctx):
+        """Where the time goes for every incoming message"""
+        stats = self.bot.pipeline.stats()
+        rows = [
+            f"{stats['messages']} messages, routing {stats['routing_us']:.1f}us, "
+            f"stages {stats['avg_ms']:.2f}ms per message"
+        ]
+        rows += [
+            f"{s['name']:<17} calls:{s['calls']:<8} errors:{s['errors']:<4} "
+            f"avg:{s['avg_ms']:.2f}ms max:{s['max_ms']:.0f}ms"
+            for s in stats["stages"]
+        ]
+        await ctx.send(default.box("\n".join(rows)))
+
+    @perf.command(name="autopost", aliases=["ap"])
+    @commands.check(permissions.is_owner)
+    async def perf_autopost(self, ctx):
+        """How the last autopost batches went"""
+        cog = self.bot.get_cog("ap")
+        if cog is None:
+            return await ctx.send("Autoposting isn't loaded.")
+        stats = cog.fanout.stats()
+        rows = [f"{key:<16} {value}" for key, value in stats.items()]
+        await ctx.send(default.box("\n".join(rows)))
+
+    @perf.command(name="jobs")
+    @commands.check(permissions.is_owner)
+    async def perf_jobs(self, ctx):
+        """Background mass member operations across all guilds"""
+        stats = self.bot.jobs.stats()
+        rows = [f"{key:<10} {value}" for key, value in stats.items()]
+        await ctx.send(default.box("\n".join(rows)))
+
+    @perf.command(name="snipes")
+    @commands.check(permissions.is_owner)
+    async def perf_snipes(self, ctx):
+        """Size of the snipe/editsnipe stores"""
+        rows = [
+            f"{kind:<8} entries:{s['entries']:<6} channels:{s['channels']:<6} "
+            f"~{s['bytes'] / 1024:.0f}/{s['max_bytes'] / 1024:.0f}KiB "
+            f"evicted:{s['evicted']} expired:{s['expired']}"
+            for kind, s in snipes.stats().items()
+        ]
+        await ctx.send(default.box("\n".join(rows) or "Nothing sniped yet."))
+
     @commands.group(case_insensitive=True)
     @commands.check(permissions.is_owner)
     async def change(self, ctx):
@@ -887,49 +983,56 @@ class Admin(commands.Cog, name="admin", command_attrs=dict(hidden=True)):
             pass
         await ctx.send(message)
 
-    @commands.Cog.listener(name="on_message")
     async def linkblacklist(self, message):
-        if message.guild is None:
+        hits = scamlinks.check(message.content)
+        if not hits:
             return
-        me = self.bot.get_user(101118549958877184)
-        blacklisted_links = [
-            "cehfhc.dateshookp.com",
-            "streancommunnity.",
-            "steancomunnity.",
-            "steancomunlty.",
-            "stearncomminuty.",
-            "steamcommunytu.",
-            "steamconmmuntiy.",
-            "steamcomminytu.",
-            "steamcommutiny.",
-            "streancommunnity.",
-            "steancomunnity.",
-            "steancomunlty.",
-            "stearncomminuty.",
-            "steamcommunytu.",
-            "steamconmmuntiy.",
-            "steamcomminytu.",
-            "bit.ly/Discord--Nitro-Generator",
-            "store-steampowered.",
-            "steamnconnmunity.",
-            "discordgivenitro.",
-            "freenitros.",
-            "freenitros.",
-            "discordgift.",
-            "discordgift.",
-            "discordgift.",
-            "steamcomminuty.",
-            "discord.giveawey.",
-        ]
-
-        if any(elem in message.content for elem in blacklisted_links):
-            await me.send(
-                f"**New Scammer**\n**{message.guild.id}** | **{message.guild.name}**\n{message.author.id}\n`{message.content}`\n"
-            )
+        if any(hit.certain for hit in hits):
             try:
                 await message.delete()
             except:
                 pass
+        if len(self.scam_reports) >= 200:
+            self.scam_reports_dropped += 1
+            return
+        links = ", ".join(f"`{hit.url[:100]}` ({hit.reason})" for hit in hits[:5])
+        self.scam_reports.append(
+            f"**{message.guild.id}** | **{message.guild.name}** | {message.author.id}\n{links}"
+        )
+
+    @tasks.loop(minutes=10)
+    async def scam_digest(self):
+        """Everything linkblacklist caught since the last digest, in one DM"""
+        if not self.scam_reports:
+            return
+        me = self.bot.get_user(101118549958877184)
+        if me is None:
+            # Not cached yet, the reports wait for the next run.
+            return
+        reports, self.scam_reports = self.scam_reports, []
+        dropped, self.scam_reports_dropped = self.scam_reports_dropped, 0
+        header = f"**Scam links** ({len(reports) + dropped})"
+        if dropped:
+            header += f", {dropped} not listed"
+        chunk = header
+        # reports[unsent:] haven't been delivered yet.
+        unsent = 0
+        try:
+            for i, report in enumerate(reports):
+                if len(chunk) + len(report) + 2 > 2000:
+                    await me.send(chunk)
+                    chunk, unsent = "", i
+                chunk = f"{chunk}\n\n{report}" if chunk else report
+            await me.send(chunk)
+        except discord.HTTPException as e:
+            logger.warning(f"Couldn't send the scam link digest: {e}")
+            self.scam_reports[:0] = reports[unsent:]
+            if chunk.startswith(header):
+                self.scam_reports_dropped += dropped
+
+    @scam_digest.before_loop
+    async def before_scam_digest(self):
+        await self.bot.wait_until_ready()
 
 
 def setup(bot):
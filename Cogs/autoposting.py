@@ -1,14 +1,16 @@
-import asyncio
+import functools
 import random
-from typing import Union
+import time
 
 import aiohttp
 import discord
 from discord.ext import commands, tasks
-from index import EMBED_COLOUR, config, cursor_n, logger, mydb_n
-from utils import default
+from index import EMBED_COLOUR, config, logger, mydb_n
+from utils import autopost, default, fanout, http
 from Manager.logger import formatColor
 
+WEBHOOK_NAME = "AGB Autoposting"
+
 BotList_Servers = [
     336642139381301249,
     716445624517656727,
@@ -39,8 +41,18 @@ BotList_Servers = [
 class autoposting(commands.Cog, name="ap"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.autoh.start()
         self.config = default.get("config.json")
+        self.fanout = fanout.FanOut(
+            concurrency=getattr(self.config, "autopost_concurrency", 25),
+            timeout=getattr(self.config, "autopost_timeout", 10),
+        )
+        self._session = None
+        self._embed = None
+        self._embed_at = 0
+        self.subscriptions = autopost.get_subscriptions(mydb_n)
+        # Sends go out every few seconds, each channel once per interval.
+        self.autoh.change_interval(seconds=getattr(self.config, "autopost_slice", 5))
+        self.autoh.start()
         self.modules = [
             "nsfw_neko_gif",
             "anal",
@@ -59,31 +71,123 @@ class autoposting(commands.Cog, name="ap"):
 
     def cog_unload(self):
         self.autoh.stop()
+        self.fanout.cancel()
+        if self._session is not None:
+            self.bot.loop.create_task(self._session.close())
 
     async def get_hentai_img(self):
         other_stuff = ["jpg", "gif", "yuri"]
-        async with aiohttp.ClientSession() as s:
-            async with s.get(
-                f"https://lunardev.group/api/{random.choice(other_stuff)}"
-            ) as r:
-                j = await r.json()
-                url = j["url"]
+        j = await http.get(
+            http.url("lunardev", f"/api/{random.choice(other_stuff)}"),
+            res_method="json",
+            no_cache=True,
+        )
+        return j["url"]
 
-        return url
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Stored webhooks are sent to with Webhook.partial, which needs a session.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
 
     async def send_from_webhook(self, webhook: discord.Webhook, embed: discord.Embed):
+        await webhook.send(embed=embed, avatar_url=self.bot.user.avatar)
+
+    async def find_webhook(self, sub: autopost.Subscription) -> discord.Webhook:
+        """Our webhook in the channel, made if needed, and stored for next time"""
+        channel = sub.channel
+        webhooks = await channel.webhooks()
+        webhook = None
+        for w in webhooks:
+            # Someone else's webhook with the same name isn't ours to touch.
+            if w.name != WEBHOOK_NAME or w.user != self.bot.user:
+                continue
+            if webhook is None and w.token:
+                webhook = w
+            else:
+                # Left over from before webhooks were stored.
+                await w.delete()
+        if webhook is None:
+            webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+        self.subscriptions.set_webhook(sub, webhook)
+        return webhook
+
+    async def post(self, sub: autopost.Subscription, embed: discord.Embed):
+        """Post one batch image to a channel, through its webhook if we can"""
+        channel = sub.channel
+        if sub.webhook_id and sub.webhook_token:
+            webhook = discord.Webhook.partial(
+                sub.webhook_id, sub.webhook_token, session=self.session
+            )
+            try:
+                return await self.send_from_webhook(webhook, embed)
+            except discord.HTTPException as e:
+                if e.status not in (401, 404):
+                    raise
+                # Deleted or its token was reset, find or make another below.
+                self.subscriptions.set_webhook(sub, None)
         try:
-            await webhook.send(embed=embed, avatar_url=self.bot.user.avatar)
-        except Exception as e:
-            logger.error(f"Autoposting: webhook error | {formatColor(e), 'red'}")
+            webhook = await self.find_webhook(sub)
+        except discord.errors.Forbidden:
+            webhook = None
+        except discord.HTTPException as e:
+            logger.warning(
+                f"Couldn't get a webhook in {channel.guild.id} / {channel.id}, posting directly | {e}"
+            )
+            webhook = None
+        try:
+            if webhook is None:
+                await channel.send(embed=embed)
+            else:
+                await self.send_from_webhook(webhook, embed)
+        except discord.HTTPException as e:
+            ## error is more likely to be a 404, check the logs regardless
+            if e.status != 429:
+                logger.error(
+                    f"""Autoposting error caused from {channel.guild.id} / {channel.guild.name} / {channel.id} | {e}"""
+                )
+            raise
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        sub = self.subscriptions.for_channel(channel.id)
+        if sub is not None:
+            self.subscriptions.remove([sub.guild_id])
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        sub = self.subscriptions.for_channel(after.id)
+        if sub is None:
+            return
+        if isinstance(after, discord.TextChannel) and after.is_nsfw():
+            sub.channel = after
             return
+        self.subscriptions.remove([sub.guild_id])
+        logger.warning(
+            f"{after.guild.id} is no longer NSFW, so I have removed the channel from the database."
+        )
 
-    @tasks.loop(count=None, minutes=1)
-    async def autoh(self):
-        await self.bot.wait_until_ready()
-        posts = 0
-        logger.info("Starting autoposting")
-        me = await self.bot.fetch_user(101118549958877184)
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        # Events.on_guild_remove deletes the row itself.
+        self.subscriptions.forget(guild.id)
+
+    def batch_done(self, report: fanout.BatchReport):
+        logger.debug(
+            f"Autoposting - Posted Batch: {formatColor(str(report.sent), 'green')} | {report}"
+        )
+
+    async def batch_embed(self) -> discord.Embed:
+        """The embed for this interval, every channel posting in it gets the same"""
+        if (
+            self._embed is not None
+            and time.monotonic() - self._embed_at < self.subscriptions.interval
+        ):
+            return self._embed
+        me = self.bot.get_user(101118549958877184) or await self.bot.fetch_user(
+            101118549958877184
+        )
         if random.randint(1, 10) == 3:
             embed = discord.Embed(
                 title="Enjoy your poggers porn lmao",
@@ -97,94 +201,43 @@ class autoposting(commands.Cog, name="ap"):
                 colour=EMBED_COLOUR,
             )
         embed.set_footer(text="lunardev.group", icon_url=me.avatar)
+        embed.set_image(url=(await self.get_hentai_img()))
+        self._embed, self._embed_at = embed, time.monotonic()
+        return embed
 
-        cursor_n.execute(
-            'SELECT DISTINCT "hentaichannel" FROM public.guilds WHERE "hentaichannel" IS NOT NULL'
-        )
+    @tasks.loop(count=None, seconds=5)
+    async def autoh(self):
+        if self.fanout.running:
+            # Don't stack batches, whatever is due now is still due next tick.
+            logger.debug(
+                f"Autoposting - {formatColor('Skipping batch', 'yellow')}, the last one is still posting"
+            )
+            return
+        if not self.subscriptions.has_due():
+            return
         try:
-            embed.set_image(url=(await self.get_hentai_img()))
+            embed = await self.batch_embed()
         except Exception as e:
-            logger.error(f"AutoPosting Error | {formatColor('red', 'Error')} {e}")
-            try:
-                embed.set_image(url=(await self.get_hentai_img()))
-            except Exception as e:
-                logger.error(f"AutoPosting Error | {formatColor(e), 'red'}")
-                pass
-        else:
-            for row in cursor_n.fetchall():
-                if row[0] is None:
-                    continue
-                else:
-                    channel = self.bot.get_channel(int(row[0]))
-                    if channel is None:
-                        try:
-                            await channel.guild.chunk()
-                        except:
-                            pass
-                        continue
-                    if channel is not None:
-                        if not channel.guild.chunked:
-                            await channel.guild.chunk()
-                            logger.info(
-                                f"Chunked {formatColor(channel.guild.name, 'grey')} | {formatColor(channel.guild.member_count, 'yellow')} from autoposting."
-                            )
-                        if channel.guild.id == BotList_Servers:
-                            continue
-                        else:
-                            if not channel.is_nsfw():
-                                # Remove hentai channel from db
-                                cursor_n.execute(
-                                    f"UPDATE public.guilds SET hentaichannel = NULL WHERE guildId = '{channel.guild.id}'"
-                                )
-                                mydb_n.commit()
-                                logger.warning(
-                                    f"{channel.guild.id} is no longer NSFW, so I have removed the channel from the database."
-                                )
-                            else:
-                                try:
-                                    webhooks = await channel.webhooks()
-                                    webhook = discord.utils.get(
-                                        webhooks,
-                                        name="AGB Autoposting",
-                                        user=self.bot.user,
-                                    )
-                                    if webhook is None:
-                                        # check all the channels webhooks for AGB Autoposting
-                                        for w in webhooks:
-                                            if w.name == "AGB Autoposting":
-                                                # check if there are more than one webhooks
-                                                await w.delete()
-                                        webhook = await channel.create_webhook(
-                                            name="AGB Autoposting"
-                                        )
-                                except discord.errors.Forbidden:
-                                    webhook = None
-                                except Exception as e:
-                                    webhook = None
-                                final_messagable: Union[
-                                    discord.Webhook, discord.TextChannel
-                                ] = (channel if webhook is None else webhook)
-                                posts += 1
-                                try:
-                                    if isinstance(
-                                        final_messagable, discord.TextChannel
-                                    ):
-                                        await final_messagable.send(embed=embed)
-                                        await asyncio.sleep(0.05)
-                                    else:
-                                        await self.send_from_webhook(
-                                            final_messagable, embed
-                                        )
-                                        await asyncio.sleep(0.05)
-                                except Exception as e:
-                                    ## error is more likely to be a 404, check the logs regardless
-                                    logger.error(
-                                        f"""Autoposting error caused from {channel.guild.id} / {channel.guild.name} / {channel.id} | {e}\n{e.__traceback__}"""
-                                    )
-                                    pass
-            logger.info(
-                f"Autoposting - Posted Batch: {formatColor(str(posts), 'green')}"
+            # The lunardev breaker decides when it's worth trying again, so
+            # just skip this batch instead of retrying inline.
+            logger.error(
+                f"AutoPosting Error | {formatColor('Skipping batch', 'red')} {e}"
             )
+            return
+        due = self.subscriptions.due()
+        targets = [
+            (("channel", sub.channel_id), functools.partial(self.post, sub, embed))
+            for sub in self.subscriptions.resolve(self.bot, due)
+            if sub.guild_id not in BotList_Servers
+        ]
+        if targets:
+            self.fanout.start(targets, self.batch_done)
+
+    @autoh.before_loop
+    async def before_autoh(self):
+        await self.bot.wait_until_ready()
+        # Slots were worked out when the cog loaded, not when we connected.
+        self.subscriptions.reschedule()
 
 
 def setup(bot):
@@ -312,11 +312,7 @@ class Economy(commands.Cog, name="economy"):
             return
 
         def yes_check(m):
-            return (
-                m.channel == ctx.channel
-                and m.author.id == ctx.author.id
-                and m.content in self.yes_responses
-            )
+            return m.content in self.yes_responses
 
         # Fetch the author's banking information.
         cursor_n.execute(
@@ -347,8 +343,8 @@ class Economy(commands.Cog, name="economy"):
                 )
 
                 try:  # If they do have enough, ask them if they want to transfer.
-                    response = await self.bot.wait_for(
-                        "message", check=yes_check, timeout=30
+                    response = await self.bot.prompts.wait(
+                        ctx.channel.id, ctx.author.id, timeout=30, check=yes_check
                     )
 
                 except asyncio.TimeoutError:
@@ -588,14 +584,13 @@ class Economy(commands.Cog, name="economy"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        def check(m):
-            return m.channel == ctx.channel and m.author == ctx.author
-
         await ctx.send(
             "Where tf do you wanna search for money?\nYou can search: `car`, `couch`, `tree`, `drawer` (or anywhere u want).\n*Please respond with one of these below*"
         )
         try:
-            search_place = await self.bot.wait_for("message", check=check, timeout=45)
+            search_place = await self.bot.prompts.wait(
+                ctx.channel.id, ctx.author.id, timeout=45
+            )
         except asyncio.TimeoutError:
             return await ctx.send(f"Timeout exceeded, please re-run {ctx.command}")
 
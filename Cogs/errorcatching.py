@@ -13,7 +13,6 @@
 
 import json
 import os
-import re
 
 import discord
 import psutil
@@ -22,7 +21,7 @@ from discord.ext.commands import errors
 from index import Vote, cursor_n, mydb_n
 from utils.checks import NotVoted
 from index import logger
-from utils import default
+from utils import default, scanner
 from Manager.logger import formatColor
 
 
@@ -36,9 +35,6 @@ class Error(commands.Cog):
         self.message_cooldown = commands.CooldownMapping.from_cooldown(
             1.0, 3.0, commands.BucketType.user
         )
-        self.nword_re = re.compile(
-            r"(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)", re.I
-        )
 
         self.errors = (
             commands.NoPrivateMessage,
@@ -172,7 +168,7 @@ class Error(commands.Cog):
                         ctx.command.reset_cooldown(ctx)
                         return
             else:
-                if self.nword_re.search(ctx.message.content.lower()):
+                if "nword" in scanner.scan(ctx.message.content):
                     await me1.send(
                         f"{ctx.author} is trying to get AGB to say racist things, blacklist that cunt!"
                     )
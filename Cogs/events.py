@@ -33,9 +33,14 @@ class events(commands.Cog):
             1.0, 3.0, commands.BucketType.guild
         )
         self.loop = asyncio.get_event_loop()
+        self.known_guilds = set()
+        self.bot.pipeline.register(
+            "add_server_to_db", self.add_server_to_db, dm=False, bots=True
+        )
 
     def cog_unload(self):
         self.presence_loop.stop()
+        self.bot.pipeline.unregister("add_server_to_db")
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -144,9 +149,9 @@ class events(commands.Cog):
             )
         )
 
-    @commands.Cog.listener(name="on_message")
     async def add_server_to_db(self, ctx):
-        await self.bot.wait_until_ready()
+        if ctx.guild.id in self.known_guilds:
+            return
         # Add server to database
         try:
             cursor_n.execute(
@@ -159,8 +164,8 @@ class events(commands.Cog):
             cursor_n.execute(f"INSERT INTO guilds (guildId) VALUES ('{ctx.guild.id}')")
             mydb_n.commit()
             logger.info(f"New guild detected: {ctx.guild.id} | Added to database!")
-        else:
-            return
+        # Only new guilds need the query, the row stays until we leave.
+        self.known_guilds.add(ctx.guild.id)
 
     ### DO NOT PUT THIS IN MERGED EVENT, IT WILL ONLY WORK IN ITS OWN SEPERATE EVENT. **I DO NOT KNOW WHY :D**
     ### DO NOT PUT THIS IN MERGED EVENT, IT WILL ONLY WORK IN ITS OWN SEPERATE EVENT. **I DO NOT KNOW WHY :D**
@@ -284,6 +289,7 @@ class events(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         await self.bot.wait_until_ready()
+        self.known_guilds.discard(guild.id)
 
         embed = discord.Embed(
             title="Removed from a server.", colour=discord.Colour.red()
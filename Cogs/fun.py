@@ -1,46 +1,36 @@
 import asyncio
 import datetime
 import functools
-import heapq
 import io
 import random
 import secrets
 import unicodedata
 from io import BytesIO
-from typing import List, Optional, Tuple, Union
+from typing import Optional, Union
 
 import aiohttp
 import asyncpraw
+import asyncprawcore
 import discord
-import matplotlib
-import matplotlib.pyplot as plt
-import nekos
 from discord.ext import commands
-from index import EMBED_COLOUR, Website, config, logger
+from index import EMBED_COLOUR, Website, config, logger, mydb_n
 from Manager.commandManager import cmd
-from utils import default, http, permissions
+from utils import (
+    activity,
+    bigmoji,
+    charts,
+    chatindex,
+    default,
+    http,
+    permissions,
+    tictactoe,
+)
 from utils.common_filters import filter_mass_mentions
 from utils.default import type_message
 
 
 from .Utils import *
 
-try:
-    import cairosvg
-
-    svg_convert = "cairo"
-except:
-    try:
-        from wand.image import Image
-
-        svg_convert = "wand"
-    except:
-        svg_convert = None
-
-matplotlib.use("agg")
-
-plt.switch_backend("agg")
-
 
 class Fun(commands.Cog, name="fun"):
     """Fun / Game commands"""
@@ -52,9 +42,9 @@ class Fun(commands.Cog, name="fun"):
         # self.trans = googletrans.Translator()
         Utils = self.bot.get_cog("Utils")
         self.session = aiohttp.ClientSession()
-        if svg_convert == "cairo":
+        if bigmoji.svg_convert == "cairo":
             logger.info("bigmoji: Using CairoSVG for svg conversion.")
-        elif svg_convert == "wand":
+        elif bigmoji.svg_convert == "wand":
             logger.info("bigmoji: Using wand for svg conversion.")
         else:
             logger.error(
@@ -62,19 +52,30 @@ class Fun(commands.Cog, name="fun"):
             )
 
         self.config = default.get("config.json")
-        self.ttt_games = {}
+        self.chat_index = chatindex.ChannelIndex(mydb_n)
+        warm_up = getattr(self.config, "emoji_warmup", 0)
+        if warm_up:
+            self.bot.loop.create_task(bigmoji.get_cache().warm_up(warm_up))
+        # The covid summary is only rebuilt upstream about once an hour.
+        self.covid_cache = http.TTLCache(ttl=3600, maxsize=1)
+        self.urban_cache = http.TTLCache(ttl=1800, maxsize=256)
 
         self.params = {
             "mode": "random",
         }
 
+        reddit = http.upstreams["reddit"]
         self.reddit = asyncpraw.Reddit(
             client_id=self.config.rID,
             client_secret=self.config.rSecret,
             password=self.config.rPass,
             user_agent="asyncprawpython",
             username=self.config.rUser,
+            # Point asyncpraw at the stub server when reddit is overridden.
+            **http.reddit_endpoints(),
         )
+        if asyncprawcore.exceptions.PrawcoreException not in reddit.errors:
+            reddit.errors += (asyncprawcore.exceptions.PrawcoreException,)
 
         # self.alex_api = alexflipnote.Client(self.config.flipnote)
         # self.bot.alex_api = self.alex_api
@@ -116,12 +117,6 @@ class Fun(commands.Cog, name="fun"):
             "¯\_(ツ)_/¯",
         ]
 
-    def cog_unload(self):
-        self.session.stop()
-        self.reddit.stop()
-        self.ttt_games.stop()
-        self.params.stop()
-
     def format_help_for_context(self, ctx):
         pre_processed = super().format_help_for_context(ctx)
         return f"{pre_processed}\n\nCog Version: {self.__version__}"
@@ -137,7 +132,9 @@ class Fun(commands.Cog, name="fun"):
         return result
 
     def cog_unload(self):
+        self.bot.reactions.unregister_owner(self)
         self.bot.loop.create_task(self.session.close())
+        bigmoji.get_cache().close()
 
     def get_actors(self, bot, offender, target):
         return (
@@ -150,65 +147,13 @@ class Fun(commands.Cog, name="fun"):
             {"id": target.id, "nick": target.display_name, "formatted": target.mention},
         )
 
-    @staticmethod
-    def calculate_member_perc(history: List[discord.Message]) -> dict:
-        """Calculate the member count from the message history"""
-        msg_data = {"total_count": 0, "users": {}}
-        for msg in history:
-            # Name formatting
-            if len(msg.author.display_name) >= 20:
-                short_name = "{}...".format(msg.author.display_name[:20]).replace(
-                    "$", "\\$"
-                )
-            else:
-                short_name = (
-                    msg.author.display_name.replace("$", "\\$")
-                    .replace("_", "\\_ ")
-                    .replace("*", "\\*")
-                )
-            whole_name = "{}#{}".format(short_name, msg.author.discriminator)
-            if msg.author.bot:
-                pass
-            elif whole_name in msg_data["users"]:
-                msg_data["users"][whole_name]["msgcount"] += 1
-                msg_data["total_count"] += 1
-            else:
-                msg_data["users"][whole_name] = {}
-                msg_data["users"][whole_name]["msgcount"] = 1
-                msg_data["total_count"] += 1
-        return msg_data
-
-    @staticmethod
-    def calculate_top(msg_data: dict) -> Tuple[list, int]:
-        """Calculate the top 20 from the message data package"""
-        for usr in msg_data["users"]:
-            pd = float(msg_data["users"][usr]["msgcount"]) / float(
-                msg_data["total_count"]
-            )
-            msg_data["users"][usr]["percent"] = round(pd * 100, 1)
-        top_twenty = heapq.nlargest(
-            20,
-            [
-                (x, msg_data["users"][x][y])
-                for x in msg_data["users"]
-                for y in msg_data["users"][x]
-                if (y == "percent" and msg_data["users"][x][y] > 0)
-            ],
-            key=lambda x: x[1],
-        )
-        others = 100 - sum(x[1] for x in top_twenty)
-        return top_twenty, others
-
     @staticmethod
     async def create_chart(
         top, others, channel_or_guild: Union[discord.Guild, discord.TextChannel]
     ):
-        plt.clf()
-        sizes = [x[1] for x in top]
-        labels = ["{} {:g}%".format(x[0], x[1]) for x in top]
+        slices = list(top)
         if len(top) >= 20:
-            sizes = sizes + [others]
-            labels = labels + ["Others {:g}%".format(others)]
+            slices.append(("Others", others))
         if len(channel_or_guild.name) >= 19:
             if isinstance(channel_or_guild, discord.Guild):
                 channel_or_guild_name = "{}...".format(channel_or_guild.name[:19])
@@ -216,77 +161,54 @@ class Fun(commands.Cog, name="fun"):
                 channel_or_guild_name = "#{}...".format(channel_or_guild.name[:19])
         else:
             channel_or_guild_name = channel_or_guild.name
-        title = plt.title("Stats in {}".format(channel_or_guild_name), color="white")
-        title.set_va("top")
-        title.set_ha("center")
-        plt.gca().axis("equal")
-        colors = [
-            "r",
-            "darkorange",
-            "gold",
-            "y",
-            "olivedrab",
-            "green",
-            "darkcyan",
-            "mediumblue",
-            "darkblue",
-            "blueviolet",
-            "indigo",
-            "orchid",
-            "mediumvioletred",
-            "crimson",
-            "chocolate",
-            "yellow",
-            "limegreen",
-            "forestgreen",
-            "dodgerblue",
-            "slateblue",
-            "gray",
-        ]
-        pie = plt.pie(sizes, colors=colors, startangle=0)
-        plt.legend(
-            pie[0],
-            labels,
-            bbox_to_anchor=(0.7, 0.5),
-            loc="center",
-            fontsize=10,
-            bbox_transform=plt.gcf().transFigure,
-            facecolor="#ffffff",
+        chart = await charts.render("Stats in {}".format(channel_or_guild_name), slices)
+        return BytesIO(chart)
+
+    async def activity_chart(self, ctx, days, channel_or_guild, channels):
+        """Chart the live activity counters instead of reading history"""
+        # Nothing is fetched, so don't hold the long cooldown against them.
+        ctx.command.reset_cooldown(ctx)
+        if not self.bot.activity.enabled(ctx.guild.id):
+            return await ctx.send(
+                f"Activity tracking is off in this server. Someone with Manage Server can turn it on with `{ctx.prefix}activity on`."
+            )
+        stats = self.bot.activity.stats(ctx.guild, days, {c.id for c in channels})
+        if not stats.counts:
+            return await ctx.send(f"Nobody has talked there in the last {days} days.")
+
+        top_twenty, others = stats.top(20)
+        try:
+            chart = await self.create_chart(top_twenty, others, channel_or_guild)
+        except asyncio.TimeoutError:
+            return await ctx.send("Drawing the chart took too long, try again later.")
+        await ctx.send(file=discord.File(chart, "chart.png"))
+
+    @commands.group(
+        name="activity", invoke_without_command=True, usage="`tp!activity on/off`"
+    )
+    @commands.guild_only()
+    async def activity_tracking(self, ctx):
+        """Live message activity for instant `tp!chatchart 7d` and `tp!serverchart 7d`"""
+        state = "on" if self.bot.activity.enabled(ctx.guild.id) else "off"
+        await ctx.send(
+            f"Activity tracking is **{state}** in this server. Use `{ctx.prefix}activity on` or `{ctx.prefix}activity off` to change it."
         )
-        plt.subplots_adjust(left=0.0, bottom=0.1, right=0.45)
-        image_object = BytesIO()
-        plt.savefig(image_object, format="PNG", facecolor="#36393E")
-        image_object.seek(0)
-        return image_object
 
-    async def fetch_channel_history(
-        self,
-        channel: discord.TextChannel,
-        animation_message: discord.Message,
-        messages: int,
-    ) -> List[discord.Message]:
-        """Fetch the history of a channel while displaying an status message with it"""
-        animation_message_deleted = False
-        history = []
-        history_counter = 0
-        async for msg in channel.history(limit=messages):
-            history.append(msg)
-            history_counter += 1
-            if history_counter % 250 == 0:
-                new_embed = discord.Embed(
-                    title=f"Fetching messages from #{channel.name}",
-                    description=f"This might take a while...\n{history_counter}/{messages} messages gathered",
-                    colour=EMBED_COLOUR,
-                )
+    @activity_tracking.command(name="on", usage="`tp!activity on`")
+    @permissions.has_permissions(manage_guild=True)
+    async def activity_on(self, ctx):
+        """Start counting messages per channel and member, kept for 30 days"""
+        self.bot.activity.enable(ctx.guild.id)
+        await ctx.send(
+            f"Activity tracking is on. In a while you can use `{ctx.prefix}serverchart 7d`."
+        )
 
-                if channel.permissions_for(channel.guild.me).send_messages:
-                    await channel.trigger_typing()
-                if animation_message_deleted is False:
-                    try:
-                        await animation_message.edit(embed=new_embed)
-                    except discord.NotFound:
-                        animation_message_deleted = True
-        return history
+    @activity_tracking.command(name="off", usage="`tp!activity off`")
+    @permissions.has_permissions(manage_guild=True)
+    async def activity_off(self, ctx):
+        """Stop counting messages and delete the stored counts"""
+        self.bot.activity.disable(ctx.guild.id)
+        await ctx.send("Activity tracking is off and the stored counts are gone.")
 
     @commands.guild_only()
     @commands.command(usage="`tp!chatchart #channel`")
@@ -294,10 +216,16 @@ class Fun(commands.Cog, name="fun"):
     @commands.max_concurrency(1, commands.BucketType.guild)
     @commands.bot_has_permissions(embed_links=True, attach_files=True)
     async def chatchart(
-        self, ctx, channel: Optional[discord.TextChannel] = None, messages: int = 10000
+        self,
+        ctx,
+        channel: Optional[discord.TextChannel] = None,
+        days: Optional[activity.Days] = None,
+        messages: int = 10000,
     ):
         """
         Generates a pie chart, representing the last 10000 messages in the specified channel.
+        Later runs add the messages sent since the previous one.
+        With activity tracking on, `tp!chatchart #channel 7d` charts the last 7 days instantly.
         This command has a server wide cooldown of 300 seconds.
         """
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
@@ -315,6 +243,8 @@ class Fun(commands.Cog, name="fun"):
             return await ctx.send("I cannot read the history of that channel.")
         if messages < 5:
             return await ctx.send("Theres not enough messages to show dummy")
+        if days is not None:
+            return await self.activity_chart(ctx, days, channel, [channel])
 
         message_limit = 10000
         messages = message_limit
@@ -326,10 +256,25 @@ class Fun(commands.Cog, name="fun"):
         )
 
         loading_message = await ctx.send(embed=embed)
-        try:
-            history = await self.fetch_channel_history(
-                channel, loading_message, messages
+        loading_message_deleted = False
+
+        async def progress(fetched):
+            nonlocal loading_message_deleted
+            new_embed = discord.Embed(
+                title=f"Fetching messages from #{channel.name}",
+                description=f"This might take a while...\n{fetched}/{messages} messages gathered",
+                colour=EMBED_COLOUR,
             )
+            if loading_message_deleted is False:
+                try:
+                    await loading_message.edit(embed=new_embed)
+                except discord.NotFound:
+                    loading_message_deleted = True
+
+        try:
+            # Only messages newer than the last run are fetched, the rest
+            # comes from the stored counts.
+            stats = await self.chat_index.refresh(channel, messages, progress)
         except discord.errors.Forbidden:
             try:
                 await loading_message.delete()
@@ -337,9 +282,8 @@ class Fun(commands.Cog, name="fun"):
                 pass
             return await ctx.send("No permissions to read that channel.")
 
-        msg_data = self.calculate_member_perc(history)
         # If no members are found.
-        if len(msg_data["users"]) == 0:
+        if not stats.counts:
             try:
                 await loading_message.delete()
             except discord.NotFound:
@@ -348,13 +292,18 @@ class Fun(commands.Cog, name="fun"):
                 f"Only bots have sent messages in {channel.mention} or I can't read message history."
             )
 
-        top_twenty, others = self.calculate_top(msg_data)
-        chart = await self.create_chart(top_twenty, others, channel)
+        top_twenty, others = stats.top(20)
+        try:
+            chart = await self.create_chart(top_twenty, others, channel)
+        except asyncio.TimeoutError:
+            chart = None
 
         try:
             await loading_message.delete()
         except discord.NotFound:
             pass
+        if chart is None:
+            return await ctx.send("Drawing the chart took too long, try again later.")
         await ctx.send(file=discord.File(chart, "chart.png"))
 
     @commands.guild_only()
@@ -362,12 +311,15 @@ class Fun(commands.Cog, name="fun"):
     @commands.cooldown(1, 2000, commands.BucketType.guild)
     @commands.max_concurrency(1, commands.BucketType.guild)
     @commands.bot_has_permissions(embed_links=True, attach_files=True)
-    async def serverchart(self, ctx, messages: int = 1000):
+    async def serverchart(
+        self, ctx, days: Optional[activity.Days] = None, messages: int = 1000
+    ):
         """
         Generates a pie chart, representing the last 1000 messages from every allowed channel in the server.
         As example:
         For each channel that the bot is allowed to scan. It will take the last 1000 messages from each channel.
         And proceed to build a chart out of that.
+        With activity tracking on, `tp!serverchart 7d` charts the last 7 days instantly.
         This command has a global serverwide cooldown of 2000 seconds.
         """
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
@@ -390,6 +342,8 @@ class Fun(commands.Cog, name="fun"):
             return await ctx.send(
                 "There are no channels to read... How the fuck did this happen?"
             )
+        if days is not None:
+            return await self.activity_chart(ctx, days, ctx.guild, channel_list)
 
         embed = discord.Embed(
             description="Fetching messages from the entire server this **will** take a while.",
@@ -397,36 +351,26 @@ class Fun(commands.Cog, name="fun"):
         )
 
         global_fetch_message = await ctx.send(embed=embed)
-        global_history = []
+        global_fetch_message_deleted = False
 
-        for channel in channel_list:
-            embed = discord.Embed(
-                title=f"Fetching messages from #{channel.name}",
-                description="This might take a while...",
+        async def progress(crawl):
+            nonlocal global_fetch_message_deleted
+            if global_fetch_message_deleted:
+                return
+            new_embed = discord.Embed(
+                description="Fetching messages from the entire server this **will** take a while.\n"
+                f"{crawl.done}/{len(channel_list)} channels done, {crawl.fetched} messages gathered",
                 colour=EMBED_COLOUR,
             )
-
-            loading_message = await ctx.send(embed=embed)
             try:
-                history = await self.fetch_channel_history(
-                    channel, loading_message, messages
-                )
-                global_history += history
-                await loading_message.delete()
-            except discord.errors.Forbidden:
-                try:
-                    await loading_message.delete()
-                except discord.NotFound:
-                    continue
+                await global_fetch_message.edit(embed=new_embed)
             except discord.NotFound:
-                try:
-                    await loading_message.delete()
-                except discord.NotFound:
-                    continue
+                global_fetch_message_deleted = True
+
+        stats = await chatindex.Crawl(channel_list, messages).run(progress)
 
-        msg_data = self.calculate_member_perc(global_history)
         # If no members are found.
-        if len(msg_data["users"]) == 0:
+        if not stats.counts:
             try:
                 await global_fetch_message.delete()
             except discord.NotFound:
@@ -435,13 +379,18 @@ class Fun(commands.Cog, name="fun"):
                 "Only bots have sent messages in this server... hgseiughsuighes..."
             )
 
-        top_twenty, others = self.calculate_top(msg_data)
-        chart = await self.create_chart(top_twenty, others, ctx.guild)
+        top_twenty, others = stats.top(20)
+        try:
+            chart = await self.create_chart(top_twenty, others, ctx.guild)
+        except asyncio.TimeoutError:
+            chart = None
 
         try:
             await global_fetch_message.delete()
         except discord.NotFound:
             pass
+        if chart is None:
+            return await ctx.send("Drawing the chart took too long, try again later.")
         await ctx.send(file=discord.File(chart, "chart.png"))
 
     # @commands.command(hidden=True)
@@ -483,19 +432,21 @@ class Fun(commands.Cog, name="fun"):
         except discord.NotFound:
             pass
         if user != ctx.author:
-            async with aiohttp.ClientSession() as session:
-                async with session.get("https://api.waifu.pics/sfw/bonk") as r:
-                    if r.status == 200:
-                        img = await r.json()
-                        img = img["url"]
-                        emoji = "<a:BONK:825511960741150751>"
-                        embed = discord.Embed(
-                            title="Bonky bonk.",
-                            color=EMBED_COLOUR,
-                            description=f"**{user}** gets bonked {emoji}",
-                        )
-                        embed.set_image(url=img)
-                        await ctx.send(embed=embed)
+            try:
+                img = await http.get(
+                    http.url("waifu", "/sfw/bonk"), res_method="json", no_cache=True
+                )
+            except aiohttp.ClientError:
+                return
+            img = img["url"]
+            emoji = "<a:BONK:825511960741150751>"
+            embed = discord.Embed(
+                title="Bonky bonk.",
+                color=EMBED_COLOUR,
+                description=f"**{user}** gets bonked {emoji}",
+            )
+            embed.set_image(url=img)
+            await ctx.send(embed=embed)
         else:
             await ctx.send("bonk <a:BONK:825511960741150751>")
 
@@ -506,7 +457,6 @@ class Fun(commands.Cog, name="fun"):
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     async def enlarge(self, ctx, emoji):
         """Post a large .png of an emoji"""
-        convert = False
         if emoji[0] == "<":
             # custom Emoji
             try:
@@ -517,10 +467,10 @@ class Fun(commands.Cog, name="fun"):
             emoji_name = emoji.split(":")[2][:-1]
             if emoji.split(":")[0] == "<a":
                 # animated custom emoji
-                url = "https://cdn.discordapp.com/emojis/" + emoji_name + ".gif"
+                url = http.url("emojicdn", f"/emojis/{emoji_name}.gif")
                 name += ".gif"
             else:
-                url = "https://cdn.discordapp.com/emojis/" + emoji_name + ".png"
+                url = http.url("emojicdn", f"/emojis/{emoji_name}.png")
                 name += ".png"
         else:
             chars = []
@@ -543,43 +493,29 @@ class Fun(commands.Cog, name="fun"):
                 # COMBINING ENCLOSING KEYCAP doesn't want to play nice either
                 chars.remove("fe0f")
 
-            if svg_convert is not None:
-                url = "https://twemoji.maxcdn.com/2/svg/" + "-".join(chars) + ".svg"
-                convert = True
-            else:
-                url = "https://twemoji.maxcdn.com/2/72x72/" + "-".join(chars) + ".png"
-
-        async with self.session.get(url) as resp:
-            if resp.status != 200:
-                await ctx.send("Emoji not found.")
-                return
-            img = await resp.read()
-
-        if convert:
-            task = functools.partial(Fun.generate, img)
-            task = self.bot.loop.run_in_executor(None, task)
-
             try:
-                img = await asyncio.wait_for(task, timeout=15)
+                png = await bigmoji.get_cache().get(chars)
+            except http.PayloadTooLarge:
+                return await ctx.send("That emoji is too big to upload.")
             except asyncio.TimeoutError:
-                await ctx.send("Image creation timed out.")
-                return
-        else:
-            img = io.BytesIO(img)
+                return await ctx.send("Image creation timed out.")
+            except aiohttp.ClientError:
+                return await ctx.send("Couldn't fetch that emoji right now.")
+            if png is None:
+                return await ctx.send("Emoji not found.")
+            return await ctx.send(file=discord.File(io.BytesIO(png), name))
 
-        await ctx.send(file=discord.File(img, name))
+        try:
+            img = await http.relay(url)
+        except http.PayloadTooLarge:
+            return await ctx.send("That emoji is too big to upload.")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return await ctx.send("Couldn't fetch that emoji right now.")
+        if img is None:
+            await ctx.send("Emoji not found.")
+            return
 
-    @staticmethod
-    def generate(img):
-        # Designed to be run in executor to avoid blocking
-        if svg_convert == "cairo":
-            kwargs = {"parent_width": 1024, "parent_height": 1024}
-            return io.BytesIO(cairosvg.svg2png(bytestring=img, **kwargs))
-        elif svg_convert == "wand":
-            with Image(blob=img, format="svg", resolution=2160) as bob:
-                return bob.make_blob("png")
-        else:
-            return io.BytesIO(img)
+        await ctx.send(file=discord.File(img, name))
 
     @commands.command(usage="`tp!ascii Optional:font text`")
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
@@ -724,253 +660,18 @@ class Fun(commands.Cog, name="fun"):
                         pass
 
     @commands.guild_only()
-    @commands.bot_has_permissions(add_reactions=True)
     @commands.max_concurrency(1, commands.BucketType.user)
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @commands.command(aliases=["tic", "tictac", "tictactoe"], usage="`tp!ttt`")
-    async def ttt(self, ctx, move=""):
+    async def ttt(self, ctx):
         """Tic Tac Toe"""
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
         if cmdEnabled:
             await ctx.send(":x: This command has been disabled!")
             return
 
-        await self.ttt_new(ctx.author, ctx.channel)
-
-    async def ttt_new(self, user, channel):
-        self.ttt_games[user.id] = [" "] * 9
-        response = self._make_board(user)
-        response += "Your move:"
-        msg = await channel.send(response)
-        await self._make_buttons(msg)
-
-    async def ttt_move(self, user, message, move):
-        logger.info(f"ttt_move:{user.id}")
-        # Check user currently playing
-        if user.id not in self.ttt_games:
-            logger.info(f"New ttt game")
-            return await self.ttt_new(user, message.channel)
-
-        # Check spot is empty
-        if self.ttt_games[user.id][move] == " ":
-            self.ttt_games[user.id][move] = "x"
-            logger.info(f"Moved to {move}")
-        else:
-            logger.info(f"Invalid move: {move}")
-            return None
-
-        # Check winner
-        check = self._do_checks(self.ttt_games[user.id])
-        if check is not None:
-            msg = "It's a draw!" if check == "draw" else f"{check[-1]} wins!"
-            logger.info(f"{msg}")
-            await message.edit(content=f"{self._make_board(user)}{msg}")
-            return None
-        logger.info(f"Check passed")
-
-        # AI move
-        mv = self._ai_think(self._matrix(self.ttt_games[user.id]))
-        self.ttt_games[user.id][self._coords_to_index(mv)] = "o"
-        logger.info(f"AI moved")
-
-        # Update board
-        await message.edit(content=self._make_board(user))
-        logger.info(f"Board updated")
-
-        # Check winner again
-        check = self._do_checks(self.ttt_games[user.id])
-        if check is not None:
-            msg = "It's a draw!" if check == "draw" else f"{check[-1]} wins!"
-            logger.info(f"{msg}")
-            await message.edit(content=f"{self._make_board(user)}{msg}")
-        logger.info(f"Check passed")
-
-    def _make_board(self, author):
-        return f"{author.mention}\n{self._table(self.ttt_games[author.id])}\n"
-
-    async def _make_buttons(self, msg):
-        await msg.add_reaction("\u2196")  # 0 tl
-        await msg.add_reaction("\u2B06")  # 1 t
-        await msg.add_reaction("\u2197")  # 2 tr
-        await msg.add_reaction("\u2B05")  # 3 l
-        await msg.add_reaction("\u23FA")  # 4 mid
-        await msg.add_reaction("\u27A1")  # 5 r
-        await msg.add_reaction("\u2199")  # 6 bl
-        await msg.add_reaction("\u2B07")  # 7 b
-        await msg.add_reaction("\u2198")  # 8 br
-
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        if reaction.message.guild is None:
-            return
-        if reaction.message.author != self.bot.user:
-            return
-        game_session = self.ttt_games.get(user.id, None)
-        if game_session is None:
-            return
-        move = self._decode_move(str(reaction.emoji))
-        if move is None:
-            return
-        await self.ttt_move(user, reaction.message, move)
-
-    @staticmethod
-    def _decode_move(emoji):
-        dict = {
-            "\u2196": 0,
-            "\u2B06": 1,
-            "\u2197": 2,
-            "\u2B05": 3,
-            "\u23FA": 4,
-            "\u27A1": 5,
-            "\u2199": 6,
-            "\u2B07": 7,
-            "\u2198": 8,
-        }
-        return dict[emoji] if emoji in dict else None
-
-    @staticmethod
-    def _table(xo):
-        return (
-            (("%s%s%s\n" * 3) % tuple(xo))
-            .replace("o", ":o2:")
-            .replace("x", ":regional_indicator_x:")
-            .replace(" ", ":white_large_square:")
-        )
-
-    @staticmethod
-    def _matrix(b):
-        return [[b[0], b[1], b[2]], [b[3], b[4], b[5]], [b[6], b[7], b[8]]]
-
-    @staticmethod
-    def _coords_to_index(coords):
-        map = {
-            (0, 0): 0,
-            (0, 1): 1,
-            (0, 2): 2,
-            (1, 0): 3,
-            (1, 1): 4,
-            (1, 2): 5,
-            (2, 0): 6,
-            (2, 1): 7,
-            (2, 2): 8,
-        }
-        return map[coords]
-
-    def _do_checks(self, b):
-        m = self._matrix(b)
-        if self._check_win(m, "x"):
-            return "win X"
-        if self._check_win(m, "o"):
-            return "win O"
-        if self._check_draw(b):
-            return "draw"
-        return None
-
-    # The following comes from an old project
-    # https://gist.github.com/HizkiFW/0aadefb73e71794fb4a2802708db5bcf
-    @staticmethod
-    def _find_streaks(m, xo):
-        row = [0, 0, 0]
-        col = [0, 0, 0]
-        dia = [0, 0]
-
-        # Check rows and columns for X streaks
-        for y in range(3):
-            for x in range(3):
-                if m[y][x] == xo:
-                    row[y] += 1
-                    col[x] += 1
-
-        # Check diagonals
-        if m[0][0] == xo:
-            dia[0] += 1
-        if m[1][1] == xo:
-            dia[0] += 1
-            dia[1] += 1
-        if m[2][2] == xo:
-            dia[0] += 1
-        if m[2][0] == xo:
-            dia[1] += 1
-        if m[0][2] == xo:
-            dia[1] += 1
-
-        return (row, col, dia)
-
-    @staticmethod
-    def _find_empty(matrix, rcd, n):
-        # Rows
-        if rcd == "r":
-            for x in range(3):
-                if matrix[n][x] == " ":
-                    return x
-        # Columns
-        if rcd == "c":
-            for x in range(3):
-                if matrix[x][n] == " ":
-                    return x
-        # Diagonals
-        if rcd == "d":
-            if n == 0:
-                for x in range(3):
-                    if matrix[x][x] == " ":
-                        return x
-            else:
-                for x in range(3):
-                    if matrix[x][2 - x] == " ":
-                        return x
-
-        return False
-
-    def _check_win(self, m, xo):
-        row, col, dia = self._find_streaks(m, xo)
-        dia.append(0)
-
-        for i in range(3):
-            if row[i] == 3 or col[i] == 3 or dia[i] == 3:
-                return True
-
-        return False
-
-    @staticmethod
-    def _check_draw(board):
-        return " " not in board
-
-    def _ai_think(self, m):
-        rx, cx, dx = self._find_streaks(m, "x")
-        ro, co, do = self._find_streaks(m, "o")
-
-        mv = self._ai_move(2, m, ro, co, do)
-        if mv is not False:
-            return mv
-        mv = self._ai_move(2, m, rx, cx, dx)
-        if mv is not False:
-            return mv
-        mv = self._ai_move(1, m, ro, co, do)
-        if mv is not False:
-            return mv
-        return self._ai_move(1, m, rx, cx, dx)
-
-    def _ai_move(self, n, m, row, col, dia):
-        for r in range(3):
-            if row[r] == n:
-                x = self._find_empty(m, "r", r)
-                if x is not False:
-                    return (r, x)
-            if col[r] == n:
-                y = self._find_empty(m, "c", r)
-                if y is not False:
-                    return (y, r)
-
-        if dia[0] == n:
-            y = self._find_empty(m, "d", 0)
-            if y is not False:
-                return (y, y)
-        if dia[1] == n:
-            y = self._find_empty(m, "d", 1)
-            if y is not False:
-                return (y, 2 - y)
-
-        return False
+        board = tictactoe.Board(ctx.author)
+        board.message = await ctx.send(board.content(), view=board)
 
     KAOMOJI_JOY = [
         " (\\* ^ ω ^)",
@@ -1290,6 +991,16 @@ class Fun(commands.Cog, name="fun"):
             )
             await ctx.reply(embed=e)
 
+    @staticmethod
+    async def fetch_covid_summary():
+        """Download the covid summary and index it by country code"""
+        resp = await http.get(
+            http.url("covid", "/summary"), res_method="json", no_cache=True
+        )
+        summary = {item["CountryCode"]: item for item in resp["Countries"]}
+        summary["Global"] = resp["Global"]
+        return summary
+
     @commands.command(usage="`tp!covid`")
     @commands.bot_has_permissions(embed_links=True)
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
@@ -1314,18 +1025,18 @@ class Fun(commands.Cog, name="fun"):
             url=f"{Website}",
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://api.covid19api.com/summary") as resp:
-                resp = await resp.json()
-                if country_code == "Global":
-                    resp = resp["Global"]
-                else:
-                    resp = next(
-                        item
-                        for item in resp["Countries"]
-                        if item["CountryCode"] == country_code.upper()
-                    )
-                    embed.title = f"Covid statistics for {resp['Country']}"
+        try:
+            summary, fetched_at = await self.covid_cache.get_or_fetch(
+                "summary", self.fetch_covid_summary
+            )
+        except (aiohttp.ClientError, KeyError, ValueError):
+            return await ctx.reply("The covid API seems to be down...")
+        key = "Global" if country_code == "Global" else country_code.upper()
+        resp = summary.get(key)
+        if resp is None:
+            return await ctx.reply("I couldn't find that country, use its ISO code.")
+        if country_code != "Global":
+            embed.title = f"Covid statistics for {resp['Country']}"
         # r = requests.get("https://api.covid19api.com/summary")
         # r= r.json()["Global"]
         embed.add_field(name="New Cases", value=f'{resp["NewConfirmed"]:,}')
@@ -1335,7 +1046,7 @@ class Fun(commands.Cog, name="fun"):
         embed.add_field(name="Total Deaths", value=f'{resp["TotalDeaths"]:,}')
         embed.add_field(name="Total Recovered", value=f'{resp["TotalRecovered"]:,}')
         embed.set_footer(
-            text="Heads up! - Individual countries may not report the same information in the same way."
+            text=f"Heads up! - Individual countries may not report the same information in the same way. | {http.freshness(fetched_at)}"
         )
         await ctx.send(embed=embed)
 
@@ -1467,14 +1178,15 @@ class Fun(commands.Cog, name="fun"):
 
     async def api_img_creator(self, ctx, url, filename, content=None):
         async with ctx.channel.typing():
-            req = await http.get(url, res_method="read")
+            try:
+                img = await http.relay(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError, http.PayloadTooLarge):
+                img = None
 
-            if req is None:
+            if img is None:
                 return await ctx.reply("I couldn't create the image")
 
-            bio = BytesIO(req)
-            bio.seek(0)
-            await ctx.reply(content=content, file=discord.File(bio, filename=filename))
+            await ctx.reply(content=content, file=discord.File(img, filename=filename))
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @commands.command(aliases=["hit", "punch", "yeet"], usage="`tp!slap @user`")
@@ -1496,7 +1208,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("slap"))
+            embed.set_image(url=await http.nekos_img("slap"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1507,7 +1219,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("slap"))
+            embed.set_image(url=await http.nekos_img("slap"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1531,7 +1243,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("poke"))
+            embed.set_image(url=await http.nekos_img("poke"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1542,7 +1254,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("poke"))
+            embed.set_image(url=await http.nekos_img("poke"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1582,7 +1294,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("hug"))
+            embed.set_image(url=await http.nekos_img("hug"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1593,7 +1305,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("hug"))
+            embed.set_image(url=await http.nekos_img("hug"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1623,7 +1335,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("kiss"))
+            embed.set_image(url=await http.nekos_img("kiss"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1635,7 +1347,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("kiss"))
+            embed.set_image(url=await http.nekos_img("kiss"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1659,7 +1371,7 @@ class Fun(commands.Cog, name="fun"):
             timestamp=ctx.message.created_at,
         )
 
-        embed.set_image(url=nekos.img("smug"))
+        embed.set_image(url=await http.nekos_img("smug"))
         embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
         await ctx.send(embed=embed)
 
@@ -1683,7 +1395,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("pat"))
+            embed.set_image(url=await http.nekos_img("pat"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1694,7 +1406,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("pat"))
+            embed.set_image(url=await http.nekos_img("pat"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1718,7 +1430,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("tickle"))
+            embed.set_image(url=await http.nekos_img("tickle"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
         else:
@@ -1729,7 +1441,7 @@ class Fun(commands.Cog, name="fun"):
                 colour=EMBED_COLOUR,
                 timestamp=ctx.message.created_at,
             )
-            embed.set_image(url=nekos.img("tickle"))
+            embed.set_image(url=await http.nekos_img("tickle"))
             embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
             await ctx.send(embed=embed)
 
@@ -1783,6 +1495,10 @@ class Fun(commands.Cog, name="fun"):
             )
             await ctx.send(embed=embed)
 
+    async def fetch_hot(self, subs):
+        subreddit = await self.reddit.subreddit(random.choice(subs))
+        return [submission async for submission in subreddit.hot(limit=50)]
+
     @commands.guild_only()
     @commands.command(usage="`tp!meme`")
     @commands.bot_has_permissions(embed_links=True)
@@ -1796,11 +1512,10 @@ class Fun(commands.Cog, name="fun"):
 
         async with ctx.channel.typing():
             subs = ["dankmemes", "memes", "ComedyCemetery"]
-            subreddit = await self.reddit.subreddit(random.choice(subs))
-            all_subs = []
-            top = subreddit.hot(limit=50)
-            async for submission in top:
-                all_subs.append(submission)
+            try:
+                all_subs = await http.upstreams["reddit"].call(self.fetch_hot, subs)
+            except http.upstreams["reddit"].errors:
+                return await ctx.reply("Reddit seems to be down right now...")
             random_sub = random.choice(all_subs)
             name = random_sub.title
             url = random_sub.url
@@ -1843,11 +1558,10 @@ class Fun(commands.Cog, name="fun"):
 
         async with ctx.channel.typing():
             subs = ["okaybuddyretard", "gayspiderbrothel", "shitposting"]
-            subreddit = await self.reddit.subreddit(random.choice(subs))
-            all_subs = []
-            top = subreddit.hot(limit=50)
-            async for submission in top:
-                all_subs.append(submission)
+            try:
+                all_subs = await http.upstreams["reddit"].call(self.fetch_hot, subs)
+            except http.upstreams["reddit"].errors:
+                return await ctx.reply("Reddit seems to be down right now...")
             random_sub = random.choice(all_subs)
             name = random_sub.title
             url = random_sub.url
@@ -2053,30 +1767,30 @@ class Fun(commands.Cog, name="fun"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://api.thedogapi.com/v1/images/search") as r:
-                data = await r.json()
-                breeds = data[0]["breeds"]
-                weight = (
-                    "Weight Unavailable"
-                    if not breeds
-                    else "\n".join(
-                        [a.title() + ": " + b for a, b in breeds[0]["weight"].items()]
-                    )
-                )
-                embed = discord.Embed(
-                    title="Enjoy this doggo <3",
-                    url="https://lunardev.group/dashboard",
-                    description=f"**Name**\n{'Name Unavailable' if not breeds else breeds[0]['name']}\n\n**Weight**\n{weight}",
-                    colour=EMBED_COLOUR,
-                    timestamp=ctx.message.created_at,
-                )
-                embed.set_image(url=data[0]["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                    icon_url=ctx.author.avatar,
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("dogapi", "/v1/images/search"), res_method="json", no_cache=True
+        )
+        breeds = data[0]["breeds"]
+        weight = (
+            "Weight Unavailable"
+            if not breeds
+            else "\n".join(
+                [a.title() + ": " + b for a, b in breeds[0]["weight"].items()]
+            )
+        )
+        embed = discord.Embed(
+            title="Enjoy this doggo <3",
+            url="https://lunardev.group/dashboard",
+            description=f"**Name**\n{'Name Unavailable' if not breeds else breeds[0]['name']}\n\n**Weight**\n{weight}",
+            colour=EMBED_COLOUR,
+            timestamp=ctx.message.created_at,
+        )
+        embed.set_image(url=data[0]["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+            icon_url=ctx.author.avatar,
+        )
+        await ctx.send(embed=embed)
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @commands.command(aliases=["meow", "catto", "kitty"], usage="`tp!cat`")
@@ -2088,21 +1802,21 @@ class Fun(commands.Cog, name="fun"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://api.thecatapi.com/v1/images/search") as r:
-                data = await r.json()
-                embed = discord.Embed(
-                    title="Enjoy this cat <3",
-                    url="https://lunardev.group/dashboard",
-                    colour=EMBED_COLOUR,
-                    timestamp=ctx.message.created_at,
-                )
-                embed.set_image(url=data[0]["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                    icon_url=ctx.author.avatar,
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("catapi", "/v1/images/search"), res_method="json", no_cache=True
+        )
+        embed = discord.Embed(
+            title="Enjoy this cat <3",
+            url="https://lunardev.group/dashboard",
+            colour=EMBED_COLOUR,
+            timestamp=ctx.message.created_at,
+        )
+        embed.set_image(url=data[0]["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+            icon_url=ctx.author.avatar,
+        )
+        await ctx.send(embed=embed)
 
     @commands.command(usage="`tp!birb`")
     @commands.bot_has_permissions(embed_links=True)
@@ -2122,7 +1836,7 @@ class Fun(commands.Cog, name="fun"):
             url=f"{Website}",
         )
 
-        embed.set_image(url=nekos.img("goose"))
+        embed.set_image(url=await http.nekos_img("goose"))
         embed.set_footer(text=f" {ctx.author}", icon_url=ctx.author.avatar)
         await ctx.send(embed=embed)
 
@@ -2146,11 +1860,10 @@ class Fun(commands.Cog, name="fun"):
         else:
             await ctx.send("What do you want to pay respects to?")
 
-            def check(m):
-                return m.author == ctx.author and m.channel == ctx.channel
-
             try:
-                pressf = await ctx.bot.wait_for("message", timeout=120.0, check=check)
+                pressf = await self.bot.prompts.wait(
+                    ctx.channel.id, ctx.author.id, timeout=120.0
+                )
             except asyncio.TimeoutError:
                 return await ctx.send("You took too long to reply.")
 
@@ -2159,9 +1872,13 @@ class Fun(commands.Cog, name="fun"):
         message = await ctx.send(
             f"Everyone, let's pay respects to **{filter_mass_mentions(answer)}**! Press the f reaction on this message to pay respects."
         )
-        await message.add_reaction("\U0001f1eb")
         self.channels[str(ctx.channel.id)] = {"msg_id": message.id, "reacted": []}
+        self.bot.reactions.register(
+            message.id, self.PressF, emojis=["\U0001f1eb"], timeout=130, owner=self
+        )
+        await message.add_reaction("\U0001f1eb")
         await asyncio.sleep(120)
+        self.bot.reactions.unregister(message.id)
         try:
             await message.delete()
         except (discord.errors.NotFound, discord.errors.Forbidden):
@@ -2173,25 +1890,18 @@ class Fun(commands.Cog, name="fun"):
         )
         del self.channels[str(ctx.channel.id)]
 
-    @commands.Cog.listener(name="on_reaction_add")
-    async def PressF(self, reaction, user):
-        if str(reaction.message.channel.id) not in self.channels:
+    async def PressF(self, payload):
+        session = self.channels.get(str(payload.channel_id))
+        if session is None or session["msg_id"] != payload.message_id:
             return
-        if (
-            self.channels[str(reaction.message.channel.id)]["msg_id"]
-            != reaction.message.id
-        ):
+        if payload.user_id in session["reacted"]:
             return
-        if user.id == self.bot.user.id:
+        session["reacted"].append(payload.user_id)
+        user = payload.member or self.bot.get_user(payload.user_id)
+        channel = self.bot.get_channel(payload.channel_id)
+        if user is None or channel is None:
             return
-        if user.id not in self.channels[str(reaction.message.channel.id)]["reacted"]:
-            if str(reaction.emoji) == "\U0001f1eb":
-                await reaction.message.channel.send(
-                    f"**{user.name}** has paid their respects."
-                )
-                self.channels[str(reaction.message.channel.id)]["reacted"].append(
-                    user.id
-                )
+        await channel.send(f"**{user.name}** has paid their respects.")
 
     @commands.command(usage="`tp!lenny`")
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
@@ -2216,9 +1926,14 @@ class Fun(commands.Cog, name="fun"):
 
         async with ctx.channel.typing():
             try:
-                url = await http.get(
-                    f"https://api.urbandictionary.com/v0/define?term={search}",
-                    res_method="json",
+                url, _ = await self.urban_cache.get_or_fetch(
+                    search.lower(),
+                    functools.partial(
+                        http.get,
+                        http.url("urban", f"/v0/define?term={search}"),
+                        res_method="json",
+                        no_cache=True,
+                    ),
                 )
             except Exception:
                 return await ctx.reply(
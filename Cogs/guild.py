@@ -14,17 +14,14 @@
 from ast import alias
 import asyncio
 import json
-import re
 from datetime import datetime
 from io import BytesIO
 from typing import Union
 
-import aiohttp
 import discord
 from discord.ext import commands
 from index import (
     EMBED_COLOUR,
-    TOP_GG_TOKEN,
     Vote,
     Website,
     config,
@@ -34,9 +31,52 @@ from index import (
     suggestion_yes,
 )
 from Manager.commandManager import cmd
-from utils import default, permissions
+from utils import default, permissions, scanner, snipes, topgg
 from .Utils import error_embed, success_embed
 
+BotList_Servers = [
+    336642139381301249,
+    716445624517656727,
+    523523486719803403,
+    658262945234681856,
+    608711879858192479,
+    446425626988249089,
+    387812458661937152,
+    414429834689773578,
+    645281161949741064,
+    527862771014959134,
+    733135938347073576,
+    766993740463603712,
+    724571620676599838,
+    568567800910839811,
+    641574644578648068,
+    532372609476591626,
+    374071874222686211,
+    789934742128558080,
+    694140006138118144,
+    743348125191897098,
+    110373943822540800,
+    491039338659053568,
+    891226286347923506,
+]
+
+# Baby Shaking Zone media only channels
+MEDIA_ONLY_CHANNELS = [755722577279713281, 780157565010313258]
+# Lunar Development announcements, only these people can talk there
+ANNOUNCEMENTS_CHANNEL = 755722577049026562
+ANNOUNCEMENTS_WHITELIST = [
+    599063034329038889,
+    101118549958877184,
+    417052810161684511,
+    393996898945728523,
+    454421372911878145,
+    146151306216734720,
+    343048549744902144,
+    683530527239962627,
+    828858385113939969,
+    678395576525652001,
+]
+
 
 class DiscordCmds(commands.Cog, name="discord"):
     """Server related things :D"""
@@ -44,185 +84,145 @@ class DiscordCmds(commands.Cog, name="discord"):
     def __init__(self, bot):
         self.bot = bot
         self.config = default.get("config.json")
-        self.bot.sniped_messages = {}
-        self.bot.edit_sniped_messages = {}
-        self.halloween_re = re.compile(r"h(a|4)(l|1)(l|1)(o|0)w(e|3)(e|3)n", re.I)
-        # self.october_re = re.compile(r"o(c|4)(t|7)(o|0)(b|2)(e|3)(r|1)", re.I)
-        self.spooky_re = re.compile(r"(s|5)(p|7)(o|0)(o|0)(k|9)(y|1)", re.I)
-        self.nword_re = re.compile(
-            r"\b(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)\b", re.I
-        )
+        self.sniped = snipes.get_store("deleted")
+        self.edit_sniped = snipes.get_store("edited")
         self.message_cooldown = commands.CooldownMapping.from_cooldown(
             1.0, 3.0, commands.BucketType.user
         )
+        # Only guild messages in October, outside of the bot list servers.
+        self.bot.pipeline.register(
+            "spooky",
+            self.spooky,
+            dm=False,
+            months=[10],
+            matches=["halloween", "spooky"],
+            bots=True,
+            exclude_guilds=BotList_Servers,
+        )
+        self.bot.pipeline.register(
+            "onlymedia", self.onlymedia, channels=MEDIA_ONLY_CHANNELS, bots=True
+        )
+        self.bot.pipeline.register(
+            "OwnerOwnly", self.OwnerOwnly, channels=[ANNOUNCEMENTS_CHANNEL]
+        )
+        self.bot.jobs.register("massrole", self.massrole_step)
+        self.bot.jobs.register("massrole_remove", self.massrole_remove_step)
+
+    def cog_unload(self):
+        for name in ("spooky", "onlymedia", "OwnerOwnly"):
+            self.bot.pipeline.unregister(name)
+        self.bot.jobs.unregister("massrole")
+        self.bot.jobs.unregister("massrole_remove")
 
-    @commands.Cog.listener(name="on_message")
     async def spooky(self, message):
-        BotList_Servers = [
-            336642139381301249,
-            716445624517656727,
-            523523486719803403,
-            658262945234681856,
-            608711879858192479,
-            446425626988249089,
-            387812458661937152,
-            414429834689773578,
-            645281161949741064,
-            527862771014959134,
-            733135938347073576,
-            766993740463603712,
-            724571620676599838,
-            568567800910839811,
-            641574644578648068,
-            532372609476591626,
-            374071874222686211,
-            789934742128558080,
-            694140006138118144,
-            743348125191897098,
-            110373943822540800,
-            491039338659053568,
-            891226286347923506,
-        ]
         bucket = self.message_cooldown.get_bucket(message)
         retry_after = bucket.update_rate_limit()
-        if datetime.today().month == 10:  # and datetime.today().day == 31:
-            if self.halloween_re.search(message.content.lower()):
-                if retry_after:
-                    return
-                if message.guild.id in BotList_Servers:
-                    return
-                else:
-                    try:
-                        await message.add_reaction("🎃")
-                        await asyncio.sleep(1)
-                    except:
-                        pass
-            if self.spooky_re.search(message.content.lower()):
-                if retry_after:
-                    return
-                if message.guild.id in BotList_Servers:
-                    return
-                else:
-                    try:
-                        await message.add_reaction("👻")
-                        await asyncio.sleep(1)
-                    except:
-                        pass
+        found = scanner.scan(message.content)
+        if "halloween" in found:
+            if retry_after:
+                return
+            try:
+                await message.add_reaction("🎃")
+                await asyncio.sleep(1)
+            except:
+                pass
+        if "spooky" in found:
+            if retry_after:
+                return
+            try:
+                await message.add_reaction("👻")
+                await asyncio.sleep(1)
+            except:
+                pass
 
     @commands.Cog.listener()
     async def on_message_delete(self, message):
-        if self.nword_re.search(message.content.lower()):
+        if "nword" in scanner.scan(message.content):
             return
         if message.author.bot:
             return
-        try:
-            self.bot.sniped_messages[message.guild.id, message.channel.id] = (
-                message.content,
-                message.author,
-                message.channel.name,
-                message.created_at,
-                message.attachments,
-            )
-        except:
-            pass
+        if message.guild is None:
+            return
+        self.sniped.push(
+            (message.guild.id, message.channel.id), snipes.Snipe.from_message(message)
+        )
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
-        bad_words = ["n word"]
-        for word in bad_words:
-            if word in before.content.lower() or word in after.content.lower():
-                return
-            if before.author.bot:
-                return
-            try:
-                self.bot.edit_sniped_messages[before.guild.id, before.channel.id] = (
-                    before.content,
-                    after.content,
-                    before.author,
-                    before.channel.name,
-                )
-            except AttributeError:
-                pass
+        if "badwords" in scanner.scan(before.content) or "badwords" in scanner.scan(
+            after.content
+        ):
+            return
+        if before.author.bot or before.content == after.content:
+            return
+        if before.guild is None:
+            return
+        self.edit_sniped.push(
+            (before.guild.id, before.channel.id),
+            snipes.Snipe.from_message(before, edited=after.content),
+        )
 
-    @commands.command(aliases=["s"], usage="`tp!s`")
+    @commands.command(aliases=["s"], usage="`tp!s [how far back]`")
     @commands.bot_has_permissions(embed_links=True)
     @commands.cooldown(1, 5, commands.BucketType.channel)
-    async def snipe(self, ctx):
-        """Snipe recently deleted messages to see what someone said."""
+    async def snipe(self, ctx, number: int = 1):
+        """Snipe recently deleted messages to see what someone said.
+        tp!snipe 3 shows the third most recent one."""
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
         if cmdEnabled:
             await ctx.send(":x: This command has been disabled!")
             return
 
-        try:
-            (
-                contents,
-                author,
-                channel_name,
-                time,
-                attachments,
-            ) = self.bot.sniped_messages[ctx.guild.id, ctx.channel.id]
-
-            files = ""
-            for file in attachments:
-                files += f"[{file.filename}]({file.proxy_url})" + "\n"
-            embed = discord.Embed(
-                title=f"{self.bot.user.name}",
-                url=f"{Website}",
-                description=contents,
-                color=EMBED_COLOUR,
-                timestamp=time,
-            )
-            embed.set_author(
-                name=f"{author.name}#{author.discriminator}", icon_url=author.avatar
-            )
-            embed.add_field(
-                name="Attachments",
-                value=files[:-1] if len(attachments) != 0 else "None",
-            )
-            embed.set_footer(text=f"Deleted in #{channel_name}")
-
-            await ctx.send(embed=embed)
-        except:
+        snipe = self.sniped.get((ctx.guild.id, ctx.channel.id), number - 1)
+        if snipe is None:
             await ctx.send("Nothing has been recently deleted.")
+            return
 
-    @commands.command(aliases=["es"], usage="`tp!es`")
+        files = "\n".join(f"[{filename}]({url})" for filename, url in snipe.attachments)
+        embed = discord.Embed(
+            title=f"{self.bot.user.name}",
+            url=f"{Website}",
+            description=snipe.content,
+            color=EMBED_COLOUR,
+            timestamp=snipe.created_at,
+        )
+        embed.set_author(name=snipe.author_name, icon_url=snipe.avatar_url)
+        embed.add_field(name="Attachments", value=files or "None")
+        embed.set_footer(text=f"Deleted in #{snipe.channel_name}")
+
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["es"], usage="`tp!es [how far back]`")
     @commands.bot_has_permissions(embed_links=True)
     @commands.cooldown(1, 5, commands.BucketType.user)
-    async def editsnipe(self, ctx):
-        """Snipe edited messages to see what the message said before."""
+    async def editsnipe(self, ctx, number: int = 1):
+        """Snipe edited messages to see what the message said before.
+        tp!editsnipe 3 shows the third most recent one."""
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
         if cmdEnabled:
             await ctx.send(":x: This command has been disabled!")
             return
 
-        try:
-            (
-                before_content,
-                after_content,
-                author,
-                channel_name,
-            ) = self.bot.edit_sniped_messages[ctx.guild.id, ctx.channel.id]
-
-            embed = discord.Embed(
-                title=f"{self.bot.user.name}",
-                url=f"{Website}",
-                description=f"**Before:**\n{before_content}\n\n**After:**\n{after_content}",
-                color=EMBED_COLOUR,
-            )
-            embed.set_author(
-                name=f"{author.name}#{author.discriminator}", icon_url=author.avatar
-            )
-            embed.set_footer(text=f"Edited in #{channel_name}")
-            embed.add_field(
-                name="‎‎‎‎‎‎",
-                value=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote}) ",
-                inline=False,
-            )
-
-            await ctx.send(embed=embed)
-        except:
+        snipe = self.edit_sniped.get((ctx.guild.id, ctx.channel.id), number - 1)
+        if snipe is None:
             await ctx.send("Nothing has been recently edited.")
+            return
+
+        embed = discord.Embed(
+            title=f"{self.bot.user.name}",
+            url=f"{Website}",
+            description=f"**Before:**\n{snipe.content}\n\n**After:**\n{snipe.edited}",
+            color=EMBED_COLOUR,
+        )
+        embed.set_author(name=snipe.author_name, icon_url=snipe.avatar_url)
+        embed.set_footer(text=f"Edited in #{snipe.channel_name}")
+        embed.add_field(
+            name="‎‎‎‎‎‎",
+            value=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote}) ",
+            inline=False,
+        )
+
+        await ctx.send(embed=embed)
 
     @commands.command(usage="`tp!listemoji true/false`")
     @commands.guild_only()
@@ -632,25 +632,15 @@ You can give yourself the colors by doing `tp!colorme <color>`. \nExample: `tp!c
             return
 
         user = user or ctx.author
-        async with aiohttp.ClientSession() as s:
-            async with s.get(
-                f"https://top.gg/api/bots/723726581864071178/check?userid={user.id}",
-                headers={"Authorization": TOP_GG_TOKEN},
-            ) as r:
-                pain = await r.json()
-                if pain["voted"] == 1:
-                    voted = True
-                else:
-                    voted = False
-                if voted:
-                    title = "Poggers!"
-                    description = "You have voted in the last **12** hours."
-                    embed = success_embed(title, description)
-                else:
-                    title = "Not pog!"
-                    description = f"You haven't voted in the last **12** hours.\nClick **[here]({Vote})** to vote!"
-                    embed = error_embed(title, description)
-                return await ctx.reply(embed=embed)
+        if await topgg.has_voted(user.id):
+            title = "Poggers!"
+            description = "You have voted in the last **12** hours."
+            embed = success_embed(title, description)
+        else:
+            title = "Not pog!"
+            description = f"You haven't voted in the last **12** hours.\nClick **[here]({Vote})** to vote!"
+            embed = error_embed(title, description)
+        return await ctx.reply(embed=embed)
 
     @commands.cooldown(1, 5, commands.BucketType.user)
     @commands.command(usage="`tp!roleinfo role`")
@@ -707,23 +697,29 @@ You can give yourself the colors by doing `tp!colorme <color>`. \nExample: `tp!c
             await ctx.send(":x: This command has been disabled!")
             return
 
-        added = 0
         if role.is_default():
             return await ctx.reply(f"Cant give a default role to users! {role.mention}")
         if role.position > ctx.author.top_role.position:
             return await ctx.reply(
                 f"You cant give a role that is higher than your top role! {role.mention}"
             )
-        async with ctx.channel.typing():
-            msg_1 = await ctx.send("Working...")
-            for member in ctx.guild.members:
-                if not member.bot:
-                    if role not in member.roles:
-                        await member.add_roles(role)
-                        added += 1
-            await msg_1.edit(
-                content=f"**{role.name}** role was given to {added} users in the server!"
-            )
+        if not ctx.guild.chunked:
+            await ctx.guild.chunk()
+        await self.bot.jobs.submit(
+            ctx,
+            "massrole",
+            f"Giving **{role.name}** to everyone",
+            [m.id for m in ctx.guild.members if not m.bot and role not in m.roles],
+            {
+                "role": role.id,
+                "reason": default.responsible(ctx.author, ctx.command.name),
+            },
+        )
+
+    async def massrole_step(self, guild, member_id, data):
+        await self.bot.http.add_role(
+            guild.id, member_id, data["role"], reason=data["reason"]
+        )
 
     @commands.cooldown(1, 5, commands.BucketType.user)
     @commands.command(alias=["msr"], usage="`tp!massrole_remove role`", hidden=True)
@@ -737,22 +733,29 @@ You can give yourself the colors by doing `tp!colorme <color>`. \nExample: `tp!c
             await ctx.send(":x: This command has been disabled!")
             return
 
-        removed = 0
         if role.is_default():
             return await ctx.reply(f"Cant remove a default role from all users!")
         if role.position > ctx.author.top_role.position:
             return await ctx.reply(
                 f"You cant remove a role that is higher than your top role!"
             )
-        async with ctx.channel.typing():
-            msg_1 = await ctx.send("Working...")
-            for member in ctx.guild.members:
-                if role in member.roles:
-                    await member.remove_roles(role)
-                    removed += 1
-            await msg_1.edit(
-                content=f"**{role.name}** role was removed from {removed} users in this server!"
-            )
+        if not ctx.guild.chunked:
+            await ctx.guild.chunk()
+        await self.bot.jobs.submit(
+            ctx,
+            "massrole_remove",
+            f"Removing **{role.name}** from everyone",
+            [m.id for m in role.members],
+            {
+                "role": role.id,
+                "reason": default.responsible(ctx.author, ctx.command.name),
+            },
+        )
+
+    async def massrole_remove_step(self, guild, member_id, data):
+        await self.bot.http.remove_role(
+            guild.id, member_id, data["role"], reason=data["reason"]
+        )
 
     @commands.cooldown(1, 5, commands.BucketType.user)
     @commands.command(aliases=["serverinfo"], usage="`tp!serverinfo`")
@@ -997,34 +1000,14 @@ You can give yourself the colors by doing `tp!colorme <color>`. \nExample: `tp!c
 
     #######Baby Shaking Zone Media Only Channel#########
 
-    @commands.Cog.listener(name="on_message")
     async def onlymedia(self, message):
-        if (
-            message.channel.id in [755722577279713281, 780157565010313258]
-            and not message.attachments
-        ):
+        if not message.attachments:
             await message.delete()
 
     ####Lunar Development prevent other people from talking in announcements####
-    @commands.Cog.listener(name="on_message")
     async def OwnerOwnly(self, message):
-        if message.author.bot:
-            return
-        whitelist = [
-            599063034329038889,
-            101118549958877184,
-            417052810161684511,
-            393996898945728523,
-            454421372911878145,
-            146151306216734720,
-            343048549744902144,
-            683530527239962627,
-            828858385113939969,
-            678395576525652001,
-        ]
-        if message.channel.id == 755722577049026562:
-            if message.author.id not in whitelist:
-                await message.delete()
+        if message.author.id not in ANNOUNCEMENTS_WHITELIST:
+            await message.delete()
 
 
 ########################################################################
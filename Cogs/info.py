@@ -12,17 +12,17 @@
 ### IMPORTANT ANNOUNCEMENT ###
 
 import datetime
-import json
+import functools
 import os
 import random
 import time
 from datetime import datetime, timedelta
 from typing import List, Union
 
+import aiohttp
 import discord
 import googletrans
 import psutil
-import requests
 from discord.ext import commands
 from index import (
     EMBED_COLOUR,
@@ -33,7 +33,7 @@ from index import (
     mydb_n,
 )
 from Manager.commandManager import cmd
-from utils import default, permissions
+from utils import default, http, permissions
 
 
 def list_items_in_english(l: List[str], oxford_comma: bool = True) -> str:
@@ -58,6 +58,7 @@ class Information(commands.Cog, name="info"):
         # self.thanks = default.get("thanks.json")
         # self.blist_api = blist.Blist(bot, token=self.config.blist)
         self.process = psutil.Process(os.getpid())
+        self.weather_cache = http.TTLCache(ttl=300, maxsize=256)
 
     def cog_unload(self):
         self.process.stop()
@@ -68,7 +69,15 @@ class Information(commands.Cog, name="info"):
         del data["pressure"]
         return data
 
-    def weather_message(self, data, location):
+    async def fetch_weather(self, location):
+        URL = http.url(
+            "weather",
+            f"/data/2.5/weather?q={location}&appid={config.Weather}&units=imperial",
+        )
+        data = await http.get(URL, res_method="json", no_cache=True)
+        return self.parse_weather_data(data)
+
+    def weather_message(self, data, location, fetched_at):
         location = location.title()
         embed = discord.Embed(
             title=f"{location} Weather",
@@ -91,6 +100,7 @@ class Information(commands.Cog, name="info"):
         embed.add_field(
             name=f"Feels like", value=f"{str(data['feels_like'])}° F", inline=False
         )
+        embed.set_footer(text=http.freshness(fetched_at))
         return embed
 
     def error_message(self, location):
@@ -122,12 +132,13 @@ class Information(commands.Cog, name="info"):
             await ctx.send("Please send a valid location.")
             return
 
-        URL = f"http://api.openweathermap.org/data/2.5/weather?q={location.lower()}&appid={config.Weather}&units=imperial"
         try:
-            data = json.loads(requests.get(URL).content)
-            data = self.parse_weather_data(data)
-            await ctx.send(embed=self.weather_message(data, location))
-        except KeyError:
+            data, fetched_at = await self.weather_cache.get_or_fetch(
+                location.lower(),
+                functools.partial(self.fetch_weather, location.lower()),
+            )
+            await ctx.send(embed=self.weather_message(data, location, fetched_at))
+        except (KeyError, aiohttp.ClientError, ValueError):
             await ctx.send(embed=self.error_message(location))
 
     @commands.command(usage="`tp!temp fahrenheit`")
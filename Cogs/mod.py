@@ -15,16 +15,16 @@ import argparse
 import asyncio
 import json
 import os
-import random
 import re
 import time
 from collections import Counter
-from typing import Union
+from typing import Optional, Union
 
 import discord
 from discord.ext import commands
 from index import EMBED_COLOUR, Website, config, delay, cursor_n, mydb_n
 from utils import checks, default, permissions
+from utils.time import ShortTime
 from Manager.commandManager import cmd
 
 
@@ -170,6 +170,12 @@ def can_mute():
     return commands.check(predicate)
 
 
+# Leading characters that sort a name to the top of the member list.
+HOIST_CHARS = frozenset("!.-_*()=+^&~#$:;?<>{}[]|0123456789")
+# Background jobs run by this cog, each with a <kind>_step method.
+JOB_KINDS = ("hoist", "reset_names", "massban", "unbanall")
+
+
 class Moderator(commands.Cog, name="mod"):
     """Commands for moderators to keep your server safe"""
 
@@ -194,31 +200,47 @@ class Moderator(commands.Cog, name="mod"):
         # for row in res:
         #     blist.append(int(row[0]))
         self.blacklist = blist
-        self.prefixes = None
+        # guild id -> prefix, so commands don't query the database per message.
+        self.prefixes = {}
+        self.bot.pipeline.register("dm_relay", self.relay_dm, dm=True)
+        self.bot.scheduler.register("unmute", self.expire_mute)
+        for kind in JOB_KINDS:
+            self.bot.jobs.register(kind, getattr(self, f"{kind}_step"))
         # with open('blacklist.json') as f:
         #     self.blacklist = json.load(f)
 
-    def get_prefix(self, bot, message):
-        prefix = None
+    def cog_unload(self):
+        self.bot.pipeline.unregister("dm_relay")
+        self.bot.scheduler.unregister("unmute")
+        for kind in JOB_KINDS:
+            self.bot.jobs.unregister(kind)
+
+    def guild_prefix(self, guild_id):
+        """The server's prefix, only looked up in the database the first time"""
+        prefix = self.prefixes.get(guild_id)
+        if prefix is not None:
+            return prefix
         try:
             cursor_n.execute(
-                f"SELECT prefix FROM public.guilds WHERE guildId = '{message.guild.id}'"
-            )
-        except:
-            pass
-        try:
-            for row in cursor_n.fetchall():
-                self.prefixes = row[0]
-            prefix = (
-                self.prefixes
-                if getattr(message, "guild", None)
-                else self.default_prefix
+                f"SELECT prefix FROM public.guilds WHERE guildId = '{guild_id}'"
             )
+            row = cursor_n.fetchone()
             mydb_n.commit()
         except:
-            pass
+            return self.default_prefix
+        prefix = row[0] if row and row[0] else self.default_prefix
+        self.prefixes[guild_id] = prefix
         return prefix
 
+    def get_prefix(self, bot, message):
+        if getattr(message, "guild", None) is None:
+            return self.default_prefix
+        return self.guild_prefix(message.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.prefixes.pop(guild.id, None)
+
     async def create_embed(self, ctx, error):
         embed = discord.Embed(
             title=f"Error Caught!", color=discord.Colour.red(), description=f"{error}"
@@ -226,8 +248,7 @@ class Moderator(commands.Cog, name="mod"):
         embed.set_thumbnail(url=self.bot.user.avatar)
         await ctx.send(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    async def relay_dm(self, message):
         if message.guild is None:
             if message.author == self.bot.user:
                 return
@@ -381,13 +402,25 @@ class Moderator(commands.Cog, name="mod"):
         await ctx.send("Raid mode disabled.")
 
     async def _basic_cleanup_strategy(self, ctx, search):
-        count = 0
-        async for msg in ctx.history(limit=search, before=ctx.message):
-            if msg.author == ctx.me:
-                await asyncio.sleep(0.10)
-                await msg.delete()
-                count += 1
-        return {"Bot": count}
+        # Bulk delete needs Manage Messages, the bot's own messages can go one by one.
+        deleted = await ctx.channel.purge(
+            limit=search,
+            before=ctx.message,
+            check=lambda m: m.author == ctx.me,
+            bulk=False,
+        )
+        return {"Bot": len(deleted)}
+
+    async def _complex_cleanup_strategy(self, ctx, search):
+        prefixes = tuple({self.guild_prefix(ctx.guild.id).lower(), self.default_prefix})
+
+        def check(m):
+            return m.author == ctx.me or m.content.lower().startswith(prefixes)
+
+        # purge bulk deletes up to 100 at a time, and only falls back to single
+        # deletes for messages older than two weeks.
+        deleted = await ctx.channel.purge(limit=search, before=ctx.message, check=check)
+        return Counter(m.author.display_name for m in deleted)
 
     @commands.command(usage="`tp!cleanup`")
     @commands.cooldown(rate=1, per=4.5, type=commands.BucketType.user)
@@ -413,8 +446,8 @@ class Moderator(commands.Cog, name="mod"):
             pass
 
         strategy = self._basic_cleanup_strategy
-        # if ctx.me.permissions_in(ctx.channel).manage_messages:
-        #    strategy = self._complex_cleanup_strategy
+        if ctx.channel.permissions_for(ctx.me).manage_messages:
+            strategy = self._complex_cleanup_strategy
 
         spammers = await strategy(ctx, search)
         deleted = sum(spammers.values())
@@ -477,12 +510,13 @@ class Moderator(commands.Cog, name="mod"):
                 timestamp=ctx.message.created_at,
             )
             await ctx.send(embed=new_prefix)
+            cursor_n.execute(
+                f"UPDATE public.guilds SET prefix = '{new}' WHERE guildId = '{ctx.guild.id}'"
+            )
+            mydb_n.commit()
+            self.prefixes[ctx.guild.id] = new
             try:
                 await ctx.guild.me.edit(nick=f"[{new}] {self.bot.user.name}")
-                cursor_n.execute(
-                    f"UPDATE public.guilds SET prefix = '{new}' WHERE guildId = '{ctx.guild.id}'"
-                )
-                mydb_n.commit()
             except discord.errors.Forbidden:
                 await ctx.send(
                     "I couldn't update my nickname, the prefix has changed though."
@@ -634,16 +668,13 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        def check(m):
-            return m.author.id == ctx.author.id
-
         with open("colors.json", "r") as f:
             data = json.load(f)
             message = await ctx.send(
                 "***READ THIS BEFORE YOU DO ANYTHING!!!***\nTo STOP making roles send `cancel`! If you say anything before this prompt changes the process will also stop. If you for some reason want to remove the color roles after I get done, please run `tp!rainbowremove`."
             )
         try:
-            msg = await self.bot.wait_for("message", check=check, timeout=20)
+            msg = await self.bot.prompts.wait(ctx.channel.id, ctx.author.id, timeout=20)
             if msg.content == "cancel":
                 return await message.edit(content="Okay, cancled.")
             else:
@@ -682,9 +713,6 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        def check(m):
-            return m.author.id == ctx.author.id and ctx.message.content
-
         with open("colors.json", "r") as f:
             data = json.load(f)
         async with ctx.channel.typing():
@@ -692,7 +720,9 @@ class Moderator(commands.Cog, name="mod"):
                 "Alright, I'm about to delete all the color roles. You have 10 seconds to send `cancel` to stop me."
             )
             try:
-                msg = await self.bot.wait_for("message", check=check, timeout=10)
+                msg = await self.bot.prompts.wait(
+                    ctx.channel.id, ctx.author.id, timeout=10
+                )
                 if msg.content == "cancel":
                     return await m.edit(content="Okay, cancled.")
             except asyncio.TimeoutError:
@@ -823,60 +853,23 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        chars = [
-            "!",
-            ".",
-            "-",
-            "_",
-            "*",
-            "(",
-            ")",
-            "=",
-            "+",
-            "^",
-            "&",
-            "~",
-            "#",
-            "$",
-            ":",
-            ";",
-            "?",
-            "<",
-            ">",
-            "{",
-            "}",
-            "[",
-            "]",
-            "|",
-        ]
-        temp = {}
-        failed = 0
-
-        initial = await ctx.send(
-            "Kk, changing peoples names. This'll take some time so please be patient!"
+        if not ctx.guild.chunked:
+            await ctx.guild.chunk()
+        await self.bot.jobs.submit(
+            ctx,
+            "hoist",
+            "Unhoisting nicknames",
+            [
+                m.id
+                for m in ctx.guild.members
+                if not m.bot and m.display_name[:1] in HOIST_CHARS
+            ],
+            {"reason": default.responsible(ctx.author, ctx.command.name)},
         )
-        async with ctx.typing():
-            for member in ctx.guild.members:
-                if not member.bot:
-                    for char in chars:
-                        if member.display_name.startswith(char):
-                            try:
-                                await member.edit(nick="No Hoisting")
-                                await asyncio.sleep(random.randint(1, 5))
-                            except discord.HTTPException:
-                                failed += 1
-                                pass
-                            temp.update({char: temp.get(char, 0) + 1})
-                        if member.display_name[0].isdigit():
-                            try:
-                                await member.edit(nick="No Hoisting")
-                                await asyncio.sleep(random.randint(1, 5))
-                                temp.update({"numbers": temp.get("numbers", 0) + 1})
-                            except:
-                                failed += 1
-        stats = "\n".join([f"`{char}` - `{amount}`" for char, amount in temp.items()])
-        await initial.edit(
-            content=f"I have unhoisted `{sum(temp.values())}` nicks and failed to edit `{failed}` nicks.\nHere are some stats:\n\n{stats}"
+
+    async def hoist_step(self, guild, member_id, data):
+        await self.bot.http.edit_member(
+            guild.id, member_id, reason=data["reason"], nick="No Hoisting"
         )
 
     @commands.command(
@@ -899,21 +892,53 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        inital = await ctx.send(
-            "Reseting all nicknames. This'll take some time so please be patient!"
+        if not ctx.guild.chunked:
+            await ctx.guild.chunk()
+        await self.bot.jobs.submit(
+            ctx,
+            "reset_names",
+            "Resetting nicknames",
+            [m.id for m in ctx.guild.members if m.nick is not None and not m.bot],
+            {"reason": default.responsible(ctx.author, ctx.command.name)},
+        )
+
+    async def reset_names_step(self, guild, member_id, data):
+        await self.bot.http.edit_member(
+            guild.id, member_id, reason=data["reason"], nick=None
+        )
+
+    @commands.group(
+        invoke_without_command=True, usage="`tp!jobs` or `tp!jobs cancel id`"
+    )
+    @commands.guild_only()
+    async def jobs(self, ctx):
+        """Mass role, nickname and ban jobs running in this server"""
+        jobs = self.bot.jobs.jobs(ctx.guild.id)
+        if not jobs:
+            return await ctx.send("Nothing running in this server.")
+        await ctx.send(
+            "\n".join(
+                f"`{job.id}` {job.status('running' if i == 0 else 'queued')}"
+                for i, job in enumerate(jobs)
+            )
         )
-        count = 0
-        for member in ctx.guild.members:
-            if member.nick is None:
-                continue
-            if not member.bot:
-                try:
-                    await member.edit(nick=None)
-                    await asyncio.sleep(random.randint(1, 5))
-                    count += 1
-                except:
-                    pass
-        await inital.edit(content=f"{count} nicknames have been reset.")
+
+    @jobs.command(name="cancel", usage="`tp!jobs cancel id`")
+    @commands.guild_only()
+    async def jobs_cancel(self, ctx, job_id: int):
+        """Stop a job, only its author or someone with Manage Server can"""
+        job = next(
+            (j for j in self.bot.jobs.jobs(ctx.guild.id) if j.id == job_id), None
+        )
+        if job is None:
+            return await ctx.send("There's no job with that id in this server.")
+        if (
+            job.author_id != ctx.author.id
+            and not ctx.author.guild_permissions.manage_guild
+        ):
+            return await ctx.send("Only whoever started it can cancel that job.")
+        await self.bot.jobs.cancel(ctx.guild.id, job_id)
+        await ctx.send(f"Cancelling job `{job_id}`.")
 
     @commands.command(usage="`tp!bans`")
     @permissions.has_permissions(ban_members=True)
@@ -1050,7 +1075,6 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(":x: This command has been disabled!")
             return
 
-        banned_members = 0
         try:
             await ctx.message.delete()
         except discord.NotFound:
@@ -1065,25 +1089,21 @@ class Moderator(commands.Cog, name="mod"):
                 return await ctx.send(
                     "Please either put a user mention or multiple user ID's to ban!"
                 )
-        m = await ctx.send("Working...")
-        async with ctx.channel.typing():
-            if len(members) > 1:
-                for member in members:
-                    if await permissions.check_priv(ctx, member):
-                        return
-                    else:
-                        try:
-                            if reason is None:
-                                reason = (
-                                    f"Action done by {ctx.author} (ID: {ctx.author.id})"
-                                )
-                        except:
-                            pass
-                        await ctx.guild.ban(member, reason=reason)
-                        banned_members += 1
-                await m.edit(content=f"I successfully banned {banned_members} people!")
-            else:
-                await m.edit(content=default.actionmessage("banned"))
+        for member in members:
+            if await permissions.check_priv(ctx, member):
+                return
+        if reason is None:
+            reason = f"Action done by {ctx.author} (ID: {ctx.author.id})"
+        await self.bot.jobs.submit(
+            ctx,
+            "massban",
+            f"Banning {len(members)} people",
+            list(dict.fromkeys(member.id for member in members)),
+            {"reason": reason},
+        )
+
+    async def massban_step(self, guild, user_id, data):
+        await guild.ban(discord.Object(id=user_id), reason=data["reason"])
 
     @commands.cooldown(rate=1, per=4.5, type=commands.BucketType.user)
     @commands.command(usage="`tp!unban memberID optional:reason`")
@@ -1132,10 +1152,16 @@ class Moderator(commands.Cog, name="mod"):
 
         if reason is None:
             reason = f"reason: {ctx.author} (ID: {ctx.author.id})"
-        members = await ctx.guild.bans()
-        for member in members:
-            await ctx.guild.unban(member.user, reason=reason)
-        await ctx.send(f"Unbanned everyone in {ctx.guild.name}.")
+        await self.bot.jobs.submit(
+            ctx,
+            "unbanall",
+            f"Unbanning everyone in {ctx.guild.name}",
+            [entry.user.id for entry in await ctx.guild.bans()],
+            {"reason": reason},
+        )
+
+    async def unbanall_step(self, guild, user_id, data):
+        await guild.unban(discord.Object(id=user_id), reason=data["reason"])
 
     @commands.command(usage="`tp!kick member:optional ID optional:reason`")
     @commands.guild_only()
@@ -1260,14 +1286,22 @@ class Moderator(commands.Cog, name="mod"):
             )
             await ctx.send(f"**{role}** created!")
 
-    @commands.command(usage="`tp!mute member optional:reason`")
+    @commands.command(usage="`tp!mute member optional:duration optional:reason`")
     @commands.cooldown(rate=1, per=4.5, type=commands.BucketType.user)
     @commands.guild_only()
     @permissions.has_permissions(manage_roles=True)
     @commands.bot_has_permissions(embed_links=True, manage_roles=True)
-    async def mute(self, ctx, member: discord.Member, *, reason: str = None):
+    async def mute(
+        self,
+        ctx,
+        member: discord.Member,
+        duration: Optional[ShortTime] = None,
+        *,
+        reason: str = None,
+    ):
         """Mutes a user from the current server.
-        The user will be unmuted automatically in 30 minutes.
+        The user will be unmuted automatically in 30 minutes, or after the
+        duration you give, like `10m`, `2h` or `1d`.
         If you don't want the user to be unmuted automatically, do `tp!permamute`"""
         cmdEnabled = cmd(str(ctx.command.name).lower(), ctx.guild.id)
         if cmdEnabled:
@@ -1297,16 +1331,36 @@ class Moderator(commands.Cog, name="mod"):
             await ctx.send(default.actionmessage("muted"))
         except Exception as e:
             await ctx.send(e)
-        try:
-            await asyncio.sleep(1800)
-            if muted_role not in member.roles:
+            return
+        seconds = getattr(self.config, "mute_duration", 1800)
+        if duration is not None:
+            seconds = (duration.dt - ctx.message.created_at).total_seconds()
+        seconds = min(seconds, getattr(self.config, "mute_max_duration", 28 * 86400))
+        self.bot.scheduler.schedule(
+            "unmute",
+            ctx.guild.id,
+            member.id,
+            seconds,
+            {"role": muted_role.id, "reason": default.responsible(ctx.author, reason)},
+        )
+
+    async def expire_mute(self, action):
+        guild = self.bot.get_guild(action.guild_id)
+        if guild is None:
+            return
+        role = guild.get_role(action.data.get("role"))
+        member = guild.get_member(action.target_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(action.target_id)
+            except discord.NotFound:
                 return
-            else:
-                await member.remove_roles(
-                    muted_role, reason=default.responsible(ctx.author, reason)
-                )
-        except discord.errors.Forbidden:
+        if role is None or role not in member.roles:
             return
+        try:
+            await member.remove_roles(role, reason=action.data.get("reason"))
+        except discord.Forbidden:
+            pass
 
     #        @tasks.loop(count=None)
     #        async def mute_task(user, time, ctx):
@@ -1350,6 +1404,7 @@ class Moderator(commands.Cog, name="mod"):
         await member.add_roles(
             muted_role, reason=default.responsible(ctx.author, reason)
         )
+        self.bot.scheduler.cancel("unmute", ctx.guild.id, member.id)
         await ctx.send(default.actionmessage("muted"))
 
     @commands.command(usage="`tp!unmute member optional:reason`")
@@ -1381,6 +1436,7 @@ class Moderator(commands.Cog, name="mod"):
         await member.remove_roles(
             muted_role, reason=default.responsible(ctx.author, reason)
         )
+        self.bot.scheduler.cancel("unmute", ctx.guild.id, member.id)
         await ctx.send(default.actionmessage("unmuted"))
 
     # Forked from and edited
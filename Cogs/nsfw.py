@@ -15,11 +15,10 @@ import random
 
 import aiohttp
 import discord
-import nekos
 from discord.ext import commands
-from index import EMBED_COLOUR, config, cursor_n, mydb_n
+from index import EMBED_COLOUR, config, mydb_n
 from Manager.commandManager import cmd
-from utils import permissions, slash
+from utils import autopost, http, permissions, slash
 from utils.checks import *
 
 
@@ -45,6 +44,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
         ]
         for command in self.walk_commands():
             command.nsfw = True
+        self.subscriptions = autopost.get_subscriptions(mydb_n)
 
     async def cog_check(self, ctx):
         """A local check which applies to all commands in this cog."""
@@ -61,15 +61,19 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
 
     async def get_hentai_img(self):
         if random.randint(1, 3) == 1:
-            url = nekos.img(random.choice(self.modules))
+            url = await http.nekos_img(random.choice(self.modules))
         else:
             other_stuff = ["jpg", "gif", "yuri"]
-            async with aiohttp.ClientSession() as s:
-                async with s.get(
-                    f"https://lunardev.group/api/{random.choice(other_stuff)}"
-                ) as r:
-                    j = await r.json()
-                    url = j["url"]
+            try:
+                j = await http.get(
+                    http.url("lunardev", f"/api/{random.choice(other_stuff)}"),
+                    res_method="json",
+                    no_cache=True,
+                )
+                url = j["url"]
+            except aiohttp.ClientError:
+                # lunardev is down or its breaker is open, fall back to nekos.
+                url = await http.nekos_img(random.choice(self.modules))
 
         return url
 
@@ -92,26 +96,13 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
 
         if not channel.is_nsfw():
             return await ctx.send("That shit isn't NSFW - fuck that.")
-        # try:
-        cursor_n.execute(
-            f"SELECT hentaichannel FROM public.guilds WHERE guildId = '{ctx.guild.id}'"
-        )
-        res = cursor_n.fetchall()
 
-        if not channel.mention:
-            await ctx.send("Please mention a channel for me to autopost to.")
-
-        for row in res:
-            if row[0] is None:
-                cursor_n.execute(
-                    f"UPDATE public.guilds SET hentaichannel = '{channel.id}' WHERE guildId = '{ctx.guild.id}'"
-                )
-                mydb_n.commit()
-                await ctx.send(
-                    f"{channel.mention} has been added to the database. I will start posting shortly!"
-                )
-            else:
-                await ctx.send("whoops, guild already has a fuckin' channel my dude")
+        if self.subscriptions.get(ctx.guild.id) is not None:
+            await ctx.send("whoops, guild already has a fuckin' channel my dude")
+        elif self.subscriptions.add(channel):
+            await ctx.send(
+                f"{channel.mention} has been added to the database. I will start posting shortly!"
+            )
 
     @autopost.error
     async def autopost_error(self, ctx, error):
@@ -176,22 +167,13 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
         # longer working (for now). Please join the support server to know what
         # is going on - {config.Server}")
 
-        cursor_n.execute(
-            f"SELECT hentaichannel FROM public.guilds WHERE guildId = '{ctx.guild.id}'"
-        )
-        res = cursor_n.fetchall()
-
-        for row in res:
-            if row[0] is None:
-                await ctx.reply("you don't have a fukin' channel idot.")
-            else:
-                cursor_n.execute(
-                    f"UPDATE public.guilds SET hentaichannel = NULL WHERE guildId = '{ctx.guild.id}'"
-                )
-                await ctx.reply(
-                    f"Alright, your auto posting channel has been removed from our database."
-                )
-                mydb_n.commit()
+        if self.subscriptions.get(ctx.guild.id) is None:
+            await ctx.reply("you don't have a fukin' channel idot.")
+        else:
+            self.subscriptions.remove([ctx.guild.id])
+            await ctx.reply(
+                f"Alright, your auto posting channel has been removed from our database."
+            )
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @commands.command()
@@ -209,7 +191,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             embed = discord.Embed(
                 title=f"{ctx.author} Spanks themselves...", colour=EMBED_COLOUR
             )
-            embed.set_image(url=nekos.img("spank"))
+            embed.set_image(url=await http.nekos_img("spank"))
             embed.set_footer(
                 text=f"lunardev.group",
             )
@@ -218,7 +200,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             embed = discord.Embed(
                 title=f"{ctx.author} Spanks {user.name}...", colour=EMBED_COLOUR
             )
-            embed.set_image(url=nekos.img("spank"))
+            embed.set_image(url=await http.nekos_img("spank"))
             embed.set_footer(
                 text=f"lunardev.group",
             )
@@ -264,7 +246,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("classic"))
+        embed.set_image(url=await http.nekos_img("classic"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -279,7 +261,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("trap"))
+        embed.set_image(url=await http.nekos_img("trap"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -294,7 +276,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("boobs"))
+        embed.set_image(url=await http.nekos_img("boobs"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -309,7 +291,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("pussy"))
+        embed.set_image(url=await http.nekos_img("pussy"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -339,7 +321,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("neko"))
+        embed.set_image(url=await http.nekos_img("neko"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -354,7 +336,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("les"))
+        embed.set_image(url=await http.nekos_img("les"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -369,7 +351,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("tits"))
+        embed.set_image(url=await http.nekos_img("tits"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -384,7 +366,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("wallpaper"))
+        embed.set_image(url=await http.nekos_img("wallpaper"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -399,7 +381,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("anal"))
+        embed.set_image(url=await http.nekos_img("anal"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -414,7 +396,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("feet"))
+        embed.set_image(url=await http.nekos_img("feet"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -423,56 +405,56 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
     async def holo(self, ctx):
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://lunardev.group/api/hololive") as r:
-                data = await r.json()
-                embed = discord.Embed(
-                    title="Enjoy",
-                    url="https://lunardev.group/dashboard",
-                    description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
-                    colour=EMBED_COLOUR,
-                )
-                embed.set_image(url=data["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("lunardev", "/api/hololive"), res_method="json", no_cache=True
+        )
+        embed = discord.Embed(
+            title="Enjoy",
+            url="https://lunardev.group/dashboard",
+            description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
+            colour=EMBED_COLOUR,
+        )
+        embed.set_image(url=data["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+        )
+        await ctx.send(embed=embed)
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
     async def kemo(self, ctx):
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://lunardev.group/api/neko") as r:
-                data = await r.json()
-                embed = discord.Embed(
-                    title="Enjoy",
-                    url="https://lunardev.group/dashboard",
-                    description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
-                    colour=EMBED_COLOUR,
-                )
-                embed.set_image(url=data["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("lunardev", "/api/neko"), res_method="json", no_cache=True
+        )
+        embed = discord.Embed(
+            title="Enjoy",
+            url="https://lunardev.group/dashboard",
+            description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
+            colour=EMBED_COLOUR,
+        )
+        embed.set_image(url=data["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+        )
+        await ctx.send(embed=embed)
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
     async def pwg(self, ctx):
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://lunardev.group/api/panties") as r:
-                data = await r.json()
-                embed = discord.Embed(
-                    title="Enjoy",
-                    url="https://lunardev.group/dashboard",
-                    description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
-                    colour=EMBED_COLOUR,
-                )
-                embed.set_image(url=data["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("lunardev", "/api/panties"), res_method="json", no_cache=True
+        )
+        embed = discord.Embed(
+            title="Enjoy",
+            url="https://lunardev.group/dashboard",
+            description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
+            colour=EMBED_COLOUR,
+        )
+        embed.set_image(url=data["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+        )
+        await ctx.send(embed=embed)
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
@@ -483,7 +465,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("blowjob"))
+        embed.set_image(url=await http.nekos_img("blowjob"))
         embed.set_footer(
             text=f"lunardev.group",
         )
@@ -492,20 +474,20 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
     async def thighs(self, ctx):
-        async with aiohttp.ClientSession() as data:
-            async with data.get("https://lunardev.group/api/thighs") as r:
-                data = await r.json()
-                embed = discord.Embed(
-                    title="Enjoy",
-                    url="https://lunardev.group/dashboard",
-                    description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
-                    colour=EMBED_COLOUR,
-                )
-                embed.set_image(url=data["url"])
-                embed.set_footer(
-                    text=f"lunardev.group",
-                )
-                await ctx.send(embed=embed)
+        data = await http.get(
+            http.url("lunardev", "/api/thighs"), res_method="json", no_cache=True
+        )
+        embed = discord.Embed(
+            title="Enjoy",
+            url="https://lunardev.group/dashboard",
+            description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
+            colour=EMBED_COLOUR,
+        )
+        embed.set_image(url=data["url"])
+        embed.set_footer(
+            text=f"lunardev.group",
+        )
+        await ctx.send(embed=embed)
 
     @commands.cooldown(rate=1, per=2, type=commands.BucketType.user)
     @slash.command()
@@ -516,7 +498,7 @@ class Nsfw(commands.Cog, name="nsfw", command_attrs=dict(nsfw=True)):
             description=f"[Add me]({config.Invite}) | [Support]({config.Server}) | [Vote]({config.Vote})",
             colour=EMBED_COLOUR,
         )
-        embed.set_image(url=nekos.img("boobs"))
+        embed.set_image(url=await http.nekos_img("boobs"))
         embed.set_footer(
             text=f"lunardev.group",
         )
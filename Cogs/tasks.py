@@ -17,7 +17,7 @@ import aiohttp
 import discordlists
 from discord.ext import commands, tasks
 from index import logger
-from utils import default
+from utils import default, topgg
 import requests
 import os
 import nekos
@@ -37,6 +37,13 @@ class Tasks(commands.Cog, name="task"):
         self.api.set_auth("bots.discordlabs.org", self.config.discordlabs)
         self.api.start_loop()
         self.happy_birthday.start()
+        self.activity_flush.start()
+        self.vote_webhook = None
+        if getattr(self.config, "topgg_webhook_port", None):
+            self.vote_webhook = topgg.VoteWebhook(
+                self.config.topgg_webhook_port, self.config.topgg_webhook_auth
+            )
+            self.bot.loop.create_task(self.vote_webhook.start())
 
     @tasks.loop(count=None, minutes=2)
     async def happy_birthday(self):
@@ -45,6 +52,10 @@ class Tasks(commands.Cog, name="task"):
             me = self.bot.get_user(101118549958877184)
             await me.send("Happy Birthday :D")
 
+    @tasks.loop(minutes=1)
+    async def activity_flush(self):
+        self.bot.activity.tick()
+
     @tasks.loop(minutes=1)
     async def fear_api(self):
         await self.bot.wait_until_ready()
@@ -52,6 +63,11 @@ class Tasks(commands.Cog, name="task"):
 
 
     def cog_unload(self):
+        if self.vote_webhook is not None:
+            self.bot.loop.create_task(self.vote_webhook.stop())
+        self.activity_flush.cancel()
+        self.bot.activity.tick()
+        self.bot.activity.flush()
         self.fear_api.stop()
         self.hentai_steal.stop()
         self.happy_birthday.stop()
@@ -0,0 +1,87 @@
+"""Chart renders per second with 1, 4 and 8 worker processes.
+
+Renders the same kind of 21 slice chart chatchart produces, submitting
+them all at once, and reports throughput and how long the event loop was
+blocked at worst while they ran.
+
+    python benchmarks/chart_throughput.py [--charts 64] [--workers 1 4 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from utils import charts
+
+
+def make_slices(seed):
+    rng = random.Random(seed)
+    weights = [rng.random() for _ in range(20)]
+    total = sum(weights) * 1.25
+    top = [
+        (f"user{rng.randrange(10000)}#0001", round(w / total * 100, 1)) for w in weights
+    ]
+    top.sort(key=lambda x: x[1], reverse=True)
+    return top + [("Others", round(100 - sum(x[1] for x in top), 1))]
+
+
+async def watch_loop(stop):
+    """Longest gap between two wakeups of a 10ms ticker"""
+    worst = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - start - 0.01)
+    return worst
+
+
+async def run(workers, count):
+    charts.shutdown()
+    charts.get_pool(workers)
+    # Warm up so process start and font cache loading aren't measured.
+    await asyncio.gather(
+        *(charts.render("warmup", make_slices(i)) for i in range(workers))
+    )
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(charts.render(f"Stats in #bench-{i}", make_slices(i)) for i in range(count))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst = await watcher
+    charts.shutdown()
+    size = sum(len(x) for x in results) / len(results) / 1024
+    print(
+        f"{workers} worker(s): {count / elapsed:6.1f} charts/s  "
+        f"({elapsed:.2f}s for {count}, {size:.0f} KB each, "
+        f"worst loop stall {worst * 1000:.1f} ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    charts.render_pie("inline", make_slices(0))
+    print(
+        f"one render on the loop would block it for {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    for workers in args.workers:
+        asyncio.run(run(workers, args.charts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Counting 100k messages: the old calculate_member_perc/calculate_top vs ChatStats.
+
+python benchmarks/chatstats_aggregate.py [--messages 100000] [--authors 2000]
+"""
+
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.chatstats import ChatStats
+
+
+def make_messages(count, authors):
+    rng = random.Random(0)
+    people = [
+        SimpleNamespace(
+            id=100000 + i,
+            display_name=f"some_user*{i}$" + "x" * rng.randrange(20),
+            discriminator=f"{rng.randrange(10000):04}",
+            bot=i % 50 == 0,
+        )
+        for i in range(authors)
+    ]
+    # A few people do most of the talking, like in a real channel.
+    weights = [1 / (i + 1) for i in range(authors)]
+    chosen = rng.choices(people, weights, k=count)
+    return [SimpleNamespace(id=i, author=author) for i, author in enumerate(chosen)]
+
+
+def old_member_perc(history):
+    msg_data = {"total_count": 0, "users": {}}
+    for msg in history:
+        if len(msg.author.display_name) >= 20:
+            short_name = "{}...".format(msg.author.display_name[:20]).replace(
+                "$", "\\$"
+            )
+        else:
+            short_name = (
+                msg.author.display_name.replace("$", "\\$")
+                .replace("_", "\\_ ")
+                .replace("*", "\\*")
+            )
+        whole_name = "{}#{}".format(short_name, msg.author.discriminator)
+        if msg.author.bot:
+            pass
+        elif whole_name in msg_data["users"]:
+            msg_data["users"][whole_name]["msgcount"] += 1
+            msg_data["total_count"] += 1
+        else:
+            msg_data["users"][whole_name] = {}
+            msg_data["users"][whole_name]["msgcount"] = 1
+            msg_data["total_count"] += 1
+    return msg_data
+
+
+def old_top(msg_data):
+    for usr in msg_data["users"]:
+        pd = float(msg_data["users"][usr]["msgcount"]) / float(msg_data["total_count"])
+        msg_data["users"][usr]["percent"] = round(pd * 100, 1)
+    top_twenty = heapq.nlargest(
+        20,
+        [
+            (x, msg_data["users"][x][y])
+            for x in msg_data["users"]
+            for y in msg_data["users"][x]
+            if (y == "percent" and msg_data["users"][x][y] > 0)
+        ],
+        key=lambda x: x[1],
+    )
+    others = 100 - sum(x[1] for x in top_twenty)
+    return top_twenty, others
+
+
+async def stream(messages):
+    for msg in messages:
+        yield msg
+
+
+def measure(label, func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>10}: {best * 1000:7.1f} ms  peak {peak / 1024:7.0f} KB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--authors", type=int, default=2000)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.authors)
+    print(f"{args.messages} messages from {args.authors} authors")
+
+    old = measure("old", lambda: old_top(old_member_perc(messages)))
+
+    def new():
+        stats = asyncio.run(ChatStats().consume(stream(messages)))
+        return stats.top(20)
+
+    # The async iterator costs something on its own, show it separately.
+    def new_sync():
+        stats = ChatStats()
+        for msg in messages:
+            stats.add(msg)
+        return stats.top(20)
+
+    top, others = measure("ChatStats", new)
+    measure("add() only", new_sync)
+    assert [x[1] for x in top] == [x[1] for x in old[0]], "results differ"
+
+
+if __name__ == "__main__":
+    main()
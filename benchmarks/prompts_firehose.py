@@ -0,0 +1,91 @@
+"""Pending message prompts under load: bot.wait_for vs utils.prompts.
+
+python benchmarks/prompts_firehose.py [--prompts 1000] [--messages 20000]
+
+Both sides get the same number of pending prompts, each waiting on one
+(channel, author), and the same stream of messages, none of which answers
+a prompt. wait_for runs every pending check against every message, the
+prompt service does one dict lookup per message.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discord
+
+from utils.prompts import PromptService
+
+
+def make_messages(count, channels):
+    rng = random.Random(0)
+    return [
+        SimpleNamespace(
+            channel=SimpleNamespace(id=rng.choice(channels)),
+            author=SimpleNamespace(id=rng.randrange(10**6, 2 * 10**6)),
+            content="hello",
+        )
+        for _ in range(count)
+    ]
+
+
+def report(label, elapsed, messages):
+    per_message = elapsed / messages * 1e6
+    print(f"{label:>10}: {elapsed * 1000:8.1f} ms  {per_message:8.2f} us/message")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    channels = list(range(1, 201))
+    waiters = [(channels[i % len(channels)], i) for i in range(args.prompts)]
+    messages = make_messages(args.messages, channels)
+    print(f"{args.prompts} pending prompts, {args.messages} messages")
+
+    client = discord.Client(intents=discord.Intents.none())
+    # Normally set when logging in.
+    client.loop = asyncio.get_running_loop()
+    tasks = [
+        asyncio.ensure_future(
+            client.wait_for(
+                "message",
+                check=lambda m, c=c, a=a: m.channel.id == c and m.author.id == a,
+                timeout=3600,
+            )
+        )
+        for c, a in waiters
+    ]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for message in messages:
+        client.dispatch("message", message)
+    report("wait_for", time.perf_counter() - start, len(messages))
+    for task in tasks:
+        task.cancel()
+
+    service = PromptService()
+    tasks = [
+        asyncio.ensure_future(service.wait(c, a, timeout=3600)) for c, a in waiters
+    ]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for message in messages:
+        service.feed(message)
+    report("prompts", time.perf_counter() - start, len(messages))
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
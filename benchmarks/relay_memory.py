@@ -0,0 +1,113 @@
+"""Peak RSS of 50 concurrent enlarges, buffered vs relayed.
+
+Starts the stub server in its own process, points the emoji CDN upstream
+at it and fires 50 concurrent downloads of a large image. Each one then
+holds on to the body for a while, like an upload to Discord would, before
+it is released.
+
+    python benchmarks/relay_memory.py [--size 1400] [--concurrency 50]
+
+Every mode runs in a fresh interpreter, since ru_maxrss only ever grows.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+PORT = 8765
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def fake_upload(fp, seconds):
+    # discord.py hands the file object to aiohttp, which reads it in chunks.
+    while fp.read(64 * 1024):
+        await asyncio.sleep(seconds / 50)
+    fp.close()
+
+
+async def run(mode, concurrency, upload_time):
+    from utils import http
+
+    http.override("emojicdn", f"http://127.0.0.1:{PORT}/emojicdn")
+    baseline = peak_rss_mb()
+
+    async def enlarge(i):
+        url = http.url("emojicdn", f"/emojis/{i}.png")
+        if mode == "buffered":
+            body = await http.get(url, res_method="read", no_cache=True)
+            fp = io.BytesIO(body)
+            del body
+        else:
+            fp = await http.relay(url, max_size=64 * 1024 * 1024)
+        await fake_upload(fp, upload_time)
+
+    http.upstreams["emojicdn"].concurrency = concurrency
+    http.upstreams["emojicdn"].semaphore = asyncio.Semaphore(concurrency)
+    http.upstreams["emojicdn"].timeout = 120
+    await asyncio.gather(*(enlarge(i) for i in range(concurrency)))
+    await http.session.close()
+    return baseline, peak_rss_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1400, help="image side in px")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--upload-time", type=float, default=1.0)
+    parser.add_argument("--mode", choices=["buffered", "relay"])
+    args = parser.parse_args()
+
+    if args.mode:
+        baseline, peak = asyncio.run(run(args.mode, args.concurrency, args.upload_time))
+        print(f"{args.mode:>8}: baseline {baseline:7.1f} MB  peak {peak:7.1f} MB")
+        return
+
+    body_mb = (args.size * (args.size * 3 + 1)) / 1024 / 1024
+    print(f"{args.concurrency} concurrent enlarges of a {body_mb:.1f} MB image")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "utils.stubserver",
+            "--port",
+            str(PORT),
+            "--image-size",
+            str(args.size),
+        ],
+        stdout=subprocess.PIPE,
+    )
+    try:
+        # The exports are printed once the server is listening.
+        server.stdout.readline()
+        for mode in ("buffered", "relay"):
+            subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--mode",
+                    mode,
+                    "--concurrency",
+                    str(args.concurrency),
+                    "--upload-time",
+                    str(args.upload_time),
+                ],
+                check=True,
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
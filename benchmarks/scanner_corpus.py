@@ -0,0 +1,154 @@
+"""Content checks per message: the separate regexes/substring lists vs utils.scanner.
+
+python benchmarks/scanner_corpus.py [--messages 50000] [--corpus messages.txt]
+
+Without --corpus a chat-like corpus is generated: mostly short messages,
+some long ones, links, mentions, emoji and code blocks, with a sprinkle of
+messages that hit one of the categories. --corpus takes one message per line.
+
+Before timing, the scanner's results are compared with the old checks on
+the corpus and on OVERLAPS, where matches of different categories overlap.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.scanner import PATTERNS_FILE, Scanner
+
+WORDS = (
+    "the a to is it you i that and of in lol this for on my what me be just "
+    "like so do have was but not are with no can get it's he they we yeah "
+    "game play server bot command help why how when ok okay lmao bruh gg "
+    "anyone know where does image pic send meme nice cool thanks thank damn"
+).split()
+EXTRAS = [
+    "https://tenor.com/view/cat-dance-gif-1234567",
+    "https://discord.com/channels/1/2/3",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "<@101118549958877184>",
+    "<:pepega:824567890123456789>",
+    "😂😂😂",
+    "```py\nprint('hello world')\n```",
+]
+HITS = [
+    "happy halloween everyone",
+    "so spooky",
+    "check freenitros.com/claim",
+    "free nitro at discordgift.site/abc",
+    "he said the n word",
+]
+# Matches of different categories sharing characters, every category counts.
+OVERLAPS = [
+    "regginigger",
+    "niggerreggin",
+    "spookyhalloween",
+    "the n word reggin",
+]
+
+
+def make_corpus(count):
+    rng = random.Random(0)
+    messages = []
+    for _ in range(count):
+        length = min(int(rng.expovariate(1 / 8)) + 1, 120)
+        words = rng.choices(WORDS, k=length)
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EXTRAS))
+        if rng.random() < 0.01:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(HITS))
+        message = " ".join(words)
+        if rng.random() < 0.2:
+            message = message.capitalize()
+        messages.append(message)
+    return messages
+
+
+def old_checks():
+    """What each listener/check did on its own before utils.scanner"""
+    nword_strict = re.compile(
+        r"\b(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)\b", re.I
+    )
+    nword = re.compile(r"(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)", re.I)
+    halloween = re.compile(r"h(a|4)(l|1)(l|1)(o|0)w(e|3)(e|3)n", re.I)
+    spooky = re.compile(r"(s|5)(p|7)(o|0)(o|0)(k|9)(y|1)", re.I)
+
+    def check(content):
+        found = set()
+        if nword_strict.search(content.lower()):
+            found.add("nword")
+        if nword.search(content.lower()):
+            found.add("nword")
+        if halloween.search(content.lower()):
+            found.add("halloween")
+        if spooky.search(content.lower()):
+            found.add("spooky")
+        if "n word" in content.lower():
+            found.add("badwords")
+        if "reggin" in content.lower():
+            found.add("reversed")
+        return found
+
+    return check
+
+
+def measure(label, func, messages, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    per_message = best / len(messages) * 1e6
+    print(f"{label:>16}: {best * 1000:8.1f} ms  {per_message:6.2f} us/message")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--corpus")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            messages = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        messages = make_corpus(args.messages)
+    with open(os.path.join(ROOT, PATTERNS_FILE), encoding="utf-8") as f:
+        patterns = json.load(f)
+    print(
+        f"{len(messages)} messages, {sum(map(len, messages)) // len(messages)} chars avg"
+    )
+
+    scanner = Scanner(patterns)
+    check = old_checks()
+    wrong = [
+        message
+        for message in OVERLAPS + messages
+        if scanner._scan(message) != check(message)
+    ]
+    for message in wrong[:10]:
+        print(
+            f"mismatch: {message!r} scanner={sorted(scanner._scan(message))} "
+            f"old={sorted(check(message))}"
+        )
+    if wrong:
+        sys.exit(1)
+
+    measure("old checks", check, messages)
+    # _scan skips the per-message cache, which would make repeats free.
+    measure("scanner", scanner._scan, messages)
+
+    hits = sum(1 for message in messages if scanner._scan(message))
+    print(f"{hits} messages matched something")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,6 @@ import logging
 import os
 import random
 from discord.ext import commands
-import re
 
 
 import Manager.database
@@ -28,11 +27,21 @@ import Manager.logger
 from datetime import datetime
 from discord.ext.commands import AutoShardedBot
 
-from utils import default, permissions, slash
+from utils import (
+    activity,
+    default,
+    jobs,
+    permissions,
+    pipeline,
+    prompts,
+    reactions,
+    scanner,
+    scheduler,
+    slash,
+)
 from colorama import init, Fore, Back, Style
 import logging
 
-
 init()
 
 # logger = logging.getLogger("discord")
@@ -104,11 +113,20 @@ class Bot(commands.AutoShardedBot):
         self.message_cooldown = commands.CooldownMapping.from_cooldown(
             1.0, random.randint(1, 5), commands.BucketType.guild
         )
-        self.nword_re = re.compile(
-            r"(n|m|и|й)(i|1|l|!|ᴉ|¡)(g|ƃ|6|б)(g|ƃ|6|б)(e|3|з|u)(r|Я)", re.I
-        )
         self.slash_commands = {}
         self.logger = logging.getLogger("slashbot")
+        self.activity = activity.ActivityTracker(mydb_n)
+        # Cogs register their message handlers here instead of on_message.
+        self.pipeline = pipeline.MessagePipeline()
+        self.pipeline.register("commands", self.handle_commands, order=100)
+        # And their reaction handlers here, by message id.
+        self.reactions = reactions.ReactionRouter(self)
+        # Replies commands are waiting on, use instead of wait_for("message").
+        self.prompts = prompts.PromptService()
+        # Unmutes and other moderation actions due later, kept in the database.
+        self.scheduler = scheduler.Scheduler(self, mydb_n)
+        # Mass member operations, run in the background and resumed on restart.
+        self.jobs = jobs.JobQueue(self, mydb_n)
 
     def run(self, token: str) -> None:
         self.setup()
@@ -174,7 +192,17 @@ class Bot(commands.AutoShardedBot):
             self.logger.exception(f"Error in command {ctx.path}\n{e}")
 
     async def on_message(self, msg) -> None:
-        if not self.is_ready() or msg.author.bot or not permissions.can_send(msg):
+        if not self.is_ready():
+            return
+        self.prompts.feed(msg)
+        await self.pipeline.dispatch(msg)
+
+    async def on_raw_reaction_add(self, payload) -> None:
+        await self.reactions.dispatch(payload)
+
+    async def handle_commands(self, msg) -> None:
+        self.activity.record(msg)
+        if not permissions.can_send(msg):
             return
         if msg.content.lower().startswith("tp!"):
             msg.content = msg.content[: len("tp!")].lower() + msg.content[len("tp!") :]
@@ -241,12 +269,12 @@ os.environ["JISHAKU_NO_DM_TRACEBACK"] = "True"
 
 @bot.check
 def no_badwords(ctx):
-    return "n word" not in ctx.message.content.lower()
+    return "badwords" not in scanner.scan(ctx.message.content)
 
 
 @bot.check
 def no_nwords(ctx):
-    return "reggin" not in ctx.message.content.lower()
+    return "reversed" not in scanner.scan(ctx.message.content)
 
 
 bot.run(config.token)
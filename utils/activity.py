@@ -0,0 +1,219 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Opt-in live message activity per guild, for instant "last N days" charts.
+
+``Bot.on_message`` hands every message to :meth:`ActivityTracker.record`,
+which is a single dict increment for guilds that opted in. A task folds
+those pending counts into hourly buckets kept in fixed size arrays per
+(channel, author), and writes the changed buckets to Postgres every few
+minutes.
+"""
+
+import re
+import time
+from array import array
+from collections import Counter
+from typing import Collection, Dict, Tuple
+
+from discord.ext import commands
+
+from utils.chatstats import ChatStats
+
+HOURS = 30 * 24
+# Series kept per guild, one per (channel, author). Past this, new authors
+# are counted under author 0 of their channel, shown as "Everyone else",
+# until older series drop out of the window.
+MAX_SERIES = 1000
+EVERYONE_ELSE = 0
+FLUSH_EVERY = 5 * 60
+
+
+def current_hour() -> int:
+    return int(time.time()) // 3600
+
+
+class Days(commands.Converter):
+    """Accepts ``7d``, ``7 days``... up to the tracked 30 days"""
+
+    pattern = re.compile(r"^(\d+)\s*d(?:ays?)?$", re.I)
+
+    async def convert(self, ctx, argument) -> int:
+        match = self.pattern.match(argument)
+        if match is None:
+            raise commands.BadArgument("Not a number of days")
+        return max(1, min(int(match.group(1)), HOURS // 24))
+
+
+class GuildActivity:
+    __slots__ = ("series", "pending", "hour", "dirty")
+
+    def __init__(self, hour: int):
+        # (channel id, author id) -> hourly counts, a ring indexed by hour.
+        self.series: Dict[Tuple[int, int], array] = {}
+        self.pending = Counter()
+        self.hour = hour
+        # Buckets changed since the last flush.
+        self.dirty = set()
+
+    def _series(self, key: Tuple[int, int]) -> Tuple[Tuple[int, int], array]:
+        counts = self.series.get(key)
+        if counts is None:
+            if len(self.series) >= MAX_SERIES:
+                key = (key[0], EVERYONE_ELSE)
+                counts = self.series.get(key)
+            if counts is None:
+                counts = self.series[key] = array("H", bytes(2 * HOURS))
+        return key, counts
+
+    def advance(self, hour: int):
+        """Zero the buckets that roll over between the last fold and ``hour``"""
+        if hour <= self.hour:
+            return
+        for skipped in range(self.hour + 1, min(hour, self.hour + HOURS) + 1):
+            slot = skipped % HOURS
+            for counts in self.series.values():
+                counts[slot] = 0
+        self.hour = hour
+        # Series with nothing left in the window free their slot for new authors.
+        for key in [key for key, counts in self.series.items() if not any(counts)]:
+            del self.series[key]
+
+    def fold(self, hour: int):
+        self.advance(hour)
+        pending, self.pending = self.pending, Counter()
+        slot = hour % HOURS
+        for key, messages in pending.items():
+            key, counts = self._series(key)
+            counts[slot] = min(counts[slot] + messages, 0xFFFF)
+            self.dirty.add((key, hour))
+
+    def load(self, key: Tuple[int, int], hour: int, messages: int):
+        if self.hour - HOURS < hour <= self.hour:
+            key, counts = self._series(key)
+            counts[hour % HOURS] = min(counts[hour % HOURS] + messages, 0xFFFF)
+
+    def totals(self, hours: int, channels: Collection[int] = None) -> Counter:
+        """Messages per author over the last ``hours`` hours in ``channels``"""
+        slots = [(self.hour - i) % HOURS for i in range(min(hours, HOURS))]
+        totals = Counter()
+        for (channel, author), counts in self.series.items():
+            if channels is not None and channel not in channels:
+                continue
+            messages = sum(counts[slot] for slot in slots)
+            if messages:
+                totals[author] += messages
+        # Messages not folded into the arrays yet.
+        for (channel, author), messages in self.pending.items():
+            if channels is None or channel in channels:
+                totals[author] += messages
+        return totals
+
+
+class ActivityTracker:
+    def __init__(self, db):
+        self.db = db
+        self.cursor = db.cursor()
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.activity_guilds (guild BIGINT PRIMARY KEY)"
+        )
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.activity ("
+            "guild BIGINT NOT NULL, channel BIGINT NOT NULL, author BIGINT NOT NULL, "
+            "hour INTEGER NOT NULL, messages INTEGER NOT NULL, "
+            "PRIMARY KEY (guild, channel, author, hour))"
+        )
+        self.db.commit()
+        self.guilds: Dict[int, GuildActivity] = {}
+        self.last_flush = time.monotonic()
+        self.cursor.execute("SELECT guild FROM public.activity_guilds")
+        for (guild_id,) in self.cursor.fetchall():
+            self._load(guild_id)
+
+    def record(self, msg):
+        """Count a message, called for every message the bot sees"""
+        guild = self.guilds.get(msg.guild.id) if msg.guild else None
+        if guild is not None:
+            guild.pending[(msg.channel.id, msg.author.id)] += 1
+
+    def enabled(self, guild_id: int) -> bool:
+        return guild_id in self.guilds
+
+    def _load(self, guild_id: int):
+        hour = current_hour()
+        guild = self.guilds[guild_id] = GuildActivity(hour)
+        self.cursor.execute(
+            "SELECT channel, author, hour, messages FROM public.activity "
+            f"WHERE guild = {guild_id} AND hour > {hour - HOURS}"
+        )
+        for channel, author, bucket, messages in self.cursor.fetchall():
+            guild.load((channel, author), bucket, messages)
+
+    def enable(self, guild_id: int):
+        self.cursor.execute(
+            f"INSERT INTO public.activity_guilds (guild) VALUES ({guild_id}) "
+            "ON CONFLICT DO NOTHING"
+        )
+        self.db.commit()
+        if guild_id not in self.guilds:
+            self._load(guild_id)
+
+    def disable(self, guild_id: int):
+        """Stop tracking a guild and drop everything stored for it"""
+        self.guilds.pop(guild_id, None)
+        self.cursor.execute(
+            f"DELETE FROM public.activity_guilds WHERE guild = {guild_id}"
+        )
+        self.cursor.execute(f"DELETE FROM public.activity WHERE guild = {guild_id}")
+        self.db.commit()
+
+    def stats(self, guild, days: int, channels: Collection[int] = None) -> ChatStats:
+        """Counts per author over the last ``days`` days, for a chart"""
+        activity = self.guilds[guild.id]
+        activity.fold(current_hour())
+        stats = ChatStats(resolve=guild.get_member)
+        stats.merge(
+            activity.totals(days * 24, channels), {EVERYONE_ELSE: "Everyone else"}
+        )
+        return stats
+
+    def flush(self):
+        rows = []
+        for guild_id, guild in self.guilds.items():
+            for (channel, author), hour in guild.dirty:
+                messages = guild.series.get((channel, author))
+                if messages is not None and hour > guild.hour - HOURS:
+                    rows.append(
+                        (guild_id, channel, author, hour, messages[hour % HOURS])
+                    )
+            guild.dirty.clear()
+        if rows:
+            self.cursor.executemany(
+                "INSERT INTO public.activity (guild, channel, author, hour, messages) "
+                "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (guild, channel, author, hour) "
+                "DO UPDATE SET messages = EXCLUDED.messages",
+                rows,
+            )
+        self.cursor.execute(
+            f"DELETE FROM public.activity WHERE hour <= {current_hour() - HOURS}"
+        )
+        self.db.commit()
+        self.last_flush = time.monotonic()
+
+    def tick(self):
+        """Fold pending counts, and write them out every FLUSH_EVERY seconds"""
+        hour = current_hour()
+        for guild in self.guilds.values():
+            guild.fold(hour)
+        if time.monotonic() - self.last_flush >= FLUSH_EVERY:
+            self.flush()
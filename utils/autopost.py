@@ -0,0 +1,245 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Autopost subscriptions, kept in memory.
+
+``public.guilds.hentaichannel`` is read once when the bot starts. After
+that the autopost commands and the channel events keep :class:`Subscriptions`
+and the table in sync, so a batch only walks a dict of resolved channels.
+
+Posts are spread over the interval instead of all going out at the top of
+the minute: every channel gets a fixed phase within its interval from a
+hash of its id, and :meth:`Subscriptions.due` hands out the channels whose
+slot has come up, one post per channel per interval.
+"""
+
+import heapq
+import logging
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from utils import default
+
+log = logging.getLogger(__name__)
+
+
+class Subscription:
+    __slots__ = (
+        "guild_id",
+        "channel_id",
+        "webhook_id",
+        "webhook_token",
+        "channel",
+        "interval",
+    )
+
+    def __init__(
+        self,
+        guild_id: int,
+        channel_id: int,
+        webhook_id: int = None,
+        webhook_token: str = None,
+    ):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.webhook_id = webhook_id
+        self.webhook_token = webhook_token
+        # Resolved lazily, the bot isn't connected when these are loaded.
+        self.channel: Optional[discord.TextChannel] = None
+        # Seconds between posts, None for the registry's default.
+        self.interval: Optional[float] = None
+
+
+def phase(channel_id: int, interval: float) -> float:
+    """Where in each interval a channel posts, the same across restarts"""
+    return zlib.crc32(str(channel_id).encode()) / 2**32 * interval
+
+
+class Subscriptions:
+    def __init__(self, db, interval: float = 60):
+        self.db = db
+        self.interval = interval
+        self.cursor = db.cursor()
+        self.cursor.execute(
+            "ALTER TABLE public.guilds ADD COLUMN IF NOT EXISTS hentaiwebhook_id BIGINT, "
+            "ADD COLUMN IF NOT EXISTS hentaiwebhook_token TEXT"
+        )
+        self.db.commit()
+        self.by_guild: Dict[int, Subscription] = {}
+        self.by_channel: Dict[int, Subscription] = {}
+        # (due, channel id) heap. Entries left behind by removed or
+        # rescheduled subscriptions are skipped when popped.
+        self._queue: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self.load()
+
+    def __len__(self):
+        return len(self.by_guild)
+
+    def load(self):
+        self.by_guild.clear()
+        self.by_channel.clear()
+        self._queue.clear()
+        self._due.clear()
+        self.cursor.execute(
+            'SELECT guildId, "hentaichannel", "hentaiwebhook_id", "hentaiwebhook_token" '
+            'FROM public.guilds WHERE "hentaichannel" IS NOT NULL'
+        )
+        for guild_id, channel_id, webhook_id, webhook_token in self.cursor.fetchall():
+            self._track(
+                Subscription(int(guild_id), int(channel_id), webhook_id, webhook_token)
+            )
+
+    def _track(self, sub: Subscription):
+        self.forget(sub.guild_id)
+        self.by_guild[sub.guild_id] = sub
+        self.by_channel[sub.channel_id] = sub
+        self._schedule(sub, time.time())
+
+    def forget(self, guild_id: int) -> Optional[Subscription]:
+        """Drop a guild from memory only, e.g. once its row is deleted"""
+        sub = self.by_guild.pop(guild_id, None)
+        if sub is not None:
+            self.by_channel.pop(sub.channel_id, None)
+            self._due.pop(sub.channel_id, None)
+        return sub
+
+    def _schedule(self, sub: Subscription, after: float):
+        """Queue ``sub`` for its first slot at or after ``after``"""
+        interval = sub.interval or self.interval
+        due = after + (phase(sub.channel_id, interval) - after) % interval
+        self._due[sub.channel_id] = due
+        heapq.heappush(self._queue, (due, sub.channel_id))
+
+    def reschedule(self, now: float = None):
+        """Put every subscription back on its next slot, e.g. once connected"""
+        now = now or time.time()
+        self._queue.clear()
+        self._due.clear()
+        for sub in self.by_guild.values():
+            self._schedule(sub, now)
+
+    def set_interval(self, sub: Subscription, interval: Optional[float]):
+        sub.interval = interval
+        self._schedule(sub, time.time())
+
+    def has_due(self, now: float = None) -> bool:
+        return bool(self._queue) and self._queue[0][0] <= (now or time.time())
+
+    def due(self, now: float = None) -> List[Subscription]:
+        """Subscriptions whose slot has come up, each queued for the next one"""
+        now = now or time.time()
+        subs = []
+        while self._queue and self._queue[0][0] <= now:
+            due, channel_id = heapq.heappop(self._queue)
+            sub = self.by_channel.get(channel_id)
+            if sub is None or self._due.get(channel_id) != due:
+                continue
+            subs.append(sub)
+            interval = sub.interval or self.interval
+            if due + interval > now:
+                self._due[channel_id] = due + interval
+                heapq.heappush(self._queue, (due + interval, channel_id))
+            else:
+                # Fell more than an interval behind, don't post twice to catch up.
+                self._schedule(sub, now)
+        return subs
+
+    def get(self, guild_id: int) -> Optional[Subscription]:
+        return self.by_guild.get(guild_id)
+
+    def for_channel(self, channel_id: int) -> Optional[Subscription]:
+        return self.by_channel.get(channel_id)
+
+    def add(self, channel: discord.TextChannel) -> bool:
+        """Subscribe ``channel``'s guild, False if the guild has no row yet"""
+        self.cursor.execute(
+            f"UPDATE public.guilds SET hentaichannel = '{channel.id}', "
+            "hentaiwebhook_id = NULL, hentaiwebhook_token = NULL "
+            f"WHERE guildId = '{channel.guild.id}'"
+        )
+        self.db.commit()
+        if not self.cursor.rowcount:
+            return False
+        sub = Subscription(channel.guild.id, channel.id)
+        sub.channel = channel
+        self._track(sub)
+        return True
+
+    def remove(self, guild_ids: Iterable[int]):
+        """Unsubscribe guilds, with a single UPDATE however many there are"""
+        guild_ids = [guild_id for guild_id in guild_ids if self.forget(guild_id)]
+        if not guild_ids:
+            return
+        self.cursor.execute(
+            "UPDATE public.guilds SET hentaichannel = NULL, hentaiwebhook_id = NULL, "
+            "hentaiwebhook_token = NULL WHERE guildId IN ({})".format(
+                ", ".join(f"'{guild_id}'" for guild_id in guild_ids)
+            )
+        )
+        self.db.commit()
+
+    def set_webhook(self, sub: Subscription, webhook: Optional[discord.Webhook]):
+        sub.webhook_id = webhook.id if webhook else None
+        sub.webhook_token = webhook.token if webhook else None
+        self.cursor.execute(
+            "UPDATE public.guilds SET hentaiwebhook_id = %s, hentaiwebhook_token = %s "
+            f"WHERE guildId = '{sub.guild_id}'",
+            (sub.webhook_id, sub.webhook_token),
+        )
+        self.db.commit()
+
+    def resolve(
+        self, bot: discord.Client, subs: Iterable[Subscription] = None
+    ) -> List[Subscription]:
+        """Subscriptions (all of them by default) that can be posted to right now.
+
+        Channels that are gone or no longer NSFW are unsubscribed in one go.
+        Guilds the bot can't see (unavailable, or not joined yet) are left
+        alone until they come back.
+        """
+        live, dead = [], []
+        for sub in self.by_guild.values() if subs is None else subs:
+            guild = bot.get_guild(sub.guild_id)
+            if guild is None or guild.unavailable:
+                continue
+            channel = sub.channel
+            # The guild object is replaced when it comes back from an outage.
+            if channel is None or channel.guild is not guild:
+                channel = sub.channel = guild.get_channel(sub.channel_id)
+            if not isinstance(channel, discord.TextChannel) or not channel.is_nsfw():
+                dead.append(sub.guild_id)
+                continue
+            live.append(sub)
+        if dead:
+            log.warning(
+                f"Removed {len(dead)} autopost channels that are gone or no longer NSFW"
+            )
+            self.remove(dead)
+        return live
+
+
+_subscriptions = None
+
+
+def get_subscriptions(db) -> Subscriptions:
+    global _subscriptions
+    if _subscriptions is None:
+        config = default.get("config.json")
+        _subscriptions = Subscriptions(
+            db, interval=getattr(config, "autopost_interval", 60)
+        )
+    return _subscriptions
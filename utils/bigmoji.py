@@ -0,0 +1,246 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Rendered emoji cache for ``tp!enlarge``.
+
+Standard emoji are rasterized from the twemoji SVGs once, in a dedicated
+process pool, and the PNGs kept on disk under ``<codepoints>-<size>.png``
+with an in-memory LRU in front. Repeat enlarges don't touch the network or
+the renderer at all.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import aiohttp
+
+from utils import default, http
+
+try:
+    import cairosvg
+
+    svg_convert = "cairo"
+except ImportError:
+    try:
+        from wand.image import Image
+
+        svg_convert = "wand"
+    except ImportError:
+        svg_convert = None
+
+log = logging.getLogger(__name__)
+
+RENDER_SIZE = 1024
+# Without an SVG renderer we can only hand out twemoji's own PNGs.
+FALLBACK_SIZE = 72
+RENDER_TIMEOUT = 15
+# Usage counts are written out every this many enlarges.
+USAGE_FLUSH_EVERY = 50
+# The longest emoji sequences (families with skin tones) are 11 codepoints,
+# anything longer isn't an emoji and would make a very long file name.
+MAX_CODEPOINTS = 16
+
+
+def rasterize(svg: bytes, size: int) -> bytes:
+    """Turn an SVG into a ``size`` x ``size`` PNG, run in a worker process"""
+    if svg_convert == "cairo":
+        return cairosvg.svg2png(bytestring=svg, parent_width=size, parent_height=size)
+    # twemoji SVGs are 36 units wide, wand scales by resolution instead.
+    with Image(blob=svg, format="svg", resolution=round(72 * size / 36)) as image:
+        image.resize(size, size)
+        return image.make_blob("png")
+
+
+class EmojiCache:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        memory_items: int = 256,
+        workers: int = 2,
+        size: int = None,
+    ):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.workers = workers
+        self.size = size or (RENDER_SIZE if svg_convert else FALLBACK_SIZE)
+        self.memory = OrderedDict()
+        self.usage = Counter()
+        self.hits = Counter()
+        self._pending = {}
+        self._pool = None
+        self._unsaved = 0
+        os.makedirs(directory, exist_ok=True)
+        self._usage_path = os.path.join(directory, "usage.json")
+        try:
+            with open(self._usage_path) as f:
+                self.usage.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forked like utils.charts, index.py can't be re-imported.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+            )
+        return self._pool
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def key(self, chars: List[str]) -> str:
+        return "-".join(chars) + f"-{self.size}"
+
+    def _remember(self, key: str, png: bytes):
+        self.memory[key] = png
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, key: str, png: bytes):
+        # Write then rename, so a crash never leaves half a PNG behind.
+        tmp = self.path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, self.path(key))
+
+    def _count(self, key: str):
+        self.usage[key] += 1
+        self._unsaved += 1
+        if self._unsaved >= USAGE_FLUSH_EVERY:
+            self.save_usage()
+
+    def save_usage(self):
+        self._unsaved = 0
+        try:
+            with open(self._usage_path, "w") as f:
+                json.dump(self.usage, f)
+        except OSError:
+            log.exception("Couldn't save emoji usage")
+
+    async def _render(self, chars: List[str]) -> Optional[bytes]:
+        codepoints = "-".join(chars)
+        if svg_convert is None:
+            url = http.url("twemoji", f"/2/72x72/{codepoints}.png")
+        else:
+            url = http.url("twemoji", f"/2/svg/{codepoints}.svg")
+        body = await http.relay(url)
+        if body is None:
+            return None
+        with body:
+            data = body.read()
+        if svg_convert is None:
+            return data
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.pool, rasterize, data, self.size)
+        return await asyncio.wait_for(task, RENDER_TIMEOUT)
+
+    async def _load(self, key: str, chars: List[str]) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(None, self._read, key)
+        if png is not None:
+            self.hits["disk"] += 1
+            return png
+
+        self.hits["rendered"] += 1
+        png = await self._render(chars)
+        if png is not None:
+            await loop.run_in_executor(None, self._write, key, png)
+        return png
+
+    async def get(self, chars: List[str], *, count: bool = True) -> Optional[bytes]:
+        """PNG bytes for an emoji's codepoints, or None if twemoji lacks it.
+
+        Network and render errors are raised as they are.
+        """
+        if not chars or len(chars) > MAX_CODEPOINTS:
+            return None
+        key = self.key(chars)
+        png = self.memory.get(key)
+        if png is not None:
+            self.hits["memory"] += 1
+            self.memory.move_to_end(key)
+            if count:
+                self._count(key)
+            return png
+
+        # Concurrent requests for the same emoji share one render.
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._load(key, chars))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        png = await asyncio.shield(task)
+        if png is not None:
+            self._remember(key, png)
+            # Only real emoji, or any text would end up in usage.json.
+            if count:
+                self._count(key)
+        return png
+
+    async def warm_up(self, count: int = 100):
+        """Make sure the most used emoji are rendered and in memory"""
+        warmed = 0
+        for key, _ in self.usage.most_common(count):
+            chars = key.split("-")[:-1]
+            try:
+                if await self.get(chars, count=False) is not None:
+                    warmed += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError, http.PayloadTooLarge):
+                continue
+        log.info(f"Warmed up {warmed} emoji")
+        return warmed
+
+    def stats(self) -> dict:
+        return {
+            "in_memory": len(self.memory),
+            "pending": len(self._pending),
+            **self.hits,
+        }
+
+    def close(self):
+        self.save_usage()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_cache = None
+
+
+def get_cache() -> EmojiCache:
+    global _cache
+    if _cache is None:
+        config = default.get("config.json")
+        _cache = EmojiCache(
+            getattr(config, "emoji_cache_dir", "emoji_cache"),
+            memory_items=getattr(config, "emoji_cache_items", 256),
+            workers=getattr(config, "emoji_workers", 2),
+        )
+    return _cache
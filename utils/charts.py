@@ -0,0 +1,113 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Pie chart rendering for chatchart/serverchart, off the event loop.
+
+Charts are drawn in worker processes with matplotlib's object oriented API
+(Figure + FigureCanvasAgg), so no pyplot global state is shared and a slow
+render doesn't hold up the shards.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from utils import default
+
+COLOURS = [
+    "r",
+    "darkorange",
+    "gold",
+    "y",
+    "olivedrab",
+    "green",
+    "darkcyan",
+    "mediumblue",
+    "darkblue",
+    "blueviolet",
+    "indigo",
+    "orchid",
+    "mediumvioletred",
+    "crimson",
+    "chocolate",
+    "yellow",
+    "limegreen",
+    "forestgreen",
+    "dodgerblue",
+    "slateblue",
+    "gray",
+]
+
+RENDER_TIMEOUT = 30
+
+_pool = None
+
+
+def render_pie(title: str, slices: List[Tuple[str, float]]) -> bytes:
+    """Draw a pie chart of ``(label, percent)`` slices and return it as PNG"""
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(title, color="white", va="top", ha="center")
+    ax.set_aspect("equal")
+    wedges, _ = ax.pie([x[1] for x in slices], colors=COLOURS, startangle=0)
+    ax.legend(
+        wedges,
+        ["{} {:g}%".format(label, percent) for label, percent in slices],
+        bbox_to_anchor=(0.7, 0.5),
+        loc="center",
+        fontsize=10,
+        bbox_transform=fig.transFigure,
+        facecolor="#ffffff",
+    )
+    fig.subplots_adjust(left=0.0, bottom=0.1, right=0.45)
+    image = BytesIO()
+    fig.savefig(image, format="png", facecolor="#36393E")
+    return image.getvalue()
+
+
+def get_pool(workers: int = None) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        if workers is None:
+            workers = getattr(default.get("config.json"), "chart_workers", 2)
+        # index.py starts the bot at import time, so the workers have to be
+        # forked rather than spawned (which would re-import it).
+        _pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def render(
+    title: str, slices: List[Tuple[str, float]], timeout: float = RENDER_TIMEOUT
+) -> bytes:
+    """Render a pie chart in the worker pool.
+
+    Raises :class:`asyncio.TimeoutError` if it takes longer than ``timeout``.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_pool(), render_pie, title, list(slices))
+    return await asyncio.wait_for(future, timeout)
@@ -0,0 +1,185 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Per-channel message counts for chatchart and serverchart.
+
+For every channel we store how many messages each author sent plus the
+newest message id counted. A refresh only asks Discord for messages after
+that checkpoint and adds them to the stored counts, so charting a busy
+channel again costs a few history pages instead of a hundred.
+
+:class:`Crawl` counts the recent history of many channels at once for
+serverchart, without keeping the messages around.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from utils.chatstats import ChatStats
+
+# Called with the number of messages fetched so far.
+Progress = Callable[[int], Awaitable[None]]
+
+# Channels crawled at the same time, across every running serverchart.
+# History requests are rate limited per channel, but they all count
+# towards the global 50 requests per second.
+CRAWL_CONCURRENCY = 5
+_crawl_slots = None
+
+
+def crawl_slots() -> asyncio.Semaphore:
+    global _crawl_slots
+    if _crawl_slots is None:
+        _crawl_slots = asyncio.Semaphore(CRAWL_CONCURRENCY)
+    return _crawl_slots
+
+
+class ChannelIndex:
+    def __init__(self, db):
+        self.db = db
+        self.cursor = db.cursor()
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.chatindex ("
+            "channel BIGINT PRIMARY KEY, last_message BIGINT NOT NULL)"
+        )
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.chatindex_authors ("
+            "channel BIGINT NOT NULL, author BIGINT NOT NULL, name TEXT, "
+            "messages INTEGER NOT NULL, PRIMARY KEY (channel, author))"
+        )
+        self.db.commit()
+
+    def checkpoint(self, channel_id: int) -> Optional[int]:
+        self.cursor.execute(
+            f"SELECT last_message FROM public.chatindex WHERE channel = {channel_id}"
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def load(self, channel_id: int) -> Tuple[Counter, Dict[int, str]]:
+        """Stored message counts and last known names for a channel"""
+        self.cursor.execute(
+            "SELECT author, name, messages FROM public.chatindex_authors "
+            f"WHERE channel = {channel_id}"
+        )
+        counts, names = Counter(), {}
+        for author, name, messages in self.cursor.fetchall():
+            counts[author] = messages
+            names[author] = name
+        return counts, names
+
+    def save(
+        self,
+        channel_id: int,
+        counts: Counter,
+        names: Dict[int, str],
+        last_message: int,
+    ):
+        """Add ``counts`` to the stored ones and move the checkpoint"""
+        self.cursor.executemany(
+            "INSERT INTO public.chatindex_authors (channel, author, name, messages) "
+            "VALUES (%s, %s, %s, %s) ON CONFLICT (channel, author) DO UPDATE SET "
+            "messages = chatindex_authors.messages + EXCLUDED.messages, "
+            "name = EXCLUDED.name",
+            [
+                (channel_id, author, names.get(author), messages)
+                for author, messages in counts.items()
+            ],
+        )
+        self.cursor.execute(
+            "INSERT INTO public.chatindex (channel, last_message) "
+            f"VALUES ({channel_id}, {last_message}) ON CONFLICT (channel) "
+            "DO UPDATE SET last_message = EXCLUDED.last_message"
+        )
+        self.db.commit()
+
+    async def refresh(
+        self,
+        channel: discord.TextChannel,
+        limit: int,
+        progress: Progress = None,
+        every: int = 250,
+    ) -> ChatStats:
+        """Fetch what's new in a channel and return its updated counts.
+
+        The first run indexes the last ``limit`` messages. Later runs fetch up
+        to ``limit`` messages after the checkpoint, oldest first, so a
+        backlog bigger than that is caught up over several runs.
+        """
+        last_message = self.checkpoint(channel.id)
+        if last_message is None:
+            history = channel.history(limit=limit)
+        else:
+            history = channel.history(
+                limit=limit, after=discord.Object(last_message), oldest_first=True
+            )
+
+        new = await ChatStats().consume(history, progress, every)
+        if new.fetched:
+            names = {author: new.name(author) for author in new.counts}
+            self.save(channel.id, new.counts, names, new.newest)
+
+        stats = ChatStats()
+        stats.merge(*self.load(channel.id))
+        return stats
+
+
+class Crawl:
+    """Count messages per author over the recent history of many channels.
+
+    Channels are fetched concurrently under :func:`crawl_slots` and every
+    message goes straight into one :class:`ChatStats`, so only the counts
+    are kept.
+    """
+
+    def __init__(self, channels: List[discord.TextChannel], limit: int):
+        self.channels = channels
+        self.limit = limit
+        self.stats = ChatStats()
+        self.done = 0
+        self.failed = 0
+
+    @property
+    def fetched(self) -> int:
+        return self.stats.fetched
+
+    async def _crawl_channel(self, channel: discord.TextChannel):
+        async with crawl_slots():
+            try:
+                await self.stats.consume(channel.history(limit=self.limit))
+            except (discord.Forbidden, discord.NotFound):
+                self.failed += 1
+            finally:
+                self.done += 1
+
+    async def run(
+        self, progress: Callable[["Crawl"], Awaitable[None]] = None, interval: float = 3
+    ) -> ChatStats:
+        """Crawl every channel, calling ``progress`` at most every ``interval`` seconds"""
+        task = asyncio.ensure_future(
+            asyncio.gather(*(self._crawl_channel(c) for c in self.channels))
+        )
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=interval)
+                if done:
+                    break
+                if progress is not None:
+                    await progress(self)
+        finally:
+            task.cancel()
+        await task
+        return self.stats
@@ -0,0 +1,123 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Streaming message counts per author, for chatchart/serverchart and friends.
+
+Messages are counted by author id as they come in. Names are only looked
+up, shortened and escaped for the authors that make it into the top.
+"""
+
+import heapq
+from collections import Counter
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import discord
+
+
+def legend_name(display_name: str, discriminator: str = None) -> str:
+    """Shorten and escape a name for a chart legend"""
+    if len(display_name) >= 20:
+        short_name = "{}...".format(display_name[:20]).replace("$", "\\$")
+    else:
+        short_name = (
+            display_name.replace("$", "\\$").replace("_", "\\_ ").replace("*", "\\*")
+        )
+    if discriminator is None:
+        return short_name
+    return "{}#{}".format(short_name, discriminator)
+
+
+class ChatStats:
+    def __init__(self, resolve: Callable[[int], Optional[discord.abc.User]] = None):
+        self.counts = Counter()
+        # Looks up authors that weren't seen in a message, e.g. guild.get_member.
+        self.resolve = resolve
+        # Latest User/Member object seen per author, names are read from
+        # these only when needed.
+        self.authors = {}
+        # "name#discriminator" for authors only known from stored counts.
+        self.names = {}
+        self.fetched = 0
+        self.newest = 0
+
+    def add(self, msg: discord.Message):
+        self.fetched += 1
+        if msg.id > self.newest:
+            self.newest = msg.id
+        author = msg.author
+        if author.bot:
+            return
+        self.counts[author.id] += 1
+        self.authors[author.id] = author
+
+    async def consume(
+        self,
+        messages: AsyncIterator[discord.Message],
+        progress: Callable[[int], Awaitable[None]] = None,
+        every: int = 250,
+    ) -> "ChatStats":
+        """Count every message from an async iterator such as ``channel.history``"""
+        async for msg in messages:
+            self.add(msg)
+            if progress is not None and self.fetched % every == 0:
+                await progress(self.fetched)
+        return self
+
+    def merge(self, counts: Mapping[int, int], names: Dict[int, str] = None):
+        """Add counts that were stored earlier, e.g. from the chat index"""
+        self.counts.update(counts)
+        if names:
+            self.names.update(names)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def name(self, author_id: int) -> str:
+        author = self.authors.get(author_id)
+        if author is None and self.resolve is not None:
+            author = self.resolve(author_id)
+        if author is not None:
+            return f"{author.display_name}#{author.discriminator}"
+        return self.names.get(author_id) or f"{author_id}#0000"
+
+    def label(self, author_id: int) -> str:
+        display_name, sep, discriminator = self.name(author_id).rpartition("#")
+        if not sep:
+            return legend_name(discriminator)
+        return legend_name(display_name, discriminator)
+
+    def top(self, n: int = 20) -> Tuple[List[Tuple[str, float]], float]:
+        """The top ``n`` authors as ``(label, percent)`` and the percent left"""
+        total = self.total
+        if not total:
+            return [], 0
+        top = []
+        for author_id, count in heapq.nlargest(
+            n, self.counts.items(), key=lambda x: x[1]
+        ):
+            percent = round(count / total * 100, 1)
+            if percent > 0:
+                top.append((self.label(author_id), percent))
+        # Rounding can push the top past 100 by a hair.
+        others = max(round(100 - sum(x[1] for x in top), 1), 0)
+        return top, others
@@ -11,12 +11,10 @@
 #
 ### IMPORTANT ANNOUNCEMENT ###
 
-import aiohttp
 import discord
 from discord.ext import commands
-from index import TOP_GG_TOKEN
 
-from utils import default
+from utils import default, topgg
 
 owners = default.get("config.json").owners
 
@@ -91,16 +89,7 @@ class NotVoted(commands.CheckFailure):
 async def check_voter(user_id):
     if user_id in owners:
         return True
-    async with aiohttp.ClientSession() as s:
-        async with s.get(
-            f"https://top.gg/api/bots/723726581864071178/check?userid={user_id}",
-            headers={"Authorization": TOP_GG_TOKEN, "Content-Type": "application/json"},
-        ) as r:
-            vote = await r.json()
-            if vote["voted"] == 1:
-                return True
-            else:
-                return False
+    return await topgg.has_voted(user_id)
 
 
 def voter_only():
@@ -0,0 +1,206 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Send the same thing to many channels at once, for autoposting.
+
+:class:`FanOut` runs a batch of sends concurrently under a semaphore, each
+with its own timeout, so one slow guild only holds up its own send. A
+target that gets rate limited or times out puts its route (the webhook or
+channel it posts to) on cooldown, and later batches skip that route until
+the cooldown is over instead of queueing more requests on a bucket
+Discord already told us to leave alone.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# (route, send) pairs. ``route`` names the rate limit bucket the send goes
+# to, e.g. ("webhook", id), and ``send`` is called once to get the coroutine.
+Target = Tuple[Hashable, Callable[[], Awaitable]]
+
+
+def retry_after(error: Exception, default: float) -> float:
+    """How long Discord asked us to wait, if it said"""
+    retry = getattr(error, "retry_after", None)
+    if retry is None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry = headers.get("Retry-After")
+    try:
+        return max(float(retry), 1)
+    except (TypeError, ValueError):
+        return default
+
+
+class BatchReport:
+    __slots__ = (
+        "size",
+        "sent",
+        "failed",
+        "timed_out",
+        "rate_limited",
+        "skipped",
+        "errors",
+        "duration",
+    )
+
+    def __init__(self):
+        self.size = 0
+        self.sent = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rate_limited = 0
+        # Targets left out because their route is cooling down.
+        self.skipped = 0
+        # Failures by exception name, for the log line.
+        self.errors = Counter()
+        self.duration = 0.0
+
+    def __str__(self):
+        text = (
+            f"{self.sent}/{self.size} sent in {self.duration:.1f}s, "
+            f"{self.failed} failed, {self.timed_out} timed out, "
+            f"{self.rate_limited} rate limited, {self.skipped} skipped"
+        )
+        if self.errors:
+            text += " (" + ", ".join(f"{k}: {v}" for k, v in self.errors.items()) + ")"
+        return text
+
+
+class FanOut:
+    def __init__(
+        self, concurrency: int = 25, timeout: float = 10, cooldown: float = 60
+    ):
+        self.concurrency = concurrency
+        # Per target, covering whatever the send does (lookups included).
+        self.timeout = timeout
+        # How long a route that timed out is left alone.
+        self.cooldown = cooldown
+        self.cooldowns: Dict[Hashable, float] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.last: Optional[BatchReport] = None
+        self.batches = 0
+        self.skipped_batches = 0
+        # Summed over every batch.
+        self.totals = Counter()
+        self._semaphore = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def cooling_down(self, route: Hashable, now: float = None) -> bool:
+        until = self.cooldowns.get(route)
+        if until is None:
+            return False
+        if (now or time.monotonic()) >= until:
+            del self.cooldowns[route]
+            return False
+        return True
+
+    def _cool(self, route: Hashable, seconds: float):
+        self.cooldowns[route] = time.monotonic() + seconds
+
+    async def _send(self, report: BatchReport, route: Hashable, send):
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(send(), self.timeout)
+            except asyncio.TimeoutError:
+                report.timed_out += 1
+                self._cool(route, self.cooldown)
+            except (discord.HTTPException, discord.RateLimited) as e:
+                if isinstance(e, discord.RateLimited) or e.status == 429:
+                    report.rate_limited += 1
+                    self._cool(route, retry_after(e, self.cooldown))
+                else:
+                    report.failed += 1
+                    report.errors[type(e).__name__] += 1
+                    log.debug(f"Fan-out send to {route} failed: {e}")
+            except Exception as e:
+                report.failed += 1
+                report.errors[type(e).__name__] += 1
+                log.warning(f"Fan-out send to {route} failed: {e!r}")
+            else:
+                report.sent += 1
+
+    async def run(self, targets: Iterable[Target]) -> BatchReport:
+        """Send to every target and report how it went"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        report = BatchReport()
+        start = time.monotonic()
+        sends = []
+        for route, send in targets:
+            report.size += 1
+            if self.cooling_down(route, start):
+                report.skipped += 1
+                continue
+            sends.append(self._send(report, route, send))
+        await asyncio.gather(*sends)
+        report.duration = time.monotonic() - start
+        self.batches += 1
+        self.last = report
+        self.totals.update(
+            sent=report.sent,
+            failed=report.failed,
+            timed_out=report.timed_out,
+            rate_limited=report.rate_limited,
+            skipped=report.skipped,
+        )
+        return report
+
+    def start(
+        self,
+        targets: Iterable[Target],
+        done: Callable[[BatchReport], None] = None,
+    ) -> Optional[asyncio.Task]:
+        """Run a batch in the background, unless the last one is still going.
+
+        Returns None when the batch was skipped. ``done`` gets the report
+        once the batch finishes.
+        """
+        if self.running:
+            self.skipped_batches += 1
+            return None
+        self.task = asyncio.ensure_future(self.run(targets))
+        self.task.add_done_callback(lambda task: self._finished(task, done))
+        return self.task
+
+    def _finished(self, task: asyncio.Task, done: Callable[[BatchReport], None]):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            log.error("Fan-out batch failed", exc_info=task.exception())
+        elif done is not None:
+            done(task.result())
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batches": self.batches,
+            "skipped_batches": self.skipped_batches,
+            "cooling_down": len(self.cooldowns),
+            "totals": dict(self.totals),
+            "last": str(self.last) if self.last else None,
+        }
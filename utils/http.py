@@ -12,10 +12,18 @@
 ### IMPORTANT ANNOUNCEMENT ###
 
 import asyncio
+import io
+import os
+import tempfile
+import time
+from collections import OrderedDict
 from functools import wraps
+from urllib.parse import urlsplit
 
 import aiohttp
 
+from utils import default
+
 
 def cache(maxsize=128):
     cache = {}
@@ -75,6 +83,88 @@ def async_cache(maxsize=128):
     return decorator
 
 
+class TTLCache:
+    """Keyed cache whose entries expire ``ttl`` seconds after they were stored.
+
+    Values are returned together with the time they were fetched so callers
+    can show how fresh the data is. Concurrent misses for the same key share
+    a single upstream call.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return ``(value, fetched_at)`` or ``None`` if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, fetched_at, expires = entry
+        if time.monotonic() >= expires:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value, fetched_at
+
+    def set(self, key, value, ttl: float = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, time.time(), expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+
+    async def get_or_fetch(self, key, fetch, ttl: float = None):
+        """Return the cached ``(value, fetched_at)`` for key, awaiting ``fetch()`` on a miss."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_event_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved if nobody else was waiting on it.
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            result = self.get(key) or (value, time.time())
+            future.set_result(result)
+            return result
+        finally:
+            del self._pending[key]
+
+
+def freshness(fetched_at: float) -> str:
+    """Human readable age of a cached value, for embed footers."""
+    age = int(time.time() - fetched_at)
+    if age < 5:
+        return "Live data"
+    if age < 60:
+        return f"Cached {age}s ago"
+    return f"Cached {age // 60}m ago"
+
+
 # Removes the aiohttp ClientSession instance warning.
 class HTTPSession(aiohttp.ClientSession):
     """Abstract class for aiohttp."""
@@ -93,18 +183,316 @@ class HTTPSession(aiohttp.ClientSession):
             self.close()
 
 
+class UpstreamUnavailable(aiohttp.ClientError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures.
+
+    While open every call is rejected straight away. After ``reset_after``
+    seconds a single trial call is let through; if it works the breaker
+    closes again, otherwise it stays open for another period.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def end_trial(self):
+        """Let another trial through, whatever happened to this one"""
+        self._trial = False
+
+
+class Upstream:
+    """Base URL, limits and circuit breaker for one external API.
+
+    ``base_url`` can be pointed somewhere else (e.g. the stub server in
+    utils/stubserver.py) with :func:`override`, the ``upstreams`` section of
+    config.json or an ``AGB_UPSTREAM_<NAME>`` environment variable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        *hosts: str,
+        concurrency: int = 10,
+        timeout: float = 10,
+        max_waiting: int = 50,
+        threshold: int = 5,
+        reset_after: float = 30,
+    ):
+        self.name = name
+        self.default_url = base_url
+        self.base_url = base_url
+        self.hosts = hosts or (urlsplit(base_url).hostname,)
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.breaker = CircuitBreaker(threshold, reset_after)
+        # Exceptions that count as the upstream misbehaving.
+        self.errors = (aiohttp.ClientError, asyncio.TimeoutError)
+        self.waiting = 0
+        self.calls = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def call(self, func, *args, **kwargs):
+        """Await ``func(*args, **kwargs)`` under this upstream's limits."""
+        if self.waiting >= self.max_waiting or not self.breaker.allow():
+            self.rejected += 1
+            raise UpstreamUnavailable(f"{self.name} is unavailable right now")
+
+        # allow() only lets a call through a breaker that isn't closed as its trial.
+        trial = self.breaker.state != "closed"
+        self.waiting += 1
+        self.calls += 1
+        try:
+            result = await asyncio.wait_for(
+                self._limited(func, *args, **kwargs), self.timeout
+            )
+        except self.errors:
+            self.failed += 1
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # Bad JSON and the like don't trip a closed breaker, but a trial
+            # that didn't work isn't a reason to close it either.
+            if trial:
+                self.failed += 1
+                self.breaker.record_failure()
+            raise
+        finally:
+            self.waiting -= 1
+            # Cancelled trials record nothing, they just make room for the next.
+            if trial:
+                self.breaker.end_trial()
+        self.breaker.record_success()
+        return result
+
+    async def _limited(self, func, *args, **kwargs):
+        async with self.semaphore:
+            return await func(*args, **kwargs)
+
+    @property
+    def overridden(self) -> bool:
+        return self.base_url != self.default_url
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "in_flight": self.concurrency - self.semaphore._value,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+upstreams = {
+    upstream.name: upstream
+    for upstream in (
+        Upstream("lunardev", "https://lunardev.group"),
+        Upstream("nekos", "https://nekos.life"),
+        Upstream("dbot", "https://api.dbot.dev"),
+        Upstream("covid", "https://api.covid19api.com", timeout=15),
+        Upstream(
+            "reddit",
+            "https://oauth.reddit.com",
+            "oauth.reddit.com",
+            "www.reddit.com",
+            timeout=15,
+        ),
+        Upstream("topgg", "https://top.gg/api", timeout=5),
+        Upstream("weather", "http://api.openweathermap.org", timeout=5),
+        Upstream("urban", "https://api.urbandictionary.com", timeout=5),
+        Upstream("twemoji", "https://twemoji.maxcdn.com", concurrency=20),
+        Upstream("emojicdn", "https://cdn.discordapp.com", concurrency=20),
+        Upstream("waifu", "https://api.waifu.pics"),
+        Upstream("dogapi", "https://api.thedogapi.com"),
+        Upstream("catapi", "https://api.thecatapi.com"),
+    )
+}
+_upstream_hosts = {host: up for up in upstreams.values() for host in up.hosts}
+
+
+def url(name: str, path: str = "") -> str:
+    """Build a URL for an upstream, honouring any base URL override."""
+    return upstreams[name].base_url + path
+
+
+def reddit_endpoints() -> dict:
+    """asyncpraw's endpoint arguments for an overridden reddit, {} otherwise.
+
+    asyncprawcore ``urljoin``s API paths onto ``oauth_url``, which drops the
+    last segment of a base URL without a trailing slash, but appends the
+    token path (``/api/v1/access_token``) to ``reddit_url`` as is.
+    """
+    reddit = upstreams["reddit"]
+    if not reddit.overridden:
+        return {}
+    return {"oauth_url": reddit.base_url + "/", "reddit_url": reddit.base_url}
+
+
+def override(name: str, base_url: str = None):
+    """Point an upstream at a different base URL, or back at the real one."""
+    upstream = upstreams[name]
+    upstream.base_url = (base_url or upstream.default_url).rstrip("/")
+
+
+def _load_overrides():
+    try:
+        overrides = getattr(default.get("config.json"), "upstreams", None)
+    except FileNotFoundError:
+        overrides = None
+    for name in upstreams:
+        base_url = os.environ.get(f"AGB_UPSTREAM_{name.upper()}") or getattr(
+            overrides, name, None
+        )
+        if base_url:
+            override(name, base_url)
+
+
+_load_overrides()
+
+
+def upstream_for(url: str):
+    for upstream in upstreams.values():
+        if upstream.overridden and url.startswith(upstream.base_url):
+            return upstream
+    return _upstream_hosts.get(urlsplit(url).hostname)
+
+
+def breaker_stats() -> list:
+    return [upstream.stats() for upstream in upstreams.values()]
+
+
 session = HTTPSession()
 
 
-@async_cache()
-async def query(url, method="get", res_method="text", *args, **kwargs):
+async def _request(url, method, res_method, *args, **kwargs):
     async with getattr(session, method.lower())(url, *args, **kwargs) as res:
+        if res.status >= 500:
+            # Server side errors count against the upstream's breaker.
+            res.raise_for_status()
         return await getattr(res, res_method)()
 
 
+class PayloadTooLarge(ValueError):
+    """Raised by :func:`relay` when a response is bigger than allowed."""
+
+
+# Discord's upload limit for servers without boosts.
+MAX_RELAY_SIZE = 8 * 1024 * 1024
+SPOOL_THRESHOLD = 512 * 1024
+
+
+async def _relay(url, max_size, spool_threshold, chunk_size, **kwargs):
+    async with session.get(url, **kwargs) as res:
+        if res.status >= 500:
+            res.raise_for_status()
+        if res.status != 200:
+            return None
+        if res.content_length is not None and res.content_length > max_size:
+            raise PayloadTooLarge(f"{url} is {res.content_length} bytes")
+
+        buffer = io.BytesIO()
+        size = 0
+        try:
+            async for chunk in res.content.iter_chunked(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise PayloadTooLarge(f"{url} is over {max_size} bytes")
+                if size > spool_threshold and isinstance(buffer, io.BytesIO):
+                    # Big bodies go to disk so concurrent relays don't pile up
+                    # in memory.
+                    spooled = tempfile.TemporaryFile()
+                    spooled.write(buffer.getbuffer())
+                    buffer = spooled
+                buffer.write(chunk)
+        except BaseException:
+            buffer.close()
+            raise
+        buffer.seek(0)
+        return buffer
+
+
+async def relay(
+    url,
+    *,
+    max_size: int = MAX_RELAY_SIZE,
+    spool_threshold: int = SPOOL_THRESHOLD,
+    chunk_size: int = 64 * 1024,
+    **kwargs,
+):
+    """Stream a response body into a file object ready for ``discord.File``.
+
+    Bodies up to ``spool_threshold`` bytes stay in memory, bigger ones are
+    spooled to a temporary file. Returns None for 4xx responses and raises
+    :class:`PayloadTooLarge` once the body is known to exceed ``max_size``,
+    from Content-Length when the upstream sends it.
+    """
+    args = (url, max_size, spool_threshold, chunk_size)
+    upstream = upstream_for(url)
+    if upstream is None:
+        return await _relay(*args, **kwargs)
+    return await upstream.call(_relay, *args, **kwargs)
+
+
+@async_cache()
+async def query(url, method="get", res_method="text", *args, **kwargs):
+    upstream = upstream_for(url)
+    if upstream is None:
+        return await _request(url, method, res_method, *args, **kwargs)
+    return await upstream.call(_request, url, method, res_method, *args, **kwargs)
+
+
 async def get(url, *args, **kwargs):
     return await query(url, "get", *args, **kwargs)
 
 
 async def post(url, *args, **kwargs):
     return await query(url, "post", *args, **kwargs)
+
+
+async def nekos_img(tag: str) -> str:
+    """Async replacement for ``nekos.img``, which blocks the event loop"""
+    res = await get(
+        url("nekos", f"/api/v2/img/{tag}"), res_method="json", no_cache=True
+    )
+    return res["url"]
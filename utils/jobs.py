@@ -0,0 +1,314 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Mass member operations (massrole, hoist, unbanall...) as background jobs.
+
+A command works out its targets up front and hands them to
+:meth:`JobQueue.submit`, which returns right away. Each guild gets one
+worker going through its jobs in order, one REST call per target with no
+sleeps in between: discord.py waits on the route's rate limit bucket,
+which is as fast as Discord allows and no faster.
+
+A job edits one status message with its progress, at most every
+``progress_interval`` seconds, and saves its position to
+``public.jobs`` at the same time. After a restart jobs pick up from their
+last checkpoint once their cog registers the step again. ``tp!jobs``
+lists and cancels them.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from array import array
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# step(guild, target id, job data), raises to count the target as failed.
+Step = Callable[[discord.Guild, int, dict], Awaitable[None]]
+
+
+class Job:
+    __slots__ = (
+        "id",
+        "kind",
+        "guild_id",
+        "channel_id",
+        "message_id",
+        "author_id",
+        "title",
+        "targets",
+        "position",
+        "done",
+        "failed",
+        "data",
+        "cancelled",
+        "started",
+        "started_at",
+        "reported",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        kind: str,
+        guild_id: int,
+        channel_id: int,
+        message_id: int,
+        author_id: int,
+        title: str,
+        targets: Iterable[int],
+        position: int = 0,
+        done: int = 0,
+        failed: int = 0,
+        data: Optional[dict] = None,
+    ):
+        self.id = id
+        self.kind = kind
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.author_id = author_id
+        self.title = title
+        # 8 bytes per target, not a Python int each.
+        self.targets = array("Q", targets)
+        self.position = position
+        self.done = done
+        self.failed = failed
+        self.data = data or {}
+        self.cancelled = False
+        self.started = None
+        # Position when this run started, after a restart it's the checkpoint.
+        self.started_at = position
+        self.reported = 0.0
+
+    def status(self, state: str = None) -> str:
+        total = len(self.targets)
+        line = f"{self.title}: {self.position}/{total}"
+        if self.failed:
+            line += f" ({self.failed} failed)"
+        if state:
+            return f"{line}, {state}."
+        if self.started is not None and self.position > self.started_at:
+            elapsed = time.monotonic() - self.started
+            rate = (self.position - self.started_at) / elapsed
+            left = (total - self.position) / rate
+            line += f", about {int(left // 60)}m {int(left % 60)}s left"
+        return f"{line}. `tp!jobs cancel {self.id}` to stop."
+
+
+class JobQueue:
+    def __init__(self, bot: discord.Client, db, progress_interval: float = 5):
+        self.bot = bot
+        self.db = db
+        self.progress_interval = progress_interval
+        self.cursor = db.cursor()
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.jobs ("
+            "id SERIAL PRIMARY KEY, kind TEXT NOT NULL, guild_id BIGINT NOT NULL, "
+            "channel_id BIGINT NOT NULL, message_id BIGINT NOT NULL, "
+            "author_id BIGINT NOT NULL, title TEXT NOT NULL, targets TEXT NOT NULL, "
+            "position INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0, "
+            "failed INTEGER NOT NULL DEFAULT 0, data TEXT)"
+        )
+        self.db.commit()
+        self.steps: Dict[str, Step] = {}
+        self._queues: Dict[int, Deque[Job]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.processed = 0
+        self.failed = 0
+
+    def register(self, kind: str, step: Step):
+        """Run ``step`` for each target of ``kind`` jobs, resuming saved ones"""
+        self.steps[kind] = step
+        self.cursor.execute(
+            "SELECT id, kind, guild_id, channel_id, message_id, author_id, title, "
+            "targets, position, done, failed, data FROM public.jobs "
+            "WHERE kind = %s ORDER BY id",
+            (kind,),
+        )
+        queued = {job.id for queue in self._queues.values() for job in queue}
+        for row in self.cursor.fetchall():
+            if row[0] in queued:
+                continue
+            job = Job(*row[:7], json.loads(row[7]), *row[8:11])
+            job.data = json.loads(row[11]) if row[11] else {}
+            self._enqueue(job)
+
+    def unregister(self, kind: str):
+        """Stop running ``kind`` jobs, they stay saved until it's registered again"""
+        self.steps.pop(kind, None)
+        # Running jobs notice the step is gone after their current target.
+        for queue in self._queues.values():
+            for job in list(queue)[1:]:
+                if job.kind == kind:
+                    queue.remove(job)
+
+    async def submit(
+        self,
+        ctx,
+        kind: str,
+        title: str,
+        targets: List[int],
+        data: dict = None,
+    ) -> Optional[Job]:
+        """Queue a job for ``ctx.guild``, None if there's nothing to do"""
+        if not targets:
+            await ctx.send(f"{title}: nothing to do.")
+            return None
+        message = await ctx.send(f"{title}: queued, {len(targets)} to go.")
+        self.cursor.execute(
+            "INSERT INTO public.jobs (kind, guild_id, channel_id, message_id, "
+            "author_id, title, targets, data) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+            "RETURNING id",
+            (
+                kind,
+                ctx.guild.id,
+                ctx.channel.id,
+                message.id,
+                ctx.author.id,
+                title,
+                json.dumps(targets),
+                json.dumps(data) if data else None,
+            ),
+        )
+        job_id = self.cursor.fetchone()[0]
+        self.db.commit()
+        job = Job(
+            job_id,
+            kind,
+            ctx.guild.id,
+            ctx.channel.id,
+            message.id,
+            ctx.author.id,
+            title,
+            targets,
+            data=data,
+        )
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job: Job):
+        self._queues.setdefault(job.guild_id, deque()).append(job)
+        worker = self._workers.get(job.guild_id)
+        if worker is None or worker.done():
+            self._workers[job.guild_id] = asyncio.get_event_loop().create_task(
+                self._work(job.guild_id)
+            )
+
+    def jobs(self, guild_id: int) -> List[Job]:
+        return list(self._queues.get(guild_id, ()))
+
+    async def cancel(self, guild_id: int, job_id: int) -> Optional[Job]:
+        """Stop a job after its current target, or drop it if it hasn't started"""
+        queue = self._queues.get(guild_id, ())
+        for job in queue:
+            if job.id != job_id:
+                continue
+            job.cancelled = True
+            if job is not queue[0]:
+                queue.remove(job)
+                self._delete(job)
+                await self._report(job, "cancelled")
+            return job
+        return None
+
+    async def _work(self, guild_id: int):
+        await self.bot.wait_until_ready()
+        queue = self._queues[guild_id]
+        try:
+            while queue:
+                job = queue[0]
+                try:
+                    await self._run(job)
+                except Exception:
+                    log.exception(f"Job {job.id} ({job.kind}) failed")
+                queue.popleft()
+        finally:
+            if not queue:
+                self._queues.pop(guild_id, None)
+            self._workers.pop(guild_id, None)
+
+    async def _run(self, job: Job):
+        guild = self.bot.get_guild(job.guild_id)
+        if guild is None:
+            # Unavailable or left, the checkpoint stays for the next start.
+            return
+        job.started = time.monotonic()
+        job.reported = job.started
+        await self._report(job, "starting")
+        total = len(job.targets)
+        while job.position < total and not job.cancelled:
+            step = self.steps.get(job.kind)
+            if step is None:
+                # The cog was unloaded, the checkpoint waits for it to come back.
+                self._checkpoint(job)
+                return
+            try:
+                await step(guild, job.targets[job.position], job.data)
+                job.done += 1
+            except discord.HTTPException:
+                job.failed += 1
+            except Exception:
+                job.failed += 1
+                log.exception(f"Job {job.id} ({job.kind}) step failed")
+            job.position += 1
+            now = time.monotonic()
+            if now - job.reported >= self.progress_interval:
+                job.reported = now
+                self._checkpoint(job)
+                await self._report(job)
+            self.processed += 1
+        self.failed += job.failed
+        self._delete(job)
+        await self._report(job, "cancelled" if job.cancelled else "done")
+
+    def _checkpoint(self, job: Job):
+        self.cursor.execute(
+            f"UPDATE public.jobs SET position = {job.position}, done = {job.done}, "
+            f"failed = {job.failed} WHERE id = {job.id}"
+        )
+        self.db.commit()
+
+    def _delete(self, job: Job):
+        self.cursor.execute(f"DELETE FROM public.jobs WHERE id = {job.id}")
+        self.db.commit()
+
+    async def _report(self, job: Job, state: str = None):
+        channel = self.bot.get_channel(job.channel_id)
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(job.message_id).edit(
+                content=job.status(state)
+            )
+        except discord.HTTPException:
+            pass
+
+    def stats(self) -> dict:
+        running = [queue[0] for queue in self._queues.values() if queue]
+        return {
+            "guilds": len(self._queues),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "running": ", ".join(
+                f"{job.kind}#{job.id} {job.position}/{len(job.targets)}"
+                for job in running
+            )
+            or "-",
+            "processed": self.processed,
+            "failed": self.failed,
+        }
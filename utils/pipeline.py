@@ -0,0 +1,250 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""One ``on_message`` for the whole bot.
+
+Cogs register stages with :meth:`MessagePipeline.register` instead of
+adding their own ``on_message`` listeners. Each stage declares which
+messages it cares about (some channels, some guilds or all but some, DMs
+only, some months, text it must contain, :mod:`utils.scanner` categories)
+and the pipeline files it into lookup tables by the most selective of
+those, so a message only reaches the stages listed under its channel id,
+its guild id, DMs or "every guild message". The rest of the filters are
+checked on that short list.
+
+Every stage keeps call counts and timings, shown by ``tp!perf pipeline``.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Collection, Dict, FrozenSet, List, Optional
+
+import discord
+
+from utils import scanner
+
+log = logging.getLogger(__name__)
+
+StageFunc = Callable[[discord.Message], Awaitable[None]]
+
+
+class Stage:
+    __slots__ = (
+        "name",
+        "func",
+        "channels",
+        "guilds",
+        "exclude_guilds",
+        "dm",
+        "months",
+        "contains",
+        "matches",
+        "bots",
+        "order",
+        "calls",
+        "errors",
+        "elapsed",
+        "slowest",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        func: StageFunc,
+        *,
+        channels: Collection[int] = None,
+        guilds: Collection[int] = None,
+        exclude_guilds: Collection[int] = None,
+        dm: Optional[bool] = None,
+        months: Collection[int] = None,
+        contains: Collection[str] = None,
+        matches: Collection[str] = None,
+        bots: bool = False,
+        order: int = 0,
+    ):
+        self.name = name
+        self.func = func
+        self.channels = frozenset(channels) if channels else None
+        self.guilds = frozenset(guilds) if guilds else None
+        self.exclude_guilds = frozenset(exclude_guilds) if exclude_guilds else None
+        # True for DMs only, False for guild messages only, None for both.
+        self.dm = dm
+        self.months = frozenset(months) if months else None
+        # Lowercase substrings, at least one has to be in the message.
+        self.contains = tuple(s.lower() for s in contains) if contains else None
+        # utils.scanner categories, at least one has to be found.
+        self.matches = frozenset(matches) if matches else None
+        self.bots = bots
+        self.order = order
+        self.calls = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.slowest = 0.0
+
+    def wants(
+        self,
+        msg: discord.Message,
+        lowered: Callable[[], str],
+        found: Callable[[], FrozenSet[str]],
+    ) -> bool:
+        """The filters that aren't covered by the routing tables"""
+        if not self.bots and msg.author.bot:
+            return False
+        if (
+            self.exclude_guilds is not None
+            and msg.guild is not None
+            and msg.guild.id in self.exclude_guilds
+        ):
+            return False
+        if self.contains is not None:
+            content = lowered()
+            if not any(s in content for s in self.contains):
+                return False
+        if self.matches is not None and self.matches.isdisjoint(found()):
+            return False
+        return True
+
+    async def run(self, msg: discord.Message):
+        start = time.perf_counter()
+        try:
+            await self.func(msg)
+        except Exception:
+            self.errors += 1
+            log.exception(f"Message stage {self.name} failed")
+        finally:
+            elapsed = time.perf_counter() - start
+            self.calls += 1
+            self.elapsed += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": self.elapsed / self.calls * 1000 if self.calls else 0,
+            "max_ms": self.slowest * 1000,
+        }
+
+
+class MessagePipeline:
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self._by_channel: Dict[int, List[Stage]] = {}
+        self._by_guild: Dict[int, List[Stage]] = {}
+        self._dm: List[Stage] = []
+        self._in_guild: List[Stage] = []
+        self._month = None
+        self._month_checked = 0.0
+        self.messages = 0
+        # Time spent picking stages, and running them, over all messages.
+        self.routing = 0.0
+        self.elapsed = 0.0
+
+    def register(self, name: str, func: StageFunc, **filters) -> Stage:
+        """Run ``func`` for matching messages, replacing a stage of the same name.
+
+        Filters are the keyword arguments of :class:`Stage`.
+        """
+        stage = self.stages[name] = Stage(name, func, **filters)
+        self._build()
+        return stage
+
+    def unregister(self, name: str):
+        if self.stages.pop(name, None) is not None:
+            self._build()
+
+    def _build(self):
+        """Rebuild the routing tables, for the stages active this month"""
+        self._month = datetime.today().month
+        self._month_checked = time.monotonic()
+        by_channel, by_guild, dm, in_guild = {}, {}, [], []
+        for stage in sorted(self.stages.values(), key=lambda s: s.order):
+            if stage.months is not None and self._month not in stage.months:
+                continue
+            if stage.channels is not None:
+                for channel_id in stage.channels:
+                    by_channel.setdefault(channel_id, []).append(stage)
+            elif stage.guilds is not None:
+                for guild_id in stage.guilds:
+                    by_guild.setdefault(guild_id, []).append(stage)
+            else:
+                if stage.dm is not False:
+                    dm.append(stage)
+                if stage.dm is not True:
+                    in_guild.append(stage)
+        self._by_channel = by_channel
+        self._by_guild = by_guild
+        self._dm = dm
+        self._in_guild = in_guild
+
+    def route(self, msg: discord.Message) -> List[Stage]:
+        """The stages that want ``msg``, in order"""
+        # Month gated stages come and go with the tables, checked once a minute.
+        now = time.monotonic()
+        if now - self._month_checked >= 60:
+            self._month_checked = now
+            if datetime.today().month != self._month:
+                self._build()
+
+        guild = msg.guild
+        if guild is None:
+            candidates = self._dm
+        else:
+            candidates = self._in_guild
+            by_guild = self._by_guild.get(guild.id)
+            by_channel = self._by_channel.get(msg.channel.id)
+            if by_guild or by_channel:
+                candidates = sorted(
+                    [*candidates, *(by_guild or ()), *(by_channel or ())],
+                    key=lambda s: s.order,
+                )
+        if not candidates:
+            return []
+
+        lowered = None
+
+        def lower() -> str:
+            nonlocal lowered
+            if lowered is None:
+                lowered = msg.content.lower()
+            return lowered
+
+        def found() -> FrozenSet[str]:
+            return scanner.scan(msg.content)
+
+        return [stage for stage in candidates if stage.wants(msg, lower, found)]
+
+    async def dispatch(self, msg: discord.Message):
+        """Run every stage that wants ``msg``, side by side like listeners"""
+        start = time.perf_counter()
+        stages = self.route(msg)
+        routed = time.perf_counter()
+        self.messages += 1
+        self.routing += routed - start
+        if len(stages) == 1:
+            await stages[0].run(msg)
+        elif stages:
+            await asyncio.gather(*(stage.run(msg) for stage in stages))
+        self.elapsed += time.perf_counter() - routed
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "routing_us": self.routing / self.messages * 1e6 if self.messages else 0,
+            "avg_ms": self.elapsed / self.messages * 1000 if self.messages else 0,
+            "stages": [stage.stats() for stage in self.stages.values()],
+        }
@@ -0,0 +1,120 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Waiting for someone's reply, without a ``wait_for`` check per message.
+
+``bot.wait_for("message", check=...)`` runs every pending check against
+every message the bot receives. :class:`PromptService` files pending
+prompts under ``(channel id, author id)`` instead, so a message costs one
+dict lookup and only the prompts for that author in that channel look at
+it. Timeouts share one :class:`~utils.timers.TimerWheel`, so they fire up
+to a tick late.
+
+Use :meth:`PromptService.wait` where ``wait_for`` would have been::
+
+    try:
+        reply = await self.bot.prompts.wait(ctx.channel.id, ctx.author.id, 30)
+    except asyncio.TimeoutError:
+        ...
+
+Like ``wait_for``, the reply still goes on to the rest of the bot.
+"""
+
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from utils.timers import TimerWheel
+
+Key = Tuple[int, int]
+Check = Callable[[discord.Message], bool]
+
+
+class Prompt:
+    __slots__ = ("key", "future", "check")
+
+    def __init__(self, key: Key, future: asyncio.Future, check: Optional[Check]):
+        self.key = key
+        self.future = future
+        self.check = check
+
+
+class PromptService:
+    def __init__(self, tick: float = 0.5):
+        self._waiting: Dict[Key, List[Prompt]] = {}
+        self._timeouts = TimerWheel(tick)
+        self.answered = 0
+        self.timed_out = 0
+
+    def __len__(self):
+        return len(self._timeouts)
+
+    async def wait(
+        self, channel_id: int, author_id: int, timeout: float, check: Check = None
+    ) -> discord.Message:
+        """The next message from ``author_id`` in ``channel_id`` passing ``check``.
+
+        Raises :class:`asyncio.TimeoutError` like ``wait_for``.
+        """
+        prompt = Prompt(
+            (channel_id, author_id), asyncio.get_running_loop().create_future(), check
+        )
+        self._waiting.setdefault(prompt.key, []).append(prompt)
+        self._timeouts.add(prompt, timeout)
+        self._timeouts.sweep(self._expire)
+        try:
+            return await prompt.future
+        finally:
+            self._discard(prompt)
+
+    def _discard(self, prompt: Prompt):
+        self._timeouts.remove(prompt)
+        prompts = self._waiting.get(prompt.key)
+        if prompts is None:
+            return
+        try:
+            prompts.remove(prompt)
+        except ValueError:
+            pass
+        if not prompts:
+            del self._waiting[prompt.key]
+
+    def _expire(self, prompt: Prompt):
+        if not prompt.future.done():
+            self.timed_out += 1
+            prompt.future.set_exception(asyncio.TimeoutError())
+
+    def feed(self, msg: discord.Message):
+        """Hand ``msg`` to the prompts waiting on its author in its channel"""
+        prompts = self._waiting.get((msg.channel.id, msg.author.id))
+        if prompts is None:
+            return
+        for prompt in prompts:
+            if prompt.future.done():
+                continue
+            try:
+                if prompt.check is not None and not prompt.check(msg):
+                    continue
+            except Exception as e:
+                prompt.future.set_exception(e)
+                continue
+            self.answered += 1
+            prompt.future.set_result(msg)
+
+    def stats(self) -> dict:
+        return {
+            "waiting": len(self),
+            "answered": self.answered,
+            "timed_out": self.timed_out,
+        }
@@ -0,0 +1,135 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Reactions on the few messages the bot is waiting on.
+
+Instead of ``on_reaction_add`` listeners that look at every reaction the
+bot sees, cogs register the message ids they care about with
+:meth:`ReactionRouter.register`. A raw reaction event is one dict lookup
+by message id, and nothing else happens for messages nobody registered,
+cached or not. Registrations that time out are swept by a
+:class:`~utils.timers.TimerWheel`.
+"""
+
+import logging
+from typing import Awaitable, Callable, Collection, Dict, Optional
+
+import discord
+
+from utils.timers import TimerWheel
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[discord.RawReactionActionEvent], Awaitable[None]]
+
+
+class Registration:
+    __slots__ = ("message_id", "handler", "emojis", "owner", "on_expire")
+
+    def __init__(
+        self,
+        message_id: int,
+        handler: Handler,
+        emojis: Optional[frozenset],
+        owner: object,
+        on_expire: Optional[Callable[[int], None]],
+    ):
+        self.message_id = message_id
+        self.handler = handler
+        # str() of the emojis to pass on, None for all of them.
+        self.emojis = emojis
+        self.owner = owner
+        self.on_expire = on_expire
+
+
+class ReactionRouter:
+    def __init__(self, bot: discord.Client, tick: float = 1.0):
+        self.bot = bot
+        self._registrations: Dict[int, Registration] = {}
+        self._timeouts = TimerWheel(tick)
+        self.dispatched = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._registrations)
+
+    def register(
+        self,
+        message_id: int,
+        handler: Handler,
+        *,
+        emojis: Collection[str] = None,
+        timeout: float = None,
+        owner: object = None,
+        on_expire: Callable[[int], None] = None,
+    ):
+        """Call ``handler`` with the raw payload of reactions added to a message.
+
+        The bot's own reactions are never passed on. ``owner`` (usually the
+        cog) is for :meth:`unregister_owner`, ``on_expire`` is called with
+        the message id if ``timeout`` runs out first.
+        """
+        self._registrations[message_id] = Registration(
+            message_id,
+            handler,
+            frozenset(emojis) if emojis else None,
+            owner,
+            on_expire,
+        )
+        if timeout is None:
+            self._timeouts.remove(message_id)
+            return
+        self._timeouts.add(message_id, timeout)
+        self._timeouts.sweep(self._expire)
+
+    def unregister(self, message_id: int):
+        self._registrations.pop(message_id, None)
+        self._timeouts.remove(message_id)
+
+    def unregister_owner(self, owner: object):
+        """Drop everything a cog registered, e.g. when it's unloaded"""
+        for message_id, registration in list(self._registrations.items()):
+            if registration.owner is owner:
+                self.unregister(message_id)
+
+    def _expire(self, message_id: int):
+        registration = self._registrations.pop(message_id, None)
+        if registration is None:
+            return
+        self.expired += 1
+        if registration.on_expire is not None:
+            registration.on_expire(message_id)
+
+    async def dispatch(self, payload: discord.RawReactionActionEvent):
+        registration = self._registrations.get(payload.message_id)
+        if registration is None:
+            return
+        if payload.user_id == self.bot.user.id:
+            return
+        if (
+            registration.emojis is not None
+            and str(payload.emoji) not in registration.emojis
+        ):
+            return
+        self.dispatched += 1
+        try:
+            await registration.handler(payload)
+        except Exception:
+            log.exception(f"Reaction handler for {payload.message_id} failed")
+
+    def stats(self) -> dict:
+        return {
+            "registered": len(self._registrations),
+            "dispatched": self.dispatched,
+            "expired": self.expired,
+        }
@@ -0,0 +1,257 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Scam link detection for ``Admin.linkblacklist``.
+
+Links are pulled out of a message once, their hosts normalized, and each
+host is looked up in hashed sets, so the cost of a message depends on how
+many links it has and not on how long the blocklist is. ``scam_domains.json``
+holds:
+
+- ``domains``: block the host and all of its subdomains
+- ``labels``: block a name under any TLD, ``steamcomminuty`` matches
+  ``steamcomminuty.ru`` and ``login.steamcomminuty.com``
+- ``paths``: block a host only under a path, for link shorteners
+- ``protected``: real names (``discord``, ``steamcommunity``...) whose
+  near misses get reported as possible typo-squats
+
+The file is read again whenever it changes, no restart needed.
+"""
+
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from utils.common_filters import URL_RE
+
+BLOCKLIST_FILE = "scam_domains.json"
+# How often the file's mtime is looked at.
+RELOAD_CHECK_EVERY = 30
+
+# Scheme-less links, "discordgift.site/abc". Hosts inside URL_RE matches are
+# preceded by "/" and skipped here.
+BARE_LINK_RE = re.compile(
+    r"(?<![\w@/.-])(?=[a-z0-9-]+\.[a-z])(?:[a-z0-9-]+\.)+[a-z]{2,}(?:/\S*)?", re.I
+)
+HOST_END_RE = re.compile(r"[/?#]")
+# The same few hosts (tenor, youtube, discord) make up most links.
+CACHE_SIZE = 1024
+
+
+class Hit(NamedTuple):
+    url: str
+    # "domain", "label", "path" or "typo-squat of <name>"
+    reason: str
+    # Typo-squats are only a guess, they get reported but not deleted.
+    certain: bool
+
+
+def normalize_host(host: str) -> str:
+    """Lowercase, no userinfo, port, trailing dot or www., punycode decoded"""
+    host = host.rpartition("@")[2].partition(":")[0].strip(".").lower()
+    if "xn--" in host:
+        try:
+            host = host.encode("ascii").decode("idna")
+        except UnicodeError:
+            pass
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def split_url(rest: str) -> Tuple[str, str]:
+    """``host/path?query`` into a normalized host and lowercase path"""
+    match = HOST_END_RE.search(rest)
+    end = match.start() if match else len(rest)
+    return normalize_host(rest[:end]), rest[end:].lower()
+
+
+def extract_links(content: str) -> List[Tuple[str, str, str]]:
+    """``(url, host, path)`` for every link in a message"""
+    links = []
+    for match in URL_RE.finditer(content):
+        host, path = split_url(match.group(2))
+        links.append((match.group(0), host, path))
+    for match in BARE_LINK_RE.finditer(content):
+        host, path = split_url(match.group(0))
+        links.append((match.group(0), host, path))
+    return links
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """Edit distance counting swapped neighbours as one edit, capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if (
+                previous2 is not None
+                and i > 1
+                and j > 1
+                and char_a == b[j - 2]
+                and a[i - 2] == char_b
+            ):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletions(word: str, depth: int) -> Set[str]:
+    """``word`` with up to ``depth`` characters removed"""
+    found = {word}
+    edge = {word}
+    for _ in range(depth):
+        edge = {w[:i] + w[i + 1 :] for w in edge for i in range(len(w))}
+        found |= edge
+    return found
+
+
+class TypoIndex:
+    """Finds names within an edit or two of a protected name.
+
+    Every protected name is stored under all of its deletion variants, a
+    candidate is looked up by its own deletion variants, and only those
+    few hits get a real distance check.
+    """
+
+    def __init__(self, names: Iterable[str], max_distance: int = 1):
+        self.names = frozenset(name.lower() for name in names)
+        self.max_distance = max_distance
+        self.index: Dict[str, Set[str]] = {}
+        for name in self.names:
+            for variant in deletions(name, self.limit(name)):
+                self.index.setdefault(variant, set()).add(name)
+
+    def limit(self, name: str) -> int:
+        # A single edit in a short name is usually a different word.
+        return self.max_distance + (len(name) >= 10)
+
+    def lookup(self, label: str) -> Optional[str]:
+        """The protected name ``label`` looks like, if it isn't that name"""
+        if label in self.names or len(label) < 4:
+            return None
+        candidates = set()
+        for variant in deletions(label, self.max_distance + 1):
+            candidates |= self.index.get(variant, set())
+        for name in sorted(candidates):
+            if distance(label, name, self.limit(name)) <= self.limit(name):
+                return name
+        return None
+
+
+class Blocklist:
+    def __init__(
+        self,
+        domains: Iterable[str] = (),
+        labels: Iterable[str] = (),
+        paths: Iterable[str] = (),
+        protected: Iterable[str] = (),
+    ):
+        self.domains = frozenset(normalize_host(d) for d in domains)
+        self.labels = frozenset(label.strip(".").lower() for label in labels)
+        self.paths: Dict[str, Tuple[str, ...]] = {}
+        for entry in paths:
+            host, path = split_url(entry)
+            self.paths[host] = self.paths.get(host, ()) + (path,)
+        self.typos = TypoIndex(protected)
+        self.check_host = lru_cache(maxsize=CACHE_SIZE)(self._check_host)
+
+    def __len__(self):
+        return len(self.domains) + len(self.labels) + len(self.paths)
+
+    def _check_host(self, host: str, path: str = "") -> Optional[Tuple[str, bool]]:
+        """``(reason, certain)`` if the link is a scam, else None"""
+        parts = host.split(".")
+        if len(parts) < 2:
+            return None
+        # The host and every parent domain.
+        for i in range(len(parts) - 1):
+            if ".".join(parts[i:]) in self.domains:
+                return "domain", True
+        prefixes = self.paths.get(host)
+        if prefixes and path.startswith(prefixes):
+            return "path", True
+        # The name without its TLD, or without a two part one like co.uk.
+        for tld_parts in (1, 2):
+            name = parts[:-tld_parts]
+            for i in range(len(name)):
+                if ".".join(name[i:]) in self.labels:
+                    return "label", True
+        # The label right before the TLD, e.g. "dlscord" in dlscord.com.
+        lookalike = self.typos.lookup(parts[-2])
+        if lookalike is not None:
+            return f"typo-squat of {lookalike}", False
+        return None
+
+    def check(self, content: str) -> List[Hit]:
+        hits = []
+        for url, host, path in extract_links(content):
+            found = self.check_host(host, path)
+            if found is not None:
+                hits.append(Hit(url, *found))
+        return hits
+
+    @classmethod
+    def from_file(cls, path: str = BLOCKLIST_FILE) -> "Blocklist":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data.get("domains", []),
+            data.get("labels", []),
+            data.get("paths", []),
+            data.get("protected", []),
+        )
+
+
+_blocklist = None
+_loaded_mtime = None
+_checked_at = 0.0
+
+
+def get_blocklist() -> Blocklist:
+    """The blocklist from BLOCKLIST_FILE, reloaded when the file changes"""
+    global _blocklist, _loaded_mtime, _checked_at
+    now = time.monotonic()
+    if _blocklist is not None and now - _checked_at < RELOAD_CHECK_EVERY:
+        return _blocklist
+    _checked_at = now
+    try:
+        mtime = os.stat(BLOCKLIST_FILE).st_mtime
+    except OSError:
+        mtime = None
+    if _blocklist is None or mtime != _loaded_mtime:
+        try:
+            _blocklist = Blocklist.from_file()
+        except (OSError, ValueError):
+            # Keep the last good list while the file is missing or half written.
+            if _blocklist is None:
+                _blocklist = Blocklist()
+        _loaded_mtime = mtime
+    return _blocklist
+
+
+def check(content: str) -> List[Hit]:
+    """Scam links in a message"""
+    return get_blocklist().check(content)
@@ -0,0 +1,197 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Every content check in one pass.
+
+The word lists and regexes from ``scan_patterns.json`` are compiled into a
+single case-insensitive alternation, so most messages are scanned once
+and :func:`scan` returns the set of categories that matched. Only when
+that finds something is each category's own pattern run, from the first
+match on, so categories whose matches overlap are all reported.
+
+Word lists are folded into a trie and the whole pattern is guarded by the
+set of characters a match can start with, so most messages are rejected
+by a single search that never leaves C.
+
+The file is read again with :func:`reload` (``tp!reloadpatterns``), no
+restart needed.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set
+
+try:
+    from re import _parser as sre_parse
+    from re._constants import (
+        AT,
+        BRANCH,
+        IN,
+        LITERAL,
+        MAX_REPEAT,
+        MIN_REPEAT,
+        RANGE,
+        SUBPATTERN,
+    )
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import (
+        AT,
+        BRANCH,
+        IN,
+        LITERAL,
+        MAX_REPEAT,
+        MIN_REPEAT,
+        RANGE,
+        SUBPATTERN,
+    )
+
+PATTERNS_FILE = "scan_patterns.json"
+# Several stages look at the same message, they share one scan.
+CACHE_SIZE = 512
+
+NOTHING = frozenset()
+
+
+def word_pattern(words: List[str]) -> str:
+    """An alternation of ``words`` factored into a trie, e.g. ``ab(?:c|d)``.
+
+    The regex engine tries the branches of an alternation one by one at
+    every position, sharing prefixes keeps that down to one branch per
+    first letter.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            re.escape(char) + build(child) for char, child in node.items() if char
+        ]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+    return build(trie)
+
+
+def first_chars(parsed) -> Optional[Set[str]]:
+    """Characters a parsed regex can start with, None if it isn't that simple"""
+    for op, av in parsed:
+        if op is AT:
+            # \b, ^ and friends don't consume anything.
+            continue
+        if op is LITERAL:
+            return {chr(av)}
+        if op is IN:
+            chars = set()
+            for item_op, item in av:
+                if item_op is LITERAL:
+                    chars.add(chr(item))
+                elif item_op is RANGE and item[1] - item[0] < 256:
+                    chars.update(map(chr, range(item[0], item[1] + 1)))
+                else:
+                    return None
+            return chars
+        if op is SUBPATTERN:
+            return first_chars(av[-1])
+        if op is BRANCH:
+            chars = set()
+            for branch in av[1]:
+                branch_chars = first_chars(branch)
+                if branch_chars is None:
+                    return None
+                chars |= branch_chars
+            return chars
+        if op in (MAX_REPEAT, MIN_REPEAT) and av[0] >= 1:
+            return first_chars(av[2])
+        return None
+    return None
+
+
+class Scanner:
+    def __init__(self, patterns: Dict[str, Dict[str, List[str]]]):
+        """``patterns`` maps a category to its ``regex`` and/or ``words`` lists"""
+        self.categories = tuple(patterns)
+        self.patterns: Dict[str, re.Pattern] = {}
+        alternatives = []
+        starts = set()
+        for category, entry in patterns.items():
+            parts = list(entry.get("regex", []))
+            words = entry.get("words", [])
+            if words:
+                parts.append(word_pattern(words))
+            if not parts:
+                continue
+            alternative = "|".join(parts)
+            self.patterns[category] = re.compile(alternative, re.I)
+            alternatives.append(f"(?:{alternative})")
+            if starts is not None:
+                chars = first_chars(sre_parse.parse(alternative))
+                starts = None if chars is None else starts | chars
+        pattern = "|".join(alternatives)
+        if starts:
+            # Lets the engine give up on most positions after one character
+            # class test, instead of trying every category there.
+            starts |= {char.swapcase() for char in starts}
+            pattern = f"(?=[{re.escape(''.join(sorted(starts)))}])(?:{pattern})"
+        self.regex = re.compile(pattern, re.I) if alternatives else None
+        self.scan = lru_cache(maxsize=CACHE_SIZE)(self._scan)
+
+    def _scan(self, text: str) -> FrozenSet[str]:
+        if not text or self.regex is None:
+            return NOTHING
+        match = self.regex.search(text)
+        if match is None:
+            return NOTHING
+        # No category can match before the combined pattern's first match.
+        start = match.start()
+        return frozenset(
+            category
+            for category, regex in self.patterns.items()
+            if regex.search(text, start)
+        )
+
+    @classmethod
+    def from_file(cls, path: str = PATTERNS_FILE) -> "Scanner":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+_scanner = None
+
+
+def get_scanner() -> Scanner:
+    global _scanner
+    if _scanner is None:
+        _scanner = Scanner.from_file()
+    return _scanner
+
+
+def reload() -> Scanner:
+    """Read the pattern file again. A broken file keeps the old patterns."""
+    global _scanner
+    _scanner = Scanner.from_file()
+    return _scanner
+
+
+def scan(text: str) -> FrozenSet[str]:
+    """The categories found in ``text``"""
+    return get_scanner().scan(text)
@@ -0,0 +1,273 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Timed moderation actions that survive restarts.
+
+An action (an unmute, an unban...) is a row in ``public.scheduled_actions``
+with the time it's due. Only the actions due within ``horizon`` seconds
+are held in memory, in a heap, and one task sleeps until the earliest of
+them. Everything due by then is run as a batch and deleted in one query.
+Further out actions stay in the table until the horizon reaches them, so
+memory doesn't grow with the number of pending mutes.
+
+Cogs :meth:`Scheduler.register` a coroutine per action name, it gets the
+:class:`Action`. Actions whose cog isn't loaded wait until it is. An
+action whose handler raises is retried with a growing delay, up to
+``MAX_ATTEMPTS`` times.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[["Action"], Awaitable[None]]
+# How long an action with no handler waits before it's tried again.
+NO_HANDLER_RETRY = 60
+# A failed action is retried after RETRY_DELAY, then twice that, and so on.
+RETRY_DELAY = 30
+MAX_ATTEMPTS = 5
+
+
+class Action:
+    __slots__ = ("id", "name", "guild_id", "target_id", "run_at", "data", "attempts")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        guild_id: int,
+        target_id: int,
+        run_at: float,
+        data: Optional[dict] = None,
+        attempts: int = 0,
+    ):
+        self.id = id
+        self.name = name
+        self.guild_id = guild_id
+        self.target_id = target_id
+        # Unix time
+        self.run_at = run_at
+        self.data = data or {}
+        # Failed runs so far
+        self.attempts = attempts
+
+
+class Scheduler:
+    def __init__(self, bot: discord.Client, db, horizon: float = 3600):
+        self.bot = bot
+        self.db = db
+        self.horizon = horizon
+        self.cursor = db.cursor()
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.scheduled_actions ("
+            "id SERIAL PRIMARY KEY, name TEXT NOT NULL, guild_id BIGINT NOT NULL, "
+            "target_id BIGINT NOT NULL, run_at DOUBLE PRECISION NOT NULL, "
+            "data TEXT)"
+        )
+        self.cursor.execute(
+            "ALTER TABLE public.scheduled_actions "
+            "ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0"
+        )
+        self.db.commit()
+        self.handlers: Dict[str, Handler] = {}
+        self._queue: List[Tuple[float, int]] = []
+        self._actions: Dict[int, Action] = {}
+        # Everything due up to here is in memory.
+        self._loaded_until = float("-inf")
+        self._wake = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self.ran = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._actions)
+
+    def register(self, name: str, handler: Handler):
+        self.handlers[name] = handler
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.get_event_loop().create_task(self._run())
+        self._wake.set()
+
+    def unregister(self, name: str):
+        self.handlers.pop(name, None)
+
+    def _track(self, action: Action):
+        self._actions[action.id] = action
+        heapq.heappush(self._queue, (action.run_at, action.id))
+
+    def _load(self, until: float):
+        """Pull in the actions due before ``until`` that aren't loaded yet"""
+        self.cursor.execute(
+            "SELECT id, name, guild_id, target_id, run_at, data, attempts "
+            "FROM public.scheduled_actions WHERE run_at > %s AND run_at <= %s",
+            (self._loaded_until, until),
+        )
+        for row in self.cursor.fetchall():
+            action_id, name, guild_id, target_id, run_at, data, attempts = row
+            if action_id not in self._actions:
+                self._track(
+                    Action(
+                        action_id,
+                        name,
+                        guild_id,
+                        target_id,
+                        run_at,
+                        json.loads(data) if data else None,
+                        attempts,
+                    )
+                )
+        self._loaded_until = until
+
+    def schedule(
+        self,
+        name: str,
+        guild_id: int,
+        target_id: int,
+        delay: float,
+        data: dict = None,
+    ) -> Action:
+        """Run ``name``'s handler for ``target_id`` in ``delay`` seconds.
+
+        Replaces a pending action of the same name for the same target.
+        """
+        self.cancel(name, guild_id, target_id)
+        run_at = time.time() + delay
+        self.cursor.execute(
+            "INSERT INTO public.scheduled_actions (name, guild_id, target_id, run_at, data) "
+            "VALUES (%s, %s, %s, %s, %s) RETURNING id",
+            (name, guild_id, target_id, run_at, json.dumps(data) if data else None),
+        )
+        action_id = self.cursor.fetchone()[0]
+        self.db.commit()
+        action = Action(action_id, name, guild_id, target_id, run_at, data)
+        if run_at <= self._loaded_until:
+            self._track(action)
+            self._wake.set()
+        return action
+
+    def cancel(self, name: str, guild_id: int, target_id: int) -> bool:
+        """Drop a pending action, True if there was one"""
+        self.cursor.execute(
+            "DELETE FROM public.scheduled_actions "
+            "WHERE name = %s AND guild_id = %s AND target_id = %s RETURNING id",
+            (name, guild_id, target_id),
+        )
+        ids = [row[0] for row in self.cursor.fetchall()]
+        self.db.commit()
+        for action_id in ids:
+            # Its heap entry is skipped when it comes up.
+            self._actions.pop(action_id, None)
+        return bool(ids)
+
+    def pending(self, name: str, guild_id: int, target_id: int) -> Optional[float]:
+        """When a pending action is due, None if there isn't one"""
+        self.cursor.execute(
+            "SELECT run_at FROM public.scheduled_actions "
+            "WHERE name = %s AND guild_id = %s AND target_id = %s",
+            (name, guild_id, target_id),
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def _due(self, now: float) -> List[Action]:
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            _, action_id = heapq.heappop(self._queue)
+            action = self._actions.pop(action_id, None)
+            if action is not None:
+                due.append(action)
+        return due
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            now = time.time()
+            if self._loaded_until < now + self.horizon / 2:
+                self._load(now + self.horizon)
+            due = self._due(now)
+            if due:
+                await self._run_batch(due)
+                continue
+            # Sleep until the next action, or the next refill from the table.
+            wait = self._loaded_until - self.horizon / 2 - now
+            if self._queue:
+                wait = min(wait, self._queue[0][0] - now)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(wait, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_batch(self, due: List[Action]):
+        runnable = [action for action in due if action.name in self.handlers]
+        for action in due:
+            if action.name not in self.handlers:
+                action.run_at = time.time() + NO_HANDLER_RETRY
+                self._track(action)
+        results = await asyncio.gather(
+            *(self.handlers[action.name](action) for action in runnable),
+            return_exceptions=True,
+        )
+        finished = []
+        for action, result in zip(runnable, results):
+            self.ran += 1
+            if not isinstance(result, Exception):
+                finished.append(action)
+                continue
+            self.failed += 1
+            action.attempts += 1
+            if action.attempts >= MAX_ATTEMPTS:
+                log.error(
+                    f"Scheduled {action.name} for {action.target_id} failed "
+                    f"{action.attempts} times, giving up",
+                    exc_info=result,
+                )
+                finished.append(action)
+                continue
+            log.warning(
+                f"Scheduled {action.name} for {action.target_id} failed, retrying",
+                exc_info=result,
+            )
+            self._retry(action)
+        if finished:
+            self.cursor.execute(
+                "DELETE FROM public.scheduled_actions WHERE id IN ({})".format(
+                    ", ".join(str(action.id) for action in finished)
+                )
+            )
+        self.db.commit()
+
+    def _retry(self, action: Action):
+        action.run_at = time.time() + RETRY_DELAY * 2 ** (action.attempts - 1)
+        self.cursor.execute(
+            "UPDATE public.scheduled_actions SET run_at = %s, attempts = %s "
+            "WHERE id = %s",
+            (action.run_at, action.attempts, action.id),
+        )
+        if action.run_at <= self._loaded_until:
+            self._track(action)
+
+    def stats(self) -> dict:
+        return {
+            "in_memory": len(self._actions),
+            "ran": self.ran,
+            "failed": self.failed,
+            "next_in": self._queue[0][0] - time.time() if self._queue else None,
+        }
@@ -0,0 +1,211 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Deleted and edited messages for ``tp!snipe`` and ``tp!editsnipe``.
+
+A :class:`Snipe` only holds ids, strings and a timestamp, never the
+Message, Member or Attachment objects, so nothing here keeps a guild's
+state alive. Every channel keeps its last few snipes, entries expire after
+a while, and the whole store is capped at an approximate byte size by
+dropping the oldest entries of the channels written to least recently.
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from utils import default
+
+Key = Tuple[int, int]
+
+# What an empty Snipe and its deque slot cost, measured once below.
+_RECORD_BYTES = 0
+
+
+class Snipe:
+    __slots__ = (
+        "author_id",
+        "author_name",
+        "avatar_url",
+        "channel_name",
+        "content",
+        "edited",
+        "created_at",
+        "attachments",
+        "stored_at",
+        "size",
+    )
+
+    def __init__(
+        self,
+        author_id: int,
+        author_name: str,
+        avatar_url: Optional[str],
+        channel_name: str,
+        content: str,
+        edited: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+        attachments: Tuple[Tuple[str, str], ...] = (),
+    ):
+        self.author_id = author_id
+        self.author_name = author_name
+        self.avatar_url = avatar_url
+        self.channel_name = channel_name
+        self.content = content
+        # The content after the edit, None for deleted messages.
+        self.edited = edited
+        self.created_at = created_at
+        # (filename, proxy url) pairs.
+        self.attachments = attachments
+        self.stored_at = time.monotonic()
+        self.size = (
+            _RECORD_BYTES
+            + sum(
+                sys.getsizeof(s)
+                for s in (author_name, avatar_url, channel_name, content, edited)
+                if s is not None
+            )
+            + sum(sys.getsizeof(a) + sys.getsizeof(b) for a, b in attachments)
+        )
+
+    @classmethod
+    def from_message(
+        cls, message: discord.Message, edited: Optional[str] = None
+    ) -> "Snipe":
+        author = message.author
+        return cls(
+            author.id,
+            f"{author.name}#{author.discriminator}",
+            author.avatar.url if author.avatar else None,
+            message.channel.name,
+            message.content,
+            edited,
+            message.created_at,
+            tuple((a.filename, a.proxy_url) for a in message.attachments),
+        )
+
+
+_RECORD_BYTES = sys.getsizeof(Snipe(0, "", None, "", "")) + 8
+
+
+class SnipeStore:
+    def __init__(self, depth: int = 5, ttl: float = 3600, max_bytes: int = 8 << 20):
+        self.depth = depth
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Least recently written channel first.
+        self._channels: "OrderedDict[Key, Deque[Snipe]]" = OrderedDict()
+        self.bytes = 0
+        self.entries = 0
+        self.evicted = 0
+        self.expired = 0
+        self._pruned = time.monotonic()
+
+    def __len__(self):
+        return self.entries
+
+    def push(self, key: Key, snipe: Snipe):
+        snipes = self._channels.get(key)
+        if snipes is None:
+            snipes = self._channels[key] = deque()
+        else:
+            self._channels.move_to_end(key)
+        snipes.appendleft(snipe)
+        self.bytes += snipe.size
+        self.entries += 1
+        if len(snipes) > self.depth:
+            self._drop(snipes.pop())
+        while self.bytes > self.max_bytes and self._channels:
+            oldest_key, oldest = next(iter(self._channels.items()))
+            self._drop(oldest.pop())
+            self.evicted += 1
+            if not oldest:
+                del self._channels[oldest_key]
+        if snipe.stored_at - self._pruned >= 60:
+            self.prune(snipe.stored_at)
+
+    def _drop(self, snipe: Snipe):
+        self.bytes -= snipe.size
+        self.entries -= 1
+
+    def _expire(self, key: Key, snipes: Deque[Snipe], now: float):
+        cutoff = now - self.ttl
+        while snipes and snipes[-1].stored_at < cutoff:
+            self._drop(snipes.pop())
+            self.expired += 1
+        if not snipes:
+            del self._channels[key]
+
+    def prune(self, now: float = None):
+        """Drop every expired entry, not just the ones that get looked at"""
+        now = now or time.monotonic()
+        self._pruned = now
+        for key, snipes in list(self._channels.items()):
+            self._expire(key, snipes, now)
+
+    def history(self, key: Key) -> List[Snipe]:
+        """A channel's snipes, newest first"""
+        snipes = self._channels.get(key)
+        if snipes is None:
+            return []
+        self._expire(key, snipes, time.monotonic())
+        return list(snipes)
+
+    def get(self, key: Key, index: int = 0) -> Optional[Snipe]:
+        """The ``index``-th newest snipe of a channel, 0 for the latest"""
+        snipes = self.history(key)
+        return snipes[index] if 0 <= index < len(snipes) else None
+
+    def forget(self, key: Key):
+        snipes = self._channels.pop(key, None)
+        if snipes:
+            for snipe in snipes:
+                self._drop(snipe)
+
+    def stats(self) -> dict:
+        return {
+            "entries": self.entries,
+            "channels": len(self._channels),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+_stores: Dict[str, SnipeStore] = {}
+
+
+def get_store(kind: str) -> SnipeStore:
+    """The ``"deleted"`` or ``"edited"`` store, sized from config.json.
+
+    The two stores split ``snipe_max_bytes`` between them, so together they
+    stay under it.
+    """
+    store = _stores.get(kind)
+    if store is None:
+        config = default.get("config.json")
+        store = _stores[kind] = SnipeStore(
+            depth=getattr(config, "snipe_depth", 5),
+            ttl=getattr(config, "snipe_ttl", 3600),
+            max_bytes=getattr(config, "snipe_max_bytes", 8 << 20) // 2,
+        )
+    return store
+
+
+def stats() -> Dict[str, dict]:
+    return {kind: store.stats() for kind, store in _stores.items()}
@@ -0,0 +1,299 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Local stand-in for every external API the cogs talk to.
+
+Each upstream gets a prefix on one aiohttp server (``/lunardev``,
+``/nekos``, ``/reddit``...) and answers with the recorded responses in
+``fixtures/<upstream>.json``. Point the bot at it with the
+``AGB_UPSTREAM_<NAME>`` variables printed by::
+
+    python -m utils.stubserver --port 8080 --latency 0.05 --error-rate 0.01
+
+A fixture file holds a list of routes::
+
+    {"routes": [{"path": "/api/{kind}", "json": {"url": "{stub}/static/{kind}.png"}}]}
+
+``{stub}`` in a response is replaced with the server's base URL and any
+``{name}`` from the path pattern with the matched value. A route may give
+``json``, ``text`` (with ``content_type``) or ``image`` (``"png"``) and an
+optional ``status`` and ``method``.
+
+``--check`` starts the server, makes sure the URLs the bot builds for it
+land on the fixtures and exits.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import struct
+import zlib
+from collections import Counter
+from urllib.parse import urljoin
+
+import aiohttp
+from aiohttp import web
+
+from utils import http
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures")
+
+
+def make_png(width: int, height: int, colour=(114, 137, 218)) -> bytes:
+    """A solid colour PNG, stored uncompressed so its size is predictable"""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    row = b"\x00" + bytes(colour) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height, 0))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _fill(value, params):
+    if isinstance(value, str):
+        for key, param in params.items():
+            value = value.replace("{" + key + "}", param)
+        return value
+    if isinstance(value, list):
+        return [_fill(item, params) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, params) for key, item in value.items()}
+    return value
+
+
+class StubServer:
+    """aiohttp app serving the fixtures, with injectable latency and errors.
+
+    ``latency`` and ``jitter`` are in seconds, ``error_rate`` is the chance
+    of answering with a 503. All three can be changed per upstream through
+    :meth:`configure`, including while the server is running.
+    """
+
+    def __init__(
+        self,
+        port: int = 8080,
+        host: str = "127.0.0.1",
+        *,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        image_size: int = 512,
+        fixtures: str = FIXTURES,
+    ):
+        self.port = port
+        self.host = host
+        self.image_size = image_size
+        self.fixtures = fixtures
+        self.settings = {
+            None: {"latency": latency, "jitter": jitter, "error_rate": error_rate}
+        }
+        self.hits = Counter()
+        self.errors = Counter()
+        self.upstreams = []
+        self._images = {}
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def configure(self, upstream: str = None, **settings):
+        """Change latency, jitter or error_rate globally or for one upstream"""
+        self.settings.setdefault(upstream, {}).update(settings)
+
+    def setting(self, upstream: str, name: str):
+        return self.settings.get(upstream, {}).get(name, self.settings[None][name])
+
+    def exports(self) -> str:
+        """Shell lines that point the bot at this server"""
+        return "\n".join(
+            f"export AGB_UPSTREAM_{name.upper()}={self.base_url}/{name}"
+            for name in self.upstreams
+        )
+
+    def image(self, size: int) -> bytes:
+        if size not in self._images:
+            self._images[size] = make_png(size, size)
+        return self._images[size]
+
+    @web.middleware
+    async def inject(self, request, handler):
+        upstream = request.path.split("/")[1]
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else request.path
+        self.hits[route] += 1
+
+        delay = self.setting(upstream, "latency")
+        jitter = self.setting(upstream, "jitter")
+        if jitter:
+            delay = max(0, delay + random.uniform(-jitter, jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < self.setting(upstream, "error_rate"):
+            self.errors[route] += 1
+            return web.json_response({"error": "injected"}, status=503)
+        return await handler(request)
+
+    async def handle_static(self, request):
+        size = int(request.query.get("size", self.image_size))
+        return web.Response(body=self.image(size), content_type="image/png")
+
+    def _handler(self, route):
+        status = route.get("status", 200)
+
+        async def handler(request):
+            params = dict(request.match_info, stub=self.base_url)
+            if "image" in route:
+                size = int(request.query.get("size", self.image_size))
+                return web.Response(
+                    body=self.image(size), content_type="image/png", status=status
+                )
+            if "text" in route:
+                return web.Response(
+                    text=_fill(route["text"], params),
+                    content_type=route.get("content_type", "text/plain"),
+                    status=status,
+                )
+            return web.json_response(
+                _fill(route.get("json", {}), params), status=status
+            )
+
+        return handler
+
+    def load(self, app):
+        for file in sorted(os.listdir(self.fixtures)):
+            name, ext = os.path.splitext(file)
+            if ext != ".json":
+                continue
+            with open(os.path.join(self.fixtures, file), encoding="utf8") as f:
+                fixture = json.load(f)
+            for route in fixture["routes"]:
+                app.router.add_route(
+                    route.get("method", "GET"),
+                    f"/{name}{route['path']}",
+                    self._handler(route),
+                )
+            self.upstreams.append(name)
+
+    def make_app(self):
+        app = web.Application(middlewares=[self.inject])
+        self.load(app)
+        app.router.add_get("/static/{name}", self.handle_static)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def check_reddit(server: StubServer) -> bool:
+    """Fetch a subreddit the way asyncprawcore builds its URLs"""
+    previous = http.upstreams["reddit"].base_url
+    http.override("reddit", f"{server.base_url}/reddit")
+    try:
+        endpoints = http.reddit_endpoints()
+        hits = server.hits["/reddit/r/{sub}/hot"]
+        async with aiohttp.ClientSession() as session:
+            token = endpoints["reddit_url"] + "/api/v1/access_token"
+            async with session.post(token) as response:
+                if response.status != 200:
+                    print(f"reddit: {token} answered {response.status}")
+                    return False
+            hot = urljoin(endpoints["oauth_url"], "r/memes/hot")
+            async with session.get(hot) as response:
+                if response.status != 200:
+                    print(f"reddit: {hot} answered {response.status}")
+                    return False
+        if server.hits["/reddit/r/{sub}/hot"] == hits:
+            print(f"reddit: {hot} missed the /r/{{sub}}/hot fixture")
+            return False
+        print(f"reddit: ok ({hot})")
+        return True
+    finally:
+        http.override("reddit", previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument(
+        "--upstream",
+        action="append",
+        default=[],
+        metavar="NAME:SETTING=VALUE",
+        help="per upstream override, e.g. reddit:latency=0.5",
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="check the bot's URLs hit the fixtures"
+    )
+    args = parser.parse_args()
+
+    server = StubServer(
+        args.port,
+        args.host,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        image_size=args.image_size,
+    )
+    for item in args.upstream:
+        name, _, setting = item.partition(":")
+        key, _, value = setting.partition("=")
+        server.configure(name, **{key.replace("-", "_"): float(value)})
+
+    async def check():
+        await server.start()
+        try:
+            return await check_reddit(server)
+        finally:
+            await server.stop()
+
+    if args.check:
+        raise SystemExit(0 if asyncio.run(check()) else 1)
+
+    async def run():
+        await server.start()
+        print(server.exports(), flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Tic-tac-toe on a 3x3 grid of buttons.
+
+A game is one message whose buttons are the board, every move is answered
+by editing that message in the interaction response. The board is 9
+bytes, 0 for empty, :data:`X` for the player and :data:`O` for the bot.
+Games that sit idle past their timeout are dropped by discord.py's view
+store along with their state.
+
+The bot plays perfectly: :data:`BEST_MOVES` maps every position reachable
+with the bot to move to its best replies, worked out once at import.
+"""
+
+import random
+from typing import Dict, Optional, Tuple
+
+import discord
+
+EMPTY, X, O = 0, 1, 2
+DRAW = 3
+LINES = (
+    (0, 1, 2),
+    (3, 4, 5),
+    (6, 7, 8),
+    (0, 3, 6),
+    (1, 4, 7),
+    (2, 5, 8),
+    (0, 4, 8),
+    (2, 4, 6),
+)
+# Seconds without a move before a game is given up on.
+TIMEOUT = 600
+
+
+def outcome(cells: bytes) -> int:
+    """X or O if they have a line, DRAW on a full board, else EMPTY"""
+    for a, b, c in LINES:
+        if cells[a] != EMPTY and cells[a] == cells[b] == cells[c]:
+            return cells[a]
+    return DRAW if EMPTY not in cells else EMPTY
+
+
+def _solve() -> Dict[bytes, Tuple[int, ...]]:
+    """Best O replies for every reachable position with O to move"""
+    scores: Dict[bytes, int] = {}
+    best: Dict[bytes, Tuple[int, ...]] = {}
+
+    def score(cells: bytearray, player: int) -> int:
+        """From O's side, +/- (10 - moves played) for a win/loss, 0 for a draw"""
+        key = bytes(cells)
+        if key in scores:
+            return scores[key]
+        result = outcome(cells)
+        if result != EMPTY:
+            played = 9 - cells.count(EMPTY)
+            value = {O: 10 - played, X: played - 10, DRAW: 0}[result]
+        else:
+            options = {}
+            for i in range(9):
+                if cells[i] == EMPTY:
+                    cells[i] = player
+                    options[i] = score(cells, X if player == O else O)
+                    cells[i] = EMPTY
+            pick = max if player == O else min
+            value = pick(options.values())
+            if player == O:
+                best[key] = tuple(i for i, s in options.items() if s == value)
+        scores[key] = value
+        return value
+
+    score(bytearray(9), X)
+    return best
+
+
+BEST_MOVES = _solve()
+
+
+class Board(discord.ui.View):
+    def __init__(self, player: discord.abc.User, timeout: float = TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.player = player
+        self.cells = bytearray(9)
+        self.message: Optional[discord.Message] = None
+        for i in range(9):
+            self.add_item(Cell(i))
+
+    def content(self, status: str = "Your move:") -> str:
+        return f"{self.player.mention}\n{status}"
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.player.id:
+            return True
+        await interaction.response.send_message(
+            "This isn't your game, start your own with `tp!ttt`.", ephemeral=True
+        )
+        return False
+
+    def play(self, index: int) -> int:
+        """The player's move and the bot's answer, returns the outcome"""
+        self.cells[index] = X
+        result = outcome(self.cells)
+        if result == EMPTY:
+            self.cells[random.choice(BEST_MOVES[bytes(self.cells)])] = O
+            result = outcome(self.cells)
+        for cell in self.children:
+            cell.update(self.cells[cell.index], finished=result != EMPTY)
+        return result
+
+    async def on_timeout(self):
+        for cell in self.children:
+            cell.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(
+                    content=self.content("Game abandoned."), view=self
+                )
+            except discord.HTTPException:
+                pass
+
+
+class Cell(discord.ui.Button):
+    def __init__(self, index: int):
+        super().__init__(
+            style=discord.ButtonStyle.secondary, label="\u200b", row=index // 3
+        )
+        self.index = index
+
+    def update(self, mark: int, finished: bool):
+        if mark == X:
+            self.style, self.emoji, self.label = discord.ButtonStyle.primary, "❌", None
+        elif mark == O:
+            self.style, self.emoji, self.label = discord.ButtonStyle.danger, "⭕", None
+        self.disabled = finished or mark != EMPTY
+
+    async def callback(self, interaction: discord.Interaction):
+        board: Board = self.view
+        if board.cells[self.index] != EMPTY:
+            return await interaction.response.defer()
+        result = board.play(self.index)
+        if result == EMPTY:
+            status = "Your move:"
+        else:
+            status = {X: "You win!", O: "I win!", DRAW: "It's a draw!"}[result]
+            board.stop()
+        await interaction.response.edit_message(
+            content=board.content(status), view=board
+        )
@@ -0,0 +1,100 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""A hashed timer wheel for lots of coarse timeouts.
+
+Keys are dropped into one of ``slots`` buckets by their deadline, one
+bucket per ``tick`` seconds, wrapping around. Adding, moving and removing
+a key are dict operations, and :meth:`TimerWheel.expire` only looks at the
+buckets the clock went past since the last call. Keys more than a full
+turn away stay in their bucket until the turn they're due in.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        # key -> (deadline, tick number)
+        self._deadlines: Dict[Hashable, Tuple[float, int]] = {}
+        self._current = self._tick_of(time.monotonic())
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def _tick_of(self, when: float) -> int:
+        return math.floor(when / self.tick)
+
+    def add(self, key: Hashable, delay: float, now: float = None):
+        """Expire ``key`` in ``delay`` seconds, moving it if it's already in"""
+        self.remove(key)
+        deadline = (now or time.monotonic()) + delay
+        # Never behind the bucket the clock is on, or it would wait a full turn.
+        number = max(self._tick_of(deadline), self._current)
+        self._deadlines[key] = (deadline, number)
+        self.slots[number % len(self.slots)].add(key)
+
+    def remove(self, key: Hashable) -> bool:
+        entry = self._deadlines.pop(key, None)
+        if entry is None:
+            return False
+        self.slots[entry[1] % len(self.slots)].discard(key)
+        return True
+
+    def expire(self, now: float = None) -> List[Hashable]:
+        """Remove and return every key whose deadline has passed"""
+        now = now or time.monotonic()
+        target = self._tick_of(now)
+        expired = []
+        # Past a full turn every bucket gets looked at once, no need to lap.
+        last = min(target, self._current + len(self.slots) - 1)
+        for number in range(self._current, last + 1):
+            bucket = self.slots[number % len(self.slots)]
+            for key in [k for k in bucket if self._deadlines[k][0] <= now]:
+                bucket.discard(key)
+                del self._deadlines[key]
+                expired.append(key)
+        self._current = target
+        return expired
+
+    def sweep(self, on_expire: Callable[[Hashable], None]):
+        """Call ``on_expire`` for keys as they expire.
+
+        Runs in a task that only lives while the wheel has keys, call this
+        after every :meth:`add` to make sure it's running.
+        """
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_event_loop().create_task(
+                self._sweep(on_expire)
+            )
+
+    async def _sweep(self, on_expire: Callable[[Hashable], None]):
+        while self._deadlines:
+            await asyncio.sleep(self.tick)
+            for key in self.expire():
+                try:
+                    on_expire(key)
+                except Exception:
+                    log.exception(f"Timeout of {key!r} failed")
@@ -0,0 +1,170 @@
+### IMPORTANT ANNOUNCEMENT ###
+#
+# All additions to AGB will now cease.
+# AGB's management will be limited to the following:
+# - Optimization
+# - Bug Fixes
+# - Basic Maintenance
+#
+# DO NOT ADD ANY NEW FEATURES TO AGB
+# ALL NEW FEATURES WILL BE RESERVED FOR MEKU
+#
+### IMPORTANT ANNOUNCEMENT ###
+
+"""Vote status lookups for top.gg, backed by a cache and an optional vote webhook."""
+
+import hmac
+import logging
+
+from aiohttp import web
+
+from utils import default, http
+
+log = logging.getLogger(__name__)
+
+config = default.get("config.json")
+
+BOT_ID = 723726581864071178
+
+# A vote counts for 12 hours on top.gg.
+VOTE_WINDOW = 12 * 60 * 60
+# The check API doesn't say when someone voted, so a "voted" answer from it
+# could be about to run out and is only trusted for an hour. Votes pushed to
+# the webhook are cached for the whole window.
+VOTED_TTL = 60 * 60
+# "Not voted" answers are only trusted for a short while, unless the webhook
+# is running, in which case a new vote will be pushed to us anyway.
+NOT_VOTED_TTL = 60
+NOT_VOTED_TTL_WITH_WEBHOOK = 15 * 60
+
+vote_cache = http.TTLCache(ttl=VOTE_WINDOW, maxsize=50000)
+receiver = None
+
+
+async def fetch_vote(user_id: int) -> bool:
+    """Ask top.gg directly whether a user voted in the last 12 hours"""
+    vote = await http.get(
+        http.url("topgg", f"/bots/{BOT_ID}/check?userid={user_id}"),
+        res_method="json",
+        no_cache=True,
+        headers={"Authorization": config.topgg, "Content-Type": "application/json"},
+    )
+    return vote["voted"] == 1
+
+
+async def has_voted(user_id: int) -> bool:
+    cached = vote_cache.get(user_id)
+    if cached is not None:
+        return cached[0]
+
+    voted = await fetch_vote(user_id)
+    if voted:
+        vote_cache.set(user_id, True, ttl=VOTED_TTL)
+    elif receiver is not None and receiver.running:
+        vote_cache.set(user_id, False, ttl=NOT_VOTED_TTL_WITH_WEBHOOK)
+    else:
+        vote_cache.set(user_id, False, ttl=NOT_VOTED_TTL)
+    return voted
+
+
+def record_vote(user_id: int):
+    """Mark a user as having voted just now"""
+    vote_cache.set(int(user_id), True)
+
+
+class VoteWebhook:
+    """Small aiohttp server that receives top.gg vote pushes and fills the cache.
+
+    Point the bot's webhook URL on top.gg at ``http://<host>:<port><path>``
+    and set the same secret as ``topgg_webhook_auth`` in config.json.
+    """
+
+    def __init__(self, port: int, auth: str, *, host="0.0.0.0", path="/dblwebhook"):
+        self.port = port
+        self.auth = auth
+        self.host = host
+        self.path = path
+        self.votes = 0
+        self._runner = None
+
+    @property
+    def running(self):
+        return self._runner is not None
+
+    async def handle_vote(self, request):
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth.encode(), self.auth.encode()):
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+            user_id = int(data["user"])
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+        record_vote(user_id)
+        self.votes += 1
+        log.info(f"Vote received from {user_id} ({data.get('type', 'upvote')})")
+        return web.Response(status=200)
+
+    async def start(self):
+        global receiver
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_vote)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        receiver = self
+        log.info(f"Listening for top.gg votes on port {self.port}")
+
+    async def stop(self):
+        global receiver
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if receiver is self:
+            receiver = None
+
+
+class FakeTopGG:
+    """Local stand-in for the top.gg check API, for testing without top.gg.
+
+    Point the ``topgg`` upstream at ``http://127.0.0.1:<port>/api`` and add
+    voters with :meth:`vote`, or push them to a running
+    :class:`VoteWebhook` with :meth:`push_vote`.
+    """
+
+    def __init__(self, port: int = 8090, host="127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.voters = set()
+        self.checks = 0
+        self._runner = None
+
+    def vote(self, user_id: int):
+        self.voters.add(int(user_id))
+
+    async def handle_check(self, request):
+        self.checks += 1
+        user_id = int(request.query.get("userid", 0))
+        return web.json_response({"voted": int(user_id in self.voters)})
+
+    async def push_vote(self, webhook_url: str, auth: str, user_id: int):
+        """Send a vote push the same way top.gg would"""
+        self.vote(user_id)
+        async with http.session.post(
+            webhook_url,
+            json={"bot": str(BOT_ID), "user": str(user_id), "type": "test"},
+            headers={"Authorization": auth},
+        ) as r:
+            return r.status
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/bots/{bot_id}/check", self.handle_check)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None